@@ -1,11 +1,15 @@
 import os
-from flask import Flask
-from .routes import new_entry, note_gallery, view_entry, edit_entry, home, live_chat, knowledge_map
 
 # Configuration de l'environnement pour HuggingFace Tokenizers
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
 def create_app():
+    # Imported here so that `import app.services...` (transcription workers, the
+    # vec_database scripts) does not load every route and their dependencies
+    from flask import Flask
+    from .routes import new_entry, note_gallery, view_entry, edit_entry, home, live_chat, knowledge_map, status
+    from .commands import register_commands
+
     app = Flask(__name__)
 
     # Register Blueprints
@@ -16,6 +20,10 @@ def create_app():
     app.register_blueprint(home.bp)
     app.register_blueprint(live_chat.bp)
     app.register_blueprint(knowledge_map.bp)
+    app.register_blueprint(status.bp)
+
+    # Register CLI maintenance commands
+    register_commands(app)
 
     # Configure secret key for session management
     app.config['SECRET_KEY'] = 'blob'
@@ -0,0 +1,55 @@
+import datetime
+
+import click
+
+from app.services import transcription_cache
+from app.services.chunk_index import reindex_all_notes
+from app.services.notes_service import backfill_summary_html
+
+
+def register_commands(app):
+    """Maintenance commands, run with `flask --app run <command>`."""
+
+    @app.cli.command('backfill-summaries')
+    def backfill_summaries():
+        """Render and store summary_html for notes saved before it was computed at ingest."""
+        updated = backfill_summary_html()
+        click.echo(f'Rendered summary_html for {len(updated)} note(s)')
+
+    @app.cli.command('reindex-chunks')
+    def reindex_chunks():
+        """Embed the transcription windows of every stored note into the chunk collection."""
+        count = reindex_all_notes()
+        click.echo(f'Indexed the transcription chunks of {count} note(s)')
+
+    @app.cli.group('transcription-cache')
+    def transcription_cache_group():
+        """Inspect and purge the cache of transcribed audio."""
+
+    @transcription_cache_group.command('list')
+    def list_transcriptions():
+        """List the cached transcriptions, most recently used first."""
+        entries = transcription_cache.list_entries()
+        for entry in entries:
+            last_used = datetime.datetime.fromtimestamp(entry['last_access']).strftime('%Y-%m-%d %H:%M')
+            duration = f"{entry['duration'] / 60:.1f} min" if entry['duration'] else '?'
+            click.echo(f"{entry['fingerprint'][:16]}  {last_used}  {duration:>9}  "
+                       f"{entry['bytes'] / 1024:>8.0f} KiB  {entry['title'] or ''}")
+        click.echo(f'{len(entries)} cached transcription(s)')
+
+    @transcription_cache_group.command('purge')
+    @click.argument('fingerprint', required=False)
+    @click.option('--older-than', type=float, help='Only entries unused for this many days.')
+    @click.option('--all', 'purge_all', is_flag=True, help='Delete every entry.')
+    def purge_transcriptions(fingerprint, older_than, purge_all):
+        """Delete one entry (by fingerprint prefix), the entries unused for some days, or all of them."""
+        if not (fingerprint or older_than is not None or purge_all):
+            raise click.UsageError('Give a fingerprint, --older-than DAYS or --all.')
+        try:
+            deleted = transcription_cache.purge(
+                fingerprint=fingerprint,
+                older_than=older_than * 24 * 3600 if older_than is not None else None,
+            )
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(f'Deleted {deleted} cached transcription(s)')
@@ -1,14 +1,15 @@
 # app/routes/home.py
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, request
 
-from app.services.notes_service import load_most_recent_k_notes
+from app.services.notes_service import load_recent_notes_page
 
 bp = Blueprint('home', __name__, url_prefix='/')
 
 @bp.route('/')
 def home():
-    # Load the most recent 3 notes (or however many you want to display)
-    recent_notes = load_most_recent_k_notes(20)
+    # Load the most recent 20 notes, or the 20 notes older than the ?before= cursor
+    before = request.args.get('before')
+    recent_notes, next_cursor = load_recent_notes_page(20, before)
 
     # Logic for handling the home page
-    return render_template('home.html', recent_notes=recent_notes)
\ No newline at end of file
+    return render_template('home.html', recent_notes=recent_notes, next_cursor=next_cursor)
\ No newline at end of file
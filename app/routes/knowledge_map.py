@@ -1,5 +1,5 @@
-from flask import Blueprint, jsonify
-from app.services.knowledge_map_service import get_knowledge_map
+from flask import Blueprint, Response, jsonify, request
+from app.services.knowledge_map_service import get_knowledge_map_payload
 
 bp = Blueprint('knowledge_map', __name__)
 
@@ -7,5 +7,16 @@ bp = Blueprint('knowledge_map', __name__)
 def knowledge_map():
     """
     Endpoint pour obtenir la carte des connaissances basée sur les tags.
+    Paramètres optionnels : ?min_weight= (poids minimal des liens) et ?top_n= (nombre maximal de liens).
+    Répond 304 si le client a déjà la version courante (If-None-Match).
     """
-    return jsonify(get_knowledge_map())
\ No newline at end of file
+    min_weight = request.args.get('min_weight', default=1, type=int)
+    top_n = request.args.get('top_n', default=None, type=int)
+    if min_weight < 0 or (top_n is not None and top_n < 0):
+        return jsonify({'error': 'min_weight et top_n doivent être positifs'}), 400
+
+    payload, etag = get_knowledge_map_payload(min_weight, top_n)
+    response = Response(payload, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
\ No newline at end of file
@@ -1,45 +1,179 @@
 # app/routes/live_chat.py
-import io
-import os
-import datetime
-import base64
-from flask import Blueprint, request, abort, Response, jsonify
+import json
+import time
+import uuid
+from flask import Blueprint, request, abort, Response, jsonify, redirect, send_file, session, stream_with_context, url_for
+from app.services import conversation_store
 from app.services import transcription as T
 from app.services.semantic_search_service import semantic_search_notes
-from app.services.rag_service import get_rag_summary
-from app.services.text_gen_service import get_audio_response, _to_wav_bytes
+from app.services.rag_service import get_rag_summary, stream_rag_summary
+from app.services import transcription_pool, tts_cache, tts_pipeline
+from app.services.transcription_pool import TranscriptionCancelled, TranscriptionQueueFull
 
 bp = Blueprint('live_chat', __name__, url_prefix='/api')
-last_question = ""
+
+NO_ANSWER = "I am sorry, I do not have enough information to answer that."
+
+def _chat_session_id():
+    # The conversation lives in the conversation store, the cookie only carries its ID
+    if 'chat_id' not in session:
+        session['chat_id'] = uuid.uuid4().hex
+    return session['chat_id']
 
 @bp.route('/chat', methods=['POST'])
 def chat():
-    global last_question
     message = request.json.get('message')
     if not message:
         return jsonify({'error': 'No message provided'}), 400
 
     # Utiliser le message pour chercher dans les notes
+    session_id = _chat_session_id()
     matching_notes = semantic_search_notes(message)
-    response = get_rag_summary(message, matching_notes, markdown=False, last_question=last_question)
-    last_question = message
+    history = conversation_store.get_history(session_id)
+    try:
+        response = get_rag_summary(message, matching_notes, markdown=False, history=history, raise_errors=True)
+    except Exception as e:
+        # Not an answer: kept out of the conversation and of the TTS cache
+        return jsonify({
+            'response': f"An error occurred while generating the summary: {str(e)}",
+            'audioUrl': None
+        })
     print("RAG Response:", response)
     
     if not response:
-        response = "I am sorry, I do not have enough information to answer that."
+        response = NO_ANSWER
+    conversation_store.record_exchange(session_id, message, response)
     
-    # Générer l'audio de la réponse
-    import base64
-    audio_response = get_audio_response(response)
-    
-    # Encoder l'audio en base64
-    audio_b64 = base64.b64encode(audio_response).decode('utf-8') if isinstance(audio_response, bytes) else base64.b64encode(audio_response.encode()).decode('utf-8')
+    # Générer l'audio de la réponse (ou le reprendre du cache) et renvoyer son URL
+    key, fmt = tts_pipeline.synthesize_cached(response)
     
     return jsonify({
         'response': response,
-        'audioUrl': f'data:audio/wav;base64,{audio_b64}'
+        'audioUrl': _tts_url(key, fmt)
     })
 
+def _tts_url(key, fmt):
+    return url_for('live_chat.tts_audio', filename=f'{key}.{fmt}')
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@bp.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Server-Sent Events version of /api/chat: `token` events carry the answer text as it is
+    generated, then a `done` event carries the full answer, the URL of its audio and the
+    time to first token (ms, measured from the request).
+    """
+    start = time.perf_counter()
+    message = request.json.get('message')
+    if not message:
+        return jsonify({'error': 'No message provided'}), 400
+
+    # The session cookie has to be set before the response headers go out
+    session_id = _chat_session_id()
+    matching_notes = semantic_search_notes(message)
+    history = conversation_store.get_history(session_id)
+
+    def generate():
+        parts = []
+        ttft_ms = None
+        failed = False
+        try:
+            for text in stream_rag_summary(message, matching_notes, history=history):
+                if ttft_ms is None:
+                    ttft_ms = round((time.perf_counter() - start) * 1000)
+                parts.append(text)
+                yield _sse('token', {'text': text})
+        except Exception as e:
+            failed = True
+            parts = [f"An error occurred while generating the summary: {str(e)}"]
+            yield _sse('token', {'text': parts[0]})
+
+        response = "".join(parts).strip() or NO_ANSWER
+        total_ms = round((time.perf_counter() - start) * 1000)
+        if failed:
+            # An error is neither part of the conversation nor synthesized (and cached)
+            yield _sse('done', {'response': response, 'audioUrl': None, 'ttft_ms': ttft_ms, 'total_ms': total_ms})
+            return
+        conversation_store.record_exchange(session_id, message, response)
+
+        # Already synthesized answers (e.g. the fallback) are served straight from the TTS cache;
+        # the others are synthesized by whichever worker gets the audio request, from the text
+        # kept on disk under the answer's cache key
+        cached = tts_pipeline.cached_audio(response)
+        if cached is not None:
+            audio_url = _tts_url(*cached)
+        else:
+            key = tts_pipeline.cache_key(response)
+            tts_cache.store_text(key, response)
+            audio_url = url_for('live_chat.chat_audio', key=key)
+        print(f"Chat stream: first token after {ttft_ms} ms, answer after {total_ms} ms")
+        yield _sse('done', {
+            'response': response,
+            'audioUrl': audio_url,
+            'ttft_ms': ttft_ms,
+            'total_ms': total_ms,
+        })
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+@bp.route('/chat/session', methods=['DELETE'])
+def reset_chat_session():
+    """Forget the conversation of this browser session."""
+    if 'chat_id' in session:
+        conversation_store.clear_conversation(session.pop('chat_id'))
+    return jsonify({'message': 'Conversation cleared'})
+
+
+def _timed_audio_stream(text):
+    start = time.perf_counter()
+    for i, chunk in enumerate(tts_pipeline.stream_wav(text)):
+        # The first chunk is the WAV header, the second one the first audio frames
+        if i == 1:
+            print(f"Chat audio: first audio after {round((time.perf_counter() - start) * 1000)} ms")
+        yield chunk
+
+
+@bp.route('/chat/audio/<key>', methods=['GET'])
+def chat_audio(key):
+    """
+    Speech for an answer of the streaming chat, synthesized sentence by sentence when the
+    browser asks for it and streamed as a chunked WAV so that playback starts with the
+    first frames. Once synthesized, the cached file is served instead.
+    """
+    found = tts_cache.lookup(key) if tts_cache.valid_key(key) else None
+    if found is not None:
+        return redirect(_tts_url(key, found[1]))
+    response = tts_cache.load_text(key)
+    if response is None:
+        abort(404)
+    return Response(_timed_audio_stream(response), mimetype='audio/wav', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+@bp.route('/tts/<filename>', methods=['GET'])
+def tts_audio(filename):
+    """
+    Cached speech, addressed by the hash of what it was synthesized from, so it never changes.
+    """
+    cached = tts_cache.get_file(filename)
+    if cached is None:
+        abort(404)
+    path, mimetype = cached
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=filename.partition('.')[0], max_age=365 * 24 * 3600)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
 @bp.route('/transcribe', methods=['POST'])
 def transcribe_audio():
     if 'audio' not in request.files:
@@ -47,14 +181,26 @@ def transcribe_audio():
 
     audio_file = request.files['audio']
     
-    # IMPORTANT: transcode whatever the browser recorded (likely audio/webm) -> WAV
+    # Whatever the browser recorded (likely audio/webm) is decoded in process to 16 kHz samples
     incoming = audio_file.read()
-    wav_bytes = _to_wav_bytes(incoming)
-
-    wav_io = io.BytesIO(wav_bytes)
-    wav_io.name = "input.wav"
+    try:
+        samples = T.decode_audio_bytes(incoming)
+    except Exception as e:
+        return jsonify({'error': f'Could not decode audio: {e}'}), 400
 
-    query = T.process_audio(wav_io)  # expects a WAV file-like
+    # The client may name the job to be able to cancel it (DELETE /api/transcribe/<request_id>)
+    try:
+        query = T.process_audio(samples, job_id=request.form.get('request_id'))
+    except TranscriptionQueueFull as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '2'}
+    except TranscriptionCancelled:
+        return jsonify({'error': 'Transcription cancelled'}), 409
     
     return jsonify({'transcription': query})
+
+@bp.route('/transcribe/<request_id>', methods=['DELETE'])
+def cancel_transcription(request_id):
+    if not transcription_pool.cancel(request_id):
+        return jsonify({'error': 'No such transcription in progress'}), 404
+    return jsonify({'message': 'Transcription cancelled'})
     
@@ -3,32 +3,30 @@ import json
 import os
 import subprocess
 import uuid
-import chromadb
 import pathlib
-from chromadb.utils import embedding_functions
-from flask import Blueprint, render_template, request, jsonify
-from sentence_transformers import SentenceTransformer
-from app.services import transcription as T
+from flask import Blueprint, render_template, request, jsonify, url_for
+from app.services import ingestion_jobs, live_transcription, model_registry
 from app.services.transcription_information import get_title_summary_tags_from_transcription
 from app.services.notes_service import load_note_ids
+from app.services.semantic_search_service import embed_query
 
 
 NOTES_DIR = pathlib.Path('app') / 'static' / 'notes'
 bp = Blueprint('new_entry', __name__, url_prefix='/new_entry')
 
-# Preload model and client
-collection_name = "chroma_data"
-client = chromadb.PersistentClient(path=collection_name)
-collection = client.get_or_create_collection(name=collection_name)
 
-encoder = SentenceTransformer("sentence-transformers/all-mpnet-base-v2")
+@bp.before_app_request
+def start_ingestion_workers():
+    # Starts the ingestion worker pool once per process and resumes unfinished jobs
+    ingestion_jobs.start_workers()
+
 
 def query_collection(query, top_k=5):
     # embed query
-    query_embedding = encoder.encode(query).tolist()
+    query_embedding = embed_query(query)
 
     # perform query
-    results = collection.query(
+    results = model_registry.get_collection().query(
         query_embeddings=[query_embedding],
         n_results=top_k,
         include=["ids", "documents", "metadatas"]
@@ -42,21 +40,10 @@ def query_collection(query, top_k=5):
     return matching_notes
 
 
-def add_to_vectordb(note_id, transcription, tags=None):
-    embedding = encoder.encode(transcription)
-
-    # ensure string ID
-    note_id = str(note_id)
-    
-    collection.add(
-        ids=[note_id],
-        embeddings=[embedding],
-        metadatas=[{"tags": tags, "source": "upload_file"}] if tags is not None else [{"source": "upload_file"}],
-        documents=[transcription]
-    )
-    print('Collection count:', collection.count())
-    
 def store_collection(data, collection_name="chroma_data"):
+    client = model_registry.get_chroma_client()
+    encoder = model_registry.get_encoder()
+
     # If existing collection and you want to start fresh, you can delete:
     try:
         client.delete_collection(name=collection_name)
@@ -88,6 +75,8 @@ def store_collection(data, collection_name="chroma_data"):
         metadatas=metadatas,
         documents=documents
     )
+    # The shared collection handle points at the deleted collection now
+    model_registry.reset('collection')
 
 @bp.route('/', methods=['GET'])
 def new_entry():
@@ -103,9 +92,29 @@ def upload_audio():
 
 @bp.route('/stream_audio', methods=['POST'])
 def stream_audio():
-    audio_data = request.files['audio']
-    transcript_chunk = "" #transcription.process_audio(audio_data)
-    return jsonify({'transcription': transcript_chunk})
+    """
+    Live transcription of a recording: the recorder posts successive chunks of PCM16 mono
+    16 kHz audio with the session_id returned by the first call and the `offset` (in
+    samples) of the chunk. Returns the committed (stable) text and the partial text of the
+    latest pass; `final` finishes the session. An unknown session or a chunk that does not
+    follow the previous one is answered with 409: the live transcript would miss audio.
+    """
+    if 'audio' not in request.files:
+        return jsonify({'error': 'No audio chunk provided'}), 400
+
+    session_id = request.form.get('session_id')
+    live = live_transcription.get_session(session_id or None, create=not session_id)
+    if live is None:
+        return jsonify({'error': 'Unknown live session', 'session_id': session_id}), 409
+    try:
+        result = live.feed(request.files['audio'].read(), offset=request.form.get('offset', type=int))
+    except live_transcription.LiveSessionIncomplete as e:
+        live_transcription.discard_session(live.session_id)
+        return jsonify({'error': str(e), 'session_id': live.session_id}), 409
+    if request.form.get('final') == 'true':
+        result = live.finish()
+    result['transcription'] = f"{result['committed']} {result['partial']}".strip()
+    return jsonify(result)
 
 @bp.route('/upload_file', methods=['POST'])
 def upload_file():
@@ -137,33 +146,15 @@ def upload_file():
     #wav_path = os.path.join(save_path, 'audio.wav')
     #subprocess.call(f'ffmpeg -y -i "{original_path}" "{wav_path}"', shell=True)
 
-    # Transcrire l'audio
-    transcription = T.process_audio(os.path.join(save_path, 'audio' + file_ext))
-    
-    # Extraire le titre, le résumé et les tags
-    title, summary, tags = get_title_summary_tags_from_transcription(transcription)
-    
-    # Créer les métadonnées
+    # Transcription, titre/résumé/tags et indexation sont faits en arrière-plan
     datetime_str = current_time.strftime('%Y-%m-%d %H:%M:%S')
-    json_dict = {
+    job_id = ingestion_jobs.enqueue_ingestion(note_id, os.path.join(save_path, 'audio' + file_ext), {
         'id': str(note_id),
-        'title': title,
-        'summary': summary,
-        'tags': tags,
-        'transcription': " ".join(transcription) if isinstance(transcription, list) else transcription,
         'datetime': datetime_str,
         'original_filename': audio_file.filename
-    }
-
-    # Sauvegarder les métadonnées
-    json_path = os.path.join(save_path, 'data.json')
-    with open(json_path, 'w') as json_file:
-        json.dump(json_dict, json_file, indent=4)
+    })
 
-    # Ajouter à la base de données vectorielle
-    add_to_vectordb(note_id, " ".join(transcription) if isinstance(transcription, list) else transcription)
-
-    return jsonify({'message': 'File uploaded and processed successfully', 'note_id': str(note_id)}), 200
+    return _job_accepted(job_id, note_id, 'File uploaded, processing started')
 
 @bp.route('/save_entry', methods=['POST'])
 def save_entry():
@@ -186,36 +177,54 @@ def save_entry():
 
     #subprocess.call(f'ffmpeg -y -i {save_path}/audio.webm {save_path}/audio.wav', shell=True)
 
-    transcription = T.process_audio(os.path.join(save_path, 'audio.wav'))
-
-    # Extract the title, summary, and tags from the transcription
-    title, summary, tags = get_title_summary_tags_from_transcription(transcription)
-
     # Create a human-readable datetime string
     datetime_str = current_time.strftime('%Y-%m-%d %H:%M:%S')
 
-    # Save the JSON metadata
-    json_dict = {
+    # Reuse the live transcript of the recording when this worker has it
+    live = None
+    if request.form.get('live_session'):
+        try:
+            live = live_transcription.finish_session(request.form['live_session'])
+        except Exception as e:
+            print(f"Live transcript unavailable, transcribing the file: {e}")
+    transcription, segments = live if live is not None else (None, None)
+
+    # Transcription (unless live), title/summary/tags extraction and indexing run in the background
+    job_id = ingestion_jobs.enqueue_ingestion(note_id, audio_path, {
         'id': str(note_id),
-        'title': title,
-        'summary': summary,
-        'tags': tags,
-        'transcription': " ".join(transcription) if isinstance(transcription, list) else transcription,
         'datetime': datetime_str
-    }
+    }, transcription=transcription, segments=segments)
+
+    return _job_accepted(job_id, note_id, 'Entry saved, processing started')
+
+
+def _job_accepted(job_id, note_id, message):
+    return jsonify({
+        'message': message,
+        'job_id': job_id,
+        'note_id': str(note_id),
+        'status_url': url_for('new_entry.job_status', job_id=job_id)
+    }), 202
+
 
-    json_path = os.path.join(save_path, f'data.json')
-    with open(json_path, 'w') as json_file:
-        json.dump(json_dict, json_file, indent=4)
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    Stage, status, per-stage timings (seconds) and error of an ingestion job.
+    """
+    job = ingestion_jobs.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job), 200
 
-    ## Add the note to the vector database
-    add_to_vectordb(note_id, " ".join(transcription) if isinstance(transcription, list) else transcription)
 
-    # # Save the audio data
-    # audio_data.seek(0)
-    # audio_path = os.path.join(save_path, f'audio.wav')
-    # audio_data.save(audio_path)
+@bp.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    if not ingestion_jobs.cancel_job(job_id):
+        return jsonify({'error': 'Unknown or finished job'}), 404
+    return jsonify(ingestion_jobs.get_job(job_id)), 200
 
-    # Additional logic such as saving to a database can be added here
 
-    return jsonify({'message': 'Entry saved successfully', 'note_id': str(note_id)}), 200
+@bp.route('/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify({'jobs': ingestion_jobs.list_jobs()}), 200
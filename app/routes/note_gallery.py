@@ -1,30 +1,68 @@
 # app/routes/note_gallery.py
-from flask import Blueprint, render_template, request, jsonify
-from app.services.notes_service import load_notes, load_all_notes
+import json
+from flask import Blueprint, Response, render_template, request, jsonify, stream_with_context
+from app.services.notes_service import iter_recent_notes, load_recent_notes_page, project_note
 from app.services.semantic_search_service import semantic_search_notes
 from app.services.rag_service import get_rag_summary
-from app.services.tags_service import get_all_available_tags
+from app.services.tags_service import get_all_available_tags, get_note_ids_by_tag
 
 bp = Blueprint('note_gallery', __name__, url_prefix='/note_gallery')
 
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _list_notes_page(cursor=None, limit=PAGE_SIZE, fields=None, tag=None):
+    note_ids = get_note_ids_by_tag(tag) if tag else None
+    notes, next_cursor = load_recent_notes_page(limit, cursor, note_ids)
+    return [project_note(note, fields) for note in notes], next_cursor
+
+
 @bp.route('/')
 def note_gallery():
     # Get the tag filter from the query parameters
     selected_tag = request.args.get('tag')
-    
-    # Load notes from the service
-    notes = load_notes()
-    
-    # Filter notes by tag if a tag is selected
-    if selected_tag:
-        notes = [note for note in notes if selected_tag in note.get('tags', [])]
-    
+
+    # Only the first page is rendered; the gallery streams the rest from /api/notes
+    notes, next_cursor = _list_notes_page(tag=selected_tag)
+
     all_available_tags = get_all_available_tags()
     return render_template('note_gallery.html', 
                          notes=notes, 
+                         next_cursor=next_cursor,
                          all_available_tags=all_available_tags,
                          selected_tag=selected_tag)
 
+
+@bp.route('/api/notes')
+def list_notes():
+    """
+    Paged note listing, most recent first.
+
+    Query parameters:
+        cursor: value of next_cursor from the previous page
+        limit: page size (default 50, at most 200)
+        fields: comma-separated note fields to return (default: id, title, tags, datetime)
+        tag: only list notes with this tag
+        format: "ndjson" to stream every note from the cursor on, one JSON object per line
+    """
+    cursor = request.args.get('cursor') or None
+    limit = min(max(request.args.get('limit', default=PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    fields = [field for field in request.args.get('fields', '').split(',') if field] or None
+    tag = request.args.get('tag') or None
+
+    if request.args.get('format') == 'ndjson':
+        note_ids = get_note_ids_by_tag(tag) if tag else None
+
+        def generate():
+            for note in iter_recent_notes(cursor, note_ids, page_size=limit):
+                yield json.dumps(project_note(note, fields)) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    notes, next_cursor = _list_notes_page(cursor, limit, fields, tag)
+    return jsonify({'notes': notes, 'next_cursor': next_cursor}), 200
+
 @bp.route('/semantic_search', methods=['POST'])
 def semantic_search():
     # Parse the incoming JSON data
@@ -38,7 +76,9 @@ def semantic_search():
     query = data['query']
 
     if len(query) == 0:
-        matching_notes = load_all_notes()
+        # Empty query: first page of the listing; the client pages on with /api/notes
+        matching_notes, next_cursor = _list_notes_page()
+        return jsonify({'notes': matching_notes, 'next_cursor': next_cursor}), 200
     else:
         # Call the semantic search service to find matching notes
         matching_notes = semantic_search_notes(query)
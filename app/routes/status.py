@@ -0,0 +1,45 @@
+from flask import Blueprint, jsonify
+from app.services.conversation_store import conversation_stats
+from app.services.llm_cache import llm_cache_stats
+from app.services.model_registry import resource_stats
+from app.services.semantic_search_service import query_cache_stats
+from app.services.transcription_cache import transcription_cache_stats
+from app.services.transcription_pool import transcription_stats
+from app.services.tts_cache import tts_cache_stats
+from app.services.upstream import upstream_stats
+
+bp = Blueprint('status', __name__, url_prefix='/api/status')
+
+@bp.route('/models')
+def models():
+    """
+    Load time and resident memory of the shared models, to size worker processes.
+    """
+    return jsonify(resource_stats())
+
+@bp.route('/caches')
+def caches():
+    """
+    Size and hit/miss counters of the in-process caches.
+    """
+    return jsonify({
+        'query_embeddings': query_cache_stats(),
+        'llm_responses': llm_cache_stats(),
+        'tts_audio': tts_cache_stats(),
+        'chat_sessions': conversation_stats(),
+        'transcriptions': transcription_cache_stats(),
+    })
+
+@bp.route('/upstream')
+def upstream():
+    """
+    Per-model request, retry, error and latency counters and circuit state of the Boson gateway.
+    """
+    return jsonify(upstream_stats())
+
+@bp.route('/transcription')
+def transcription():
+    """
+    Queue depth per priority, running jobs, worker count and wait/total latencies of the transcription pool.
+    """
+    return jsonify(transcription_stats())
@@ -0,0 +1,173 @@
+"""
+Chunk-level embedding index.
+
+The embedding model truncates its input at a few hundred tokens, so a lecture embedded as
+one vector is mostly invisible to search. Transcriptions are instead split into
+overlapping windows of about CHUNK_WORDS words that start and end on Whisper segment
+boundaries; every window gets its own vector in the chunk collection, with the parent
+note ID, its position and its timestamps as metadata. Searches aggregate chunk hits back
+to notes and keep the matched windows for the RAG context.
+"""
+import os
+import re
+
+from app.services import model_registry
+
+CHUNK_WORDS = int(os.getenv('CHUNK_WORDS', 180))
+CHUNK_OVERLAP_WORDS = int(os.getenv('CHUNK_OVERLAP_WORDS', 40))
+EMBED_BATCH_SIZE = 32
+
+
+def _word_count(text):
+    return len(text.split())
+
+
+def segments_from_text(text):
+    """Sentence 'segments' without timestamps, for notes transcribed without Whisper segments."""
+    return [{'start': None, 'end': None, 'text': sentence}
+            for sentence in re.split(r'(?<=[.!?])\s+', text) if sentence.strip()]
+
+
+def make_chunks(segments, chunk_words=CHUNK_WORDS, overlap_words=CHUNK_OVERLAP_WORDS):
+    """
+    Group consecutive segments into windows of about chunk_words words. Each window
+    starts on a segment boundary, repeating at least overlap_words words of the previous
+    one. Returns [{'index', 'text', 'offset', 'start', 'end'}], where offset is the
+    character offset of the window in the space-joined transcription.
+    """
+    texts = [segment['text'].strip() for segment in segments]
+    offsets = []
+    position = 0
+    for text in texts:
+        offsets.append(position)
+        position += len(text) + 1
+
+    chunks = []
+    first = 0
+    while first < len(segments):
+        last = first
+        words = _word_count(texts[first])
+        while last + 1 < len(segments) and words + _word_count(texts[last + 1]) <= chunk_words:
+            last += 1
+            words += _word_count(texts[last])
+
+        chunks.append({
+            'index': len(chunks),
+            'text': ' '.join(text for text in texts[first:last + 1] if text),
+            'offset': offsets[first],
+            'start': segments[first].get('start'),
+            'end': segments[last].get('end'),
+        })
+        if last + 1 >= len(segments):
+            break
+
+        # Step back over whole segments to overlap with this window
+        next_first = last + 1
+        overlap = 0
+        while next_first - 1 > first and overlap < overlap_words:
+            next_first -= 1
+            overlap += _word_count(texts[next_first])
+        first = next_first if next_first > first else last + 1
+    return chunks
+
+
+def note_chunks(note):
+    """Windows of a note, from its stored Whisper segments or else from its transcription."""
+    segments = note.get('segments') or segments_from_text(note.get('transcription', ''))
+    return make_chunks(segments)
+
+
+def embed_chunks(chunks):
+    """Embed the windows' texts in batches; returns a list of vectors."""
+    if not chunks:
+        return []
+    encoder = model_registry.get_encoder()
+    return encoder.encode([chunk['text'] for chunk in chunks], batch_size=EMBED_BATCH_SIZE).tolist()
+
+
+def index_note_chunks(note_id, chunks, embeddings=None):
+    """Replace the chunk vectors of a note."""
+    note_id = str(note_id)
+    collection = model_registry.get_chunk_collection()
+    collection.delete(where={'note_id': note_id})
+    if not chunks:
+        return
+    if embeddings is None:
+        embeddings = embed_chunks(chunks)
+
+    collection.upsert(
+        ids=[f"{note_id}:{chunk['index']}" for chunk in chunks],
+        embeddings=embeddings,
+        # Chroma metadata values cannot be None
+        metadatas=[{
+            'note_id': note_id,
+            'chunk': chunk['index'],
+            'offset': chunk['offset'],
+            'start': chunk['start'] if chunk['start'] is not None else -1.0,
+            'end': chunk['end'] if chunk['end'] is not None else -1.0,
+        } for chunk in chunks],
+        documents=[chunk['text'] for chunk in chunks],
+    )
+
+
+def remove_note_chunks(note_id):
+    model_registry.get_chunk_collection().delete(where={'note_id': str(note_id)})
+
+
+def search_chunks(query_embedding, threshold=1.5, top_k=10, chunks_per_note=3):
+    """
+    Query the chunk collection and aggregate the hits per note. Returns
+    [(note_id, best_distance, hit_chunks)] ordered by best distance, with at most top_k
+    notes and chunks_per_note chunks each (in transcription order).
+    """
+    collection = model_registry.get_chunk_collection()
+    results = collection.query(
+        query_embeddings=[query_embedding],
+        n_results=top_k * chunks_per_note,
+        include=['documents', 'metadatas', 'distances'],
+    )
+
+    hits = {}
+    for document, metadata, distance in zip(results['documents'][0], results['metadatas'][0], results['distances'][0]):
+        if distance is None or distance >= threshold:
+            continue
+        note_hits = hits.setdefault(metadata['note_id'], [])
+        if len(note_hits) < chunks_per_note:
+            note_hits.append({
+                'text': document,
+                'chunk': metadata['chunk'],
+                'offset': metadata['offset'],
+                'start': metadata['start'] if metadata['start'] >= 0 else None,
+                'end': metadata['end'] if metadata['end'] >= 0 else None,
+                'distance': distance,
+            })
+
+    ranked = sorted(hits.items(), key=lambda item: min(hit['distance'] for hit in item[1]))[:top_k]
+    return [
+        (note_id, min(hit['distance'] for hit in note_hits), sorted(note_hits, key=lambda hit: hit['chunk']))
+        for note_id, note_hits in ranked
+    ]
+
+
+def chunk_count():
+    return model_registry.get_chunk_collection().count()
+
+
+def chunked_note_ids(note_ids):
+    """The subset of note_ids that have chunk vectors."""
+    note_ids = [str(note_id) for note_id in note_ids]
+    if not note_ids:
+        return set()
+    results = model_registry.get_chunk_collection().get(where={'note_id': {'$in': note_ids}}, include=['metadatas'])
+    return {metadata['note_id'] for metadata in results['metadatas']}
+
+
+def reindex_all_notes():
+    """(Re)build the chunk vectors of every note; returns the number of notes indexed."""
+    from app.services.notes_service import load_all_notes
+
+    count = 0
+    for note in load_all_notes():
+        index_note_chunks(note['id'], note_chunks(note))
+        count += 1
+    return count
@@ -0,0 +1,104 @@
+"""
+Token-budgeted context for RAG prompts.
+
+Retrieved passages are taken in retrieval order (best score first), sentences already
+present in the context are dropped, and passages are packed until RAG_CONTEXT_TOKENS is
+reached. For notes found through the chunk index only the matched transcription windows
+are packed; when those (or the whole transcription) do not fit in what is left, the
+note's stored summary is used instead. Token counts are an estimate (words and punctuation marks), close enough to
+the model's tokenizer for budgeting.
+"""
+import os
+import re
+
+RAG_CONTEXT_TOKENS = int(os.getenv('RAG_CONTEXT_TOKENS', 3000))
+# Passages whose remaining text would be shorter than this are not worth including
+MIN_PASSAGE_TOKENS = 20
+# A sentence is a duplicate when this share of its word 5-grams is already in the context
+DUPLICATE_OVERLAP = 0.8
+SHINGLE_SIZE = 5
+
+_token_re = re.compile(r"\w+|[^\w\s]")
+_sentence_re = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+def count_tokens(text):
+    return len(_token_re.findall(text))
+
+
+def _shingles(words):
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _dedupe(text, seen):
+    """Drop the sentences of text that are already in the context; returns (text, dropped)."""
+    kept = []
+    dropped = 0
+    for sentence in _sentence_re.split(text):
+        words = re.findall(r"\w+", sentence.lower())
+        if not words:
+            continue
+        shingles = _shingles(words)
+        if len(shingles & seen) >= DUPLICATE_OVERLAP * len(shingles):
+            dropped += 1
+            continue
+        seen |= shingles
+        kept.append(sentence.strip())
+    return " ".join(kept), dropped
+
+
+def pack_context(notes, budget=None):
+    """
+    Build the prompt context from retrieved notes (ordered by retrieval score, optionally
+    carrying 'search_distance'). Returns (context, tokens, decisions), where decisions
+    records for every note what was packed ('chunks', 'transcription', 'summary',
+    'duplicate' or 'skipped') and the token count of the packed text (of the first
+    candidate otherwise).
+    """
+    budget = RAG_CONTEXT_TOKENS if budget is None else budget
+    notes = sorted(notes, key=lambda note: note.get('search_distance', 0.0))
+
+    seen = set()
+    parts = []
+    used = 0
+    decisions = []
+    for note in notes:
+        header = f"Note ID: {note.get('id')}\nNote Date: {note.get('datetime')}\n"
+        header_tokens = count_tokens(header)
+        decision = {'id': note.get('id'), 'score': note.get('search_distance')}
+
+        chosen = None
+        duplicate = False
+        if note.get('matched_chunks'):
+            # Windows overlap, so the shared sentences are dropped by the dedup below
+            candidates = [('chunks', "\n".join(chunk['text'] for chunk in note['matched_chunks']))]
+        else:
+            candidates = [('transcription', note.get('transcription', ''))]
+        candidates.append(('summary', note.get('summary', '')))
+
+        for field, passage in candidates:
+            candidate_seen = set(seen)
+            text, dropped = _dedupe(passage or '', candidate_seen)
+            tokens = count_tokens(text)
+            decision.setdefault('tokens', tokens)
+            if tokens < MIN_PASSAGE_TOKENS and (dropped or not text):
+                duplicate = duplicate or bool(dropped)
+                continue
+            if used + header_tokens + tokens <= budget:
+                chosen = (field, text, tokens, dropped, candidate_seen)
+                break
+
+        if chosen is None:
+            decision['action'] = 'duplicate' if duplicate else 'skipped'
+            decisions.append(decision)
+            continue
+
+        field, text, tokens, dropped, seen = chosen
+        parts.append(f"{header}{text}\n\n")
+        used += header_tokens + tokens
+        decision.update(action=field, tokens=tokens, duplicate_sentences=dropped)
+        decisions.append(decision)
+
+    return "".join(parts), used, decisions
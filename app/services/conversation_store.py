@@ -0,0 +1,252 @@
+"""
+Per-session conversation state for the live chat.
+
+Every browser session gets its own conversation (keyed by an ID kept in the Flask session
+cookie): a running summary of the older exchanges plus the last few turns. Conversations
+expire after CHAT_SESSION_TTL seconds without activity. Two backends are available,
+selected with CHAT_STORE_BACKEND:
+- "sqlite" (default): a local SQLite file shared by all the worker processes,
+- "memory": a dict in the process, for a single worker.
+Once the stored turns exceed CHAT_MAX_TURNS or CHAT_HISTORY_TOKENS, the oldest ones are
+folded into the summary by the LLM in the background, so the history put in each prompt
+stays bounded however long the session runs.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.context_builder import count_tokens
+from app.services.promptLibrary import promptDict
+
+CHAT_STORE_BACKEND = os.getenv('CHAT_STORE_BACKEND', 'sqlite')
+CHAT_STORE_PATH = os.getenv('CHAT_STORE_PATH', 'chat_sessions.sqlite3')
+CHAT_SESSION_TTL = int(os.getenv('CHAT_SESSION_TTL', 2 * 3600))
+# Turns (one student message or one assistant answer) kept verbatim
+CHAT_MAX_TURNS = int(os.getenv('CHAT_MAX_TURNS', 8))
+CHAT_HISTORY_TOKENS = int(os.getenv('CHAT_HISTORY_TOKENS', 1200))
+# Turns kept verbatim after the older ones were summarized
+CHAT_KEEP_TURNS = 4
+# Bound of the in-memory backend
+CHAT_MEMORY_SESSIONS = 1000
+
+
+def _empty_conversation():
+    return {'summary': '', 'turns': []}
+
+
+class MemoryConversationBackend:
+    def __init__(self, ttl=CHAT_SESSION_TTL, max_sessions=CHAT_MEMORY_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _purge(self, now):
+        while self.sessions:
+            session_id, (updated_at, _) = next(iter(self.sessions.items()))
+            if now - updated_at <= self.ttl and len(self.sessions) <= self.max_sessions:
+                break
+            del self.sessions[session_id]
+
+    def load(self, session_id):
+        with self.lock:
+            self._purge(time.time())
+            entry = self.sessions.get(session_id)
+            return json.loads(entry[1]) if entry is not None else _empty_conversation()
+
+    def update(self, session_id, change):
+        """Apply change(conversation) -> conversation atomically."""
+        with self.lock:
+            now = time.time()
+            self._purge(now)
+            entry = self.sessions.pop(session_id, None)
+            conversation = json.loads(entry[1]) if entry is not None else _empty_conversation()
+            conversation = change(conversation)
+            self.sessions[session_id] = (now, json.dumps(conversation))
+            return conversation
+
+    def delete(self, session_id):
+        with self.lock:
+            self.sessions.pop(session_id, None)
+
+    def count(self):
+        with self.lock:
+            self._purge(time.time())
+            return len(self.sessions)
+
+
+class SqliteConversationBackend:
+    def __init__(self, path=CHAT_STORE_PATH, ttl=CHAT_SESSION_TTL):
+        self.path = path
+        self.ttl = ttl
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS conversations (
+                session_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        connection.execute('CREATE INDEX IF NOT EXISTS conversations_updated_at ON conversations (updated_at)')
+        return connection
+
+    def load(self, session_id):
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                'SELECT data FROM conversations WHERE session_id = ? AND updated_at >= ?',
+                (session_id, time.time() - self.ttl),
+            ).fetchone()
+        finally:
+            connection.close()
+        return json.loads(row[0]) if row is not None else _empty_conversation()
+
+    def update(self, session_id, change):
+        """Apply change(conversation) -> conversation atomically, across processes."""
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute('DELETE FROM conversations WHERE updated_at < ?', (now - self.ttl,))
+            row = connection.execute('SELECT data FROM conversations WHERE session_id = ?', (session_id,)).fetchone()
+            conversation = change(json.loads(row[0]) if row is not None else _empty_conversation())
+            connection.execute(
+                'INSERT OR REPLACE INTO conversations (session_id, data, updated_at) VALUES (?, ?, ?)',
+                (session_id, json.dumps(conversation), now),
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            # BEGIN IMMEDIATE itself may have failed (database is locked): nothing to roll back
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            raise
+        finally:
+            connection.close()
+        return conversation
+
+    def delete(self, session_id):
+        connection = self._connect()
+        try:
+            connection.execute('DELETE FROM conversations WHERE session_id = ?', (session_id,))
+        finally:
+            connection.close()
+
+    def count(self):
+        connection = self._connect()
+        try:
+            return connection.execute(
+                'SELECT COUNT(*) FROM conversations WHERE updated_at >= ?', (time.time() - self.ttl,)
+            ).fetchone()[0]
+        finally:
+            connection.close()
+
+
+BACKENDS = {
+    'memory': MemoryConversationBackend,
+    'sqlite': SqliteConversationBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+# Summaries are written after the answer went out, one at a time
+_summarizer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='chat-summary')
+_summarizing = set()
+_summarizing_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = BACKENDS[CHAT_STORE_BACKEND]()
+        return _backend
+
+
+def _history_tokens(conversation):
+    return count_tokens(conversation['summary']) + sum(count_tokens(turn['content']) for turn in conversation['turns'])
+
+
+def needs_summary(conversation):
+    return len(conversation['turns']) > CHAT_MAX_TURNS or _history_tokens(conversation) > CHAT_HISTORY_TOKENS
+
+
+def format_history(conversation):
+    """The conversation as prompt text, or "" for a new conversation."""
+    lines = []
+    if conversation['summary']:
+        lines.append(f"Summary of the earlier conversation: {conversation['summary']}")
+    for turn in conversation['turns']:
+        lines.append(f"{'Student' if turn['role'] == 'user' else 'Assistant'}: {turn['content']}")
+    return "\n".join(lines)
+
+
+def get_history(session_id):
+    conversation = get_backend().load(session_id)
+    # Bounded even while (or if) the summary of the older turns is not written yet
+    conversation['turns'] = conversation['turns'][-CHAT_MAX_TURNS:]
+    return format_history(conversation)
+
+
+def record_exchange(session_id, question, answer):
+    """Append a question and its answer to the session's conversation."""
+    def append(conversation):
+        conversation['turns'] += [
+            {'role': 'user', 'content': question},
+            {'role': 'assistant', 'content': answer},
+        ]
+        return conversation
+
+    conversation = get_backend().update(session_id, append)
+    if needs_summary(conversation):
+        with _summarizing_lock:
+            if session_id in _summarizing:
+                return
+            _summarizing.add(session_id)
+        _summarizer.submit(_summarize, session_id)
+
+
+def _summarize(session_id):
+    from app.services.text_gen_service import call_qwen_endpoint
+
+    try:
+        backend = get_backend()
+        conversation = backend.load(session_id)
+        folded = conversation['turns'][:max(len(conversation['turns']) - CHAT_KEEP_TURNS, 0)]
+        if not folded:
+            return
+        prompt = promptDict['conversationSummary'].format(
+            summary=conversation['summary'] or "N/A",
+            turns=format_history({'summary': '', 'turns': folded}),
+        )
+        summary = call_qwen_endpoint(prompt, max_completion_tokens=512).strip()
+
+        def fold(current):
+            # Turns appended while the summary was written are kept
+            if current['turns'][:len(folded)] == folded:
+                current['summary'] = summary
+                current['turns'] = current['turns'][len(folded):]
+            return current
+
+        backend.update(session_id, fold)
+        print(f"Chat session {session_id}: summarized {len(folded)} turns")
+    except Exception as e:
+        # The turns stay verbatim; the next exchange tries again
+        print(f"Chat session {session_id}: summary failed: {e}")
+    finally:
+        with _summarizing_lock:
+            _summarizing.discard(session_id)
+
+
+def clear_conversation(session_id):
+    get_backend().delete(session_id)
+
+
+def conversation_stats():
+    return {'backend': CHAT_STORE_BACKEND, 'sessions': get_backend().count(), 'ttl': CHAT_SESSION_TTL}
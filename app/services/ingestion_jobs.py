@@ -0,0 +1,344 @@
+"""
+Background ingestion of uploaded/recorded lectures.
+
+The upload endpoints only persist the audio and enqueue a job; a local pool of worker
+threads then runs the job through the stages below, one queue and one set of workers per
+stage, so that e.g. a lecture can be summarized while the next one is being transcribed.
+Job state is kept in SQLite after every stage, so unfinished jobs resume after a restart.
+"""
+import contextlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+from app.services import chunk_index, model_registry
+from app.services import transcription as T
+from app.services import transcription_cache
+from app.services import transcription_pool
+from app.services.transcription_pool import TranscriptionCancelled
+from app.services.notes_service import delete_note, save_note
+from app.services.transcription_information import get_title_summary_tags_from_transcription
+
+JOBS_DB_PATH = 'ingestion_jobs.sqlite3'
+STAGES = ['transcribe', 'extract', 'embed', 'index']
+# Worker threads per stage; transcription and the LLM calls dominate ingestion time
+STAGE_WORKERS = {
+    'transcribe': int(os.getenv('INGESTION_TRANSCRIBE_WORKERS', 2)),
+    'extract': int(os.getenv('INGESTION_EXTRACT_WORKERS', 2)),
+    'embed': 1,
+    'index': 1,
+}
+
+_stage_queues = {stage: queue.Queue() for stage in STAGES}
+_workers_started = False
+_workers_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _connect():
+    """A connection that commits (or rolls back) and is closed at the end of the with block."""
+    connection = sqlite3.connect(JOBS_DB_PATH, timeout=30)
+    try:
+        with connection:
+            _init_db(connection)
+            yield connection
+    finally:
+        connection.close()
+
+
+def _init_db(connection):
+    connection.row_factory = sqlite3.Row
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            note_id TEXT NOT NULL,
+            audio_path TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            status TEXT NOT NULL,
+            worker_pid INTEGER,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            timings TEXT NOT NULL DEFAULT '{}',
+            error TEXT,
+            note TEXT NOT NULL DEFAULT '{}',
+            state TEXT NOT NULL DEFAULT '{}'
+        )
+    """)
+
+
+def _pid_alive(pid):
+    if os.name == 'nt':
+        # os.kill(pid, 0) would terminate the process on Windows
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        exit_code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+        kernel32.CloseHandle(handle)
+        return exit_code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _load_job(job_id):
+    with _connect() as connection:
+        return connection.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+
+
+def _job_to_dict(row):
+    return {
+        'job_id': row['id'],
+        'note_id': row['note_id'],
+        'stage': row['stage'],
+        'status': row['status'],
+        'timings': json.loads(row['timings']),
+        'error': row['error'],
+        'created_at': row['created_at'],
+        'updated_at': row['updated_at'],
+    }
+
+
+def enqueue_ingestion(note_id, audio_path, note_fields, transcription=None, segments=None):
+    """
+    Record a new ingestion job for an audio file already saved in the note directory.
+    `note_fields` holds the fields known up front (id, datetime, original_filename...).
+    When the transcription is already known (live transcription of a recording), the
+    job starts at the extract stage.
+    """
+    start_workers()
+
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    stage = STAGES[0]
+    state = {}
+    if transcription:
+        stage = 'extract'
+        state = {'transcription': transcription, 'segments': segments or []}
+    with _connect() as connection:
+        connection.execute(
+            'INSERT INTO jobs (id, note_id, audio_path, stage, status, worker_pid, created_at, updated_at, note, state) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (job_id, str(note_id), str(audio_path), stage, 'queued', os.getpid(), now, now,
+             json.dumps(note_fields), json.dumps(state)),
+        )
+    _stage_queues[stage].put(job_id)
+    return job_id
+
+
+def get_job(job_id):
+    row = _load_job(job_id)
+    return _job_to_dict(row) if row is not None else None
+
+
+def list_jobs(limit=50):
+    with _connect() as connection:
+        rows = connection.execute('SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?', (limit,)).fetchall()
+    return [_job_to_dict(row) for row in rows]
+
+
+def _transcription_job_id(job_id):
+    return f'ingest-{job_id}'
+
+
+def _chunking_config():
+    # Cached chunk embeddings are only reused with the same model and windows
+    return {'model': model_registry.EMBEDDING_MODEL_NAME, 'words': chunk_index.CHUNK_WORDS,
+            'overlap': chunk_index.CHUNK_OVERLAP_WORDS}
+
+
+def _transcribe_stage(job, state, note):
+    fingerprint, duration, cached = transcription_cache.lookup(job['audio_path'])
+    state['fingerprint'] = fingerprint
+    state['duration'] = duration
+    if cached is not None:
+        # Same audio ingested before: its transcript, metadata and embeddings are reused
+        print(f"Ingestion {job['id']}: transcription cache hit")
+        state.update(cached, cache_hit=True)
+        return
+
+    segments = T.transcribe_segments(job['audio_path'], job_id=_transcription_job_id(job['id']))
+    state['segments'] = segments
+    state['transcription'] = "".join(segment['text'] for segment in segments)
+
+
+def _extract_stage(job, state, note):
+    if state.get('cache_hit'):
+        return
+    title, summary, tags = get_title_summary_tags_from_transcription(state['transcription'])
+    state.update(title=title, summary=summary, tags=tags)
+
+
+def _embed_stage(job, state, note):
+    if state.get('cache_hit') and state.get('chunking') == _chunking_config():
+        return
+    # Jobs persisted before segments were kept fall back to sentence windows
+    segments = state.get('segments') or chunk_index.segments_from_text(state['transcription'])
+    state['chunks'] = chunk_index.make_chunks(segments)
+    state['chunk_embeddings'] = chunk_index.embed_chunks(state['chunks'])
+    state['chunking'] = _chunking_config()
+
+
+def _index_stage(job, state, note):
+    note.update(
+        title=state['title'],
+        summary=state['summary'],
+        tags=state['tags'],
+        transcription=state['transcription'],
+    )
+    if state.get('segments'):
+        note['segments'] = state['segments']
+    save_note(job['note_id'], note)
+
+    if 'chunks' not in state:
+        # Embedded by a version that stored one whole-note vector
+        _embed_stage(job, state, note)
+    chunk_index.index_note_chunks(job['note_id'], state['chunks'], state['chunk_embeddings'])
+    print('Chunk collection count:', chunk_index.chunk_count())
+
+    if state.get('fingerprint') and not state.get('cache_hit'):
+        transcription_cache.store(state['fingerprint'], {
+            field: state.get(field)
+            for field in ('transcription', 'segments', 'title', 'summary', 'tags', 'duration',
+                          'chunks', 'chunk_embeddings', 'chunking')
+        })
+
+
+_STAGE_FUNCTIONS = {
+    'transcribe': _transcribe_stage,
+    'extract': _extract_stage,
+    'embed': _embed_stage,
+    'index': _index_stage,
+}
+
+
+def _run_stage(stage, job_id):
+    # Claim the job for this stage; a job can only be queued once per stage
+    with _connect() as connection:
+        claimed = connection.execute(
+            'UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND stage = ? AND status = ?',
+            ('running', time.time(), job_id, stage, 'queued'),
+        ).rowcount
+    if not claimed:
+        return
+
+    job = _load_job(job_id)
+    state = json.loads(job['state'])
+    note = json.loads(job['note'])
+    timings = json.loads(job['timings'])
+
+    start = time.perf_counter()
+    try:
+        _STAGE_FUNCTIONS[stage](job, state, note)
+    except TranscriptionCancelled:
+        _discard_note(job)
+        return
+    except Exception as e:
+        traceback.print_exc()
+        timings[stage] = round(time.perf_counter() - start, 3)
+        with _connect() as connection:
+            failed = connection.execute(
+                'UPDATE jobs SET status = ?, error = ?, timings = ?, updated_at = ? WHERE id = ? AND status = ?',
+                ('failed', f'{stage}: {e}', json.dumps(timings), time.time(), job_id, 'running'),
+            ).rowcount
+        if not failed:
+            _discard_note(job)
+        return
+    timings[stage] = round(time.perf_counter() - start, 3)
+
+    # Persist the stage output before handing the job to the next stage
+    next_index = STAGES.index(stage) + 1
+    next_stage = STAGES[next_index] if next_index < len(STAGES) else 'done'
+    with _connect() as connection:
+        # A job cancelled while this stage ran stays cancelled
+        advanced = connection.execute(
+            'UPDATE jobs SET stage = ?, status = ?, timings = ?, state = ?, updated_at = ? WHERE id = ? AND status = ?',
+            (next_stage, 'done' if next_stage == 'done' else 'queued', json.dumps(timings),
+             json.dumps(state), time.time(), job_id, 'running'),
+        ).rowcount
+    if not advanced:
+        _discard_note(job)
+    elif next_stage != 'done':
+        _stage_queues[next_stage].put(job_id)
+
+
+def _discard_note(job):
+    """Remove what a cancelled job left behind: the note directory (audio, maybe data.json) and its chunks."""
+    print(f"Ingestion {job['id']} cancelled, removing note {job['note_id']}")
+    delete_note(job['note_id'])
+    if job['stage'] == 'index':
+        chunk_index.remove_note_chunks(job['note_id'])
+
+
+def cancel_job(job_id):
+    """
+    Cancel a queued or running job (stopping its transcription); returns False if it
+    already ended. The note directory of a queued job is removed here, the one of a
+    running job by its stage worker once the stage returns.
+    """
+    now = time.time()
+    with _connect() as connection:
+        queued = connection.execute(
+            'UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?',
+            ('cancelled', now, job_id, 'queued'),
+        ).rowcount
+        running = not queued and connection.execute(
+            'UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?',
+            ('cancelled', now, job_id, 'running'),
+        ).rowcount
+    if queued:
+        _discard_note(_load_job(job_id))
+    elif running:
+        transcription_pool.cancel(_transcription_job_id(job_id))
+    return bool(queued or running)
+
+
+def _stage_worker(stage):
+    while True:
+        job_id = _stage_queues[stage].get()
+        try:
+            _run_stage(stage, job_id)
+        finally:
+            _stage_queues[stage].task_done()
+
+
+def _resume_jobs():
+    """Re-enqueue the unfinished jobs of this process or of processes that are gone."""
+    pid = os.getpid()
+    with _connect() as connection:
+        rows = connection.execute("SELECT * FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+        for row in rows:
+            if row['worker_pid'] != pid and row['worker_pid'] is not None and _pid_alive(row['worker_pid']):
+                continue
+            claimed = connection.execute(
+                'UPDATE jobs SET worker_pid = ?, status = ? WHERE id = ? AND worker_pid IS ?',
+                (pid, 'queued', row['id'], row['worker_pid']),
+            ).rowcount
+            if claimed:
+                _stage_queues[row['stage']].put(row['id'])
+
+
+def start_workers():
+    """Start the stage worker threads (once per process) and resume unfinished jobs."""
+    global _workers_started
+    with _workers_lock:
+        if _workers_started:
+            return
+        _workers_started = True
+
+    for stage in STAGES:
+        for i in range(STAGE_WORKERS[stage]):
+            threading.Thread(target=_stage_worker, args=(stage,), name=f'ingestion-{stage}-{i}', daemon=True).start()
+    _resume_jobs()
@@ -1,32 +1,83 @@
-from collections import defaultdict
-from app.services.notes_service import load_all_notes
-from app.services.tags_service import get_tags_with_counts
+import hashlib
+import json
+import threading
+from collections import OrderedDict
 
-def get_knowledge_map():
+import numpy as np
+
+from app.services.tags_service import (
+    get_all_available_tags,
+    get_tag_index_snapshot,
+    register_tag_listener,
+    tag_index_version,
+)
+
+# Matrice de co-occurrence des tags, indexée par la position du tag dans all_tags.
+# La diagonale contient le nombre de notes de chaque tag.
+_tags = list(get_all_available_tags())
+_tag_positions = {tag: i for i, tag in enumerate(_tags)}
+_cooccurrence = {'version': None, 'matrix': None}
+# Réponses JSON déjà sérialisées, par (min_weight, top_n), valables pour une version donnée
+# (LRU borné : les paramètres viennent du client)
+PAYLOAD_CACHE_SIZE = 32
+_payload_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def _positions(tags):
+    return sorted({_tag_positions[tag] for tag in tags if tag in _tag_positions})
+
+
+def _on_note_tags_changed(old_tags, new_tags, version):
     """
-    Génère une carte des connaissances basée sur les tags des notes.
-    Les nœuds sont les tags, et les liens sont créés entre les tags qui apparaissent ensemble dans les mêmes notes.
+    Met à jour la matrice en place quand les tags d'une note changent.
     """
-    # Récupérer tous les tags avec leurs occurrences
-    tag_counts = get_tags_with_counts()
-    
-    # Créer un dictionnaire pour stocker les relations entre tags
-    tag_relations = defaultdict(lambda: defaultdict(int))
-    
-    # Analyser toutes les notes pour trouver les relations entre tags
-    all_notes = load_all_notes()
-    for note in all_notes:
-        tags = note.get('tags', [])
-        # Pour chaque paire de tags dans la note
-        for i, tag1 in enumerate(tags):
-            for tag2 in tags[i+1:]:
-                if tag1 in tag_counts and tag2 in tag_counts:
-                    tag_relations[tag1][tag2] += 1
-                    tag_relations[tag2][tag1] += 1
-    
+    with _lock:
+        if _cooccurrence['version'] is None or version != _cooccurrence['version'] + 1:
+            # Une modification a été manquée : la matrice sera reconstruite à la prochaine lecture
+            _cooccurrence['version'] = None
+            return
+
+        matrix = _cooccurrence['matrix']
+        old_positions = _positions(old_tags)
+        new_positions = _positions(new_tags)
+        matrix[np.ix_(old_positions, old_positions)] -= 1
+        matrix[np.ix_(new_positions, new_positions)] += 1
+        _cooccurrence['version'] = version
+        _payload_cache.clear()
+
+
+register_tag_listener(_on_note_tags_changed)
+
+
+def _current_matrix():
+    """
+    Retourne (version, matrice), en la reconstruisant depuis l'index des tags si elle est périmée.
+    """
+    version = tag_index_version()
+    with _lock:
+        if _cooccurrence['version'] == version:
+            return version, _cooccurrence['matrix']
+
+    version, note_tags = get_tag_index_snapshot()
+    matrix = np.zeros((len(_tags), len(_tags)), dtype=np.int32)
+    for tags in note_tags.values():
+        positions = _positions(tags)
+        matrix[np.ix_(positions, positions)] += 1
+
+    with _lock:
+        if _cooccurrence['version'] is None or _cooccurrence['version'] < version:
+            _cooccurrence['matrix'] = matrix
+            _cooccurrence['version'] = version
+            _payload_cache.clear()
+        return _cooccurrence['version'], _cooccurrence['matrix']
+
+
+def _build_knowledge_map(matrix, min_weight=1, top_n=None):
     # Créer les nœuds
     nodes = []
-    for tag, count in tag_counts.items():
+    for i, tag in enumerate(_tags):
+        count = int(matrix[i, i])
         if count > 0:  # Ne garder que les tags utilisés
             nodes.append({
                 'id': tag,
@@ -36,27 +87,67 @@ def get_knowledge_map():
                     'size': min(30 + count * 5, 60)  # Taille du nœud basée sur le nombre d'occurrences
                 }
             })
-    
-    # Créer les liens
+
+    # Créer les liens (triangle supérieur, pour éviter les doublons), les plus forts d'abord
+    rows, cols = np.nonzero(np.triu(matrix, k=1) >= max(min_weight, 1))
+    weights = matrix[rows, cols]
+    order = np.argsort(-weights, kind='stable')
+    if top_n is not None:
+        order = order[:top_n]
+
     edges = []
-    processed_pairs = set()  # Pour éviter les doublons
-    
-    for tag1 in tag_relations:
-        for tag2, weight in tag_relations[tag1].items():
-            pair = tuple(sorted([tag1, tag2]))  # Créer une paire ordonnée pour éviter les doublons
-            if pair not in processed_pairs:
-                processed_pairs.add(pair)
-                edges.append({
-                    'from': tag1,
-                    'to': tag2,
-                    'label': str(weight),
-                    'data': {
-                        'weight': weight,
-                        'strength': min(1 + weight * 0.5, 5)  # Épaisseur du lien basée sur le nombre de co-occurrences
-                    }
-                })
-    
+    for k in order:
+        weight = int(weights[k])
+        edges.append({
+            'from': _tags[rows[k]],
+            'to': _tags[cols[k]],
+            'label': str(weight),
+            'data': {
+                'weight': weight,
+                'strength': min(1 + weight * 0.5, 5)  # Épaisseur du lien basée sur le nombre de co-occurrences
+            }
+        })
+
     return {
         'nodes': nodes,
         'edges': edges
-    }
\ No newline at end of file
+    }
+
+
+def get_knowledge_map(min_weight=1, top_n=None):
+    """
+    Génère une carte des connaissances basée sur les tags des notes.
+    Les nœuds sont les tags, et les liens sont créés entre les tags qui apparaissent ensemble dans les mêmes notes.
+    Seuls les liens de poids >= min_weight sont gardés, et au plus top_n d'entre eux si précisé.
+    """
+    _, matrix = _current_matrix()
+    return _build_knowledge_map(matrix, min_weight, top_n)
+
+
+def get_knowledge_map_payload(min_weight=1, top_n=None):
+    """
+    Retourne (payload JSON sérialisé, ETag) pour /api/knowledge-map, mis en cache jusqu'au
+    prochain changement de tags.
+    """
+    version, matrix = _current_matrix()
+    # Normalise les paramètres : tous les seuils au-delà du poids maximal (et toutes les
+    # limites au-delà du nombre de liens possibles) donnent la même carte
+    min_weight = min(max(min_weight, 1), int(np.triu(matrix, k=1).max(initial=0)) + 1)
+    if top_n is not None:
+        top_n = min(max(top_n, 0), len(_tags) * (len(_tags) - 1) // 2)
+    key = (min_weight, top_n)
+    with _lock:
+        cached = _payload_cache.get(key)
+        if cached is not None and cached[0] == version:
+            _payload_cache.move_to_end(key)
+            return cached[1], cached[2]
+
+    payload = json.dumps(_build_knowledge_map(matrix, min_weight, top_n)).encode('utf-8')
+    etag = hashlib.sha1(payload).hexdigest()
+    with _lock:
+        if _cooccurrence['version'] == version:
+            _payload_cache[key] = (version, payload, etag)
+            _payload_cache.move_to_end(key)
+            while len(_payload_cache) > PAYLOAD_CACHE_SIZE:
+                _payload_cache.popitem(last=False)
+    return payload, etag
@@ -0,0 +1,226 @@
+"""
+Incremental transcription of recordings in progress.
+
+The recorder posts the audio as it is captured (PCM16 mono at 16 kHz, a few seconds at a
+time) to /new_entry/stream_audio. Each recording session keeps the audio that is not
+committed yet and runs Whisper over it (with its VAD filter, so silence is skipped) every
+LIVE_MIN_CHUNK_SECONDS of new audio, as interactive jobs of the transcription pool; when
+the pool is saturated the pass is skipped and the next one covers more audio. Words on which two
+consecutive passes agree are committed and their audio is dropped from the window, so
+every pass decodes at most LIVE_WINDOW_SECONDS of audio however long the lecture is. The
+rest of the latest pass is returned as partial text. On save, the remaining audio is
+decoded once and the committed transcript (with timestamps) is handed to the ingestion
+job instead of transcribing the whole recording again.
+
+Sessions live in the process that serves the recording. Every chunk carries the number of
+samples posted before it: a chunk for an unknown session (expired, or served by another
+worker) or that does not follow the audio received so far is refused, the session is
+marked incomplete, and the recorder stops streaming; on save, an incomplete or unknown
+session makes the ingestion job transcribe the file instead.
+"""
+import os
+import re
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from app.services import transcription_pool
+from app.services.transcription_pool import INTERACTIVE, TranscriptionQueueFull
+
+SAMPLE_RATE = 16000
+LIVE_MIN_CHUNK_SECONDS = float(os.getenv('LIVE_MIN_CHUNK_SECONDS', 1.0))
+# Beyond this, the window is cut at the last committed word
+LIVE_WINDOW_SECONDS = float(os.getenv('LIVE_WINDOW_SECONDS', 15))
+# Whisper decodes 30 s at most; older uncommitted words are committed without agreement
+LIVE_MAX_WINDOW_SECONDS = 25
+LIVE_BEAM_SIZE = int(os.getenv('LIVE_BEAM_SIZE', 1))
+LIVE_SESSION_TTL = int(os.getenv('LIVE_SESSION_TTL', 3600))
+# Committed text passed as prompt to keep the vocabulary and style consistent across windows
+PROMPT_CHARS = 200
+SEGMENT_MAX_WORDS = 30
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class LiveSessionIncomplete(Exception):
+    pass
+
+
+def _normalize_word(word):
+    return re.sub(r'[^\w]', '', word.lower())
+
+
+class LiveTranscription:
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.lock = threading.Lock()
+        self.audio = np.zeros(0, dtype=np.float32)
+        # Time (s) of the first sample of self.audio in the recording
+        self.offset = 0.0
+        self.pending_seconds = 0.0
+        # Samples received; a chunk that does not start there means audio was lost
+        self.received_samples = 0
+        self.incomplete = False
+        # Committed words: (start, end, text); hypothesis: uncommitted words of the last pass
+        self.committed = []
+        self.hypothesis = []
+        self.finished = False
+        self.updated_at = time.time()
+
+    def _decode(self, block=False):
+        prompt = "".join(word for _, _, word in self.committed)[-PROMPT_CHARS:]
+        result = transcription_pool.transcribe(
+            self.audio,
+            priority=INTERACTIVE,
+            block=block,
+            mode='sequential',
+            beam_size=LIVE_BEAM_SIZE,
+            word_timestamps=True,
+            vad_filter=True,
+            condition_on_previous_text=False,
+            initial_prompt=prompt or None,
+        )
+        words = []
+        for segment in result['segments']:
+            for word in segment['words']:
+                words.append((self.offset + word['start'], self.offset + word['end'], word['word']))
+        # Words overlapping what is already committed come from the previous window
+        last_end = self.committed[-1][1] if self.committed else 0.0
+        return [word for word in words if word[0] >= last_end - 0.05]
+
+    def _commit(self, words):
+        self.committed.extend(words)
+
+    def _trim(self, duration):
+        """Drop the first `duration` seconds of the window."""
+        cut = int(duration * SAMPLE_RATE)
+        self.audio = self.audio[cut:]
+        self.offset += cut / SAMPLE_RATE
+
+    def feed(self, pcm16, offset=None):
+        """
+        Add PCM16 audio starting at sample `offset` of the recording and, once enough is
+        buffered, run a decoding pass. Raises LiveSessionIncomplete when audio before it is missing.
+        """
+        with self.lock:
+            if self.finished:
+                return self.result()
+            if self.incomplete or (offset is not None and offset != self.received_samples):
+                self.incomplete = True
+                raise LiveSessionIncomplete(f'live session {self.session_id} missed audio '
+                                            f'(chunk at sample {offset}, {self.received_samples} received)')
+            samples = np.frombuffer(pcm16[:len(pcm16) - len(pcm16) % 2], dtype='<i2').astype(np.float32) / 32768.0
+            self.received_samples += len(samples)
+            self.audio = np.concatenate([self.audio, samples])
+            self.pending_seconds += len(samples) / SAMPLE_RATE
+            self.updated_at = time.time()
+            if self.pending_seconds < LIVE_MIN_CHUNK_SECONDS:
+                return self.result()
+            try:
+                words = self._decode()
+            except TranscriptionQueueFull:
+                # Decoded with the next chunk, over a longer window
+                return dict(self.result(), busy=True)
+            self.pending_seconds = 0.0
+            # Local agreement: the common prefix of the last two passes is stable
+            stable = 0
+            while (stable < min(len(words), len(self.hypothesis))
+                   and _normalize_word(words[stable][2]) == _normalize_word(self.hypothesis[stable][2])):
+                stable += 1
+            self._commit(words[:stable])
+            self.hypothesis = words[stable:]
+
+            window_end = self.offset + len(self.audio) / SAMPLE_RATE
+            if window_end - self.offset > LIVE_MAX_WINDOW_SECONDS:
+                # No agreement for too long: commit what is well behind the live edge
+                forced = [word for word in self.hypothesis if word[1] < window_end - LIVE_WINDOW_SECONDS / 2]
+                self._commit(forced)
+                self.hypothesis = self.hypothesis[len(forced):]
+            if window_end - self.offset > LIVE_WINDOW_SECONDS:
+                if self.committed and self.committed[-1][1] > self.offset:
+                    self._trim(self.committed[-1][1] - self.offset)
+                elif not self.hypothesis:
+                    # Nothing but silence in the window
+                    self._trim(window_end - self.offset - 1.0)
+            return self.result()
+
+    def finish(self):
+        """Decode the rest of the window and commit everything."""
+        with self.lock:
+            if not self.finished:
+                if len(self.audio):
+                    self._commit(self._decode(block=True))
+                self.audio = np.zeros(0, dtype=np.float32)
+                self.hypothesis = []
+                self.finished = True
+            return self.result()
+
+    def transcription(self):
+        return "".join(word for _, _, word in self.committed)
+
+    def segments(self):
+        """Committed words grouped into sentence-like segments, as transcribe_segments returns them."""
+        segments = []
+        current = []
+        for word in self.committed:
+            current.append(word)
+            if re.search(r'[.!?]$', word[2].strip()) or len(current) >= SEGMENT_MAX_WORDS:
+                segments.append(current)
+                current = []
+        if current:
+            segments.append(current)
+        return [{'start': words[0][0], 'end': words[-1][1], 'text': "".join(word[2] for word in words)}
+                for words in segments]
+
+    def result(self):
+        return {
+            'session_id': self.session_id,
+            'committed': self.transcription().strip(),
+            'partial': "".join(word for _, _, word in self.hypothesis).strip(),
+            'final': self.finished,
+        }
+
+
+def _purge_expired():
+    now = time.time()
+    with _sessions_lock:
+        for session_id in [s for s, live in _sessions.items() if now - live.updated_at > LIVE_SESSION_TTL]:
+            del _sessions[session_id]
+
+
+def get_session(session_id=None, create=True):
+    """The live transcription of a recording session, created for a new (or no) session_id."""
+    _purge_expired()
+    with _sessions_lock:
+        if session_id in _sessions:
+            return _sessions[session_id]
+        if not create:
+            return None
+        session_id = session_id or uuid.uuid4().hex
+        _sessions[session_id] = LiveTranscription(session_id)
+        return _sessions[session_id]
+
+
+def finish_session(session_id):
+    """
+    Finish and forget a session; returns (transcription, segments), or None if it is
+    unknown or missed audio.
+    """
+    live = get_session(session_id, create=False)
+    if live is None:
+        return None
+    with _sessions_lock:
+        _sessions.pop(session_id, None)
+    if live.incomplete:
+        print(f"Live session {session_id} missed audio, its transcript is not used")
+        return None
+    live.finish()
+    return live.transcription(), live.segments()
+
+
+def discard_session(session_id):
+    with _sessions_lock:
+        _sessions.pop(session_id, None)
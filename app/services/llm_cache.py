@@ -0,0 +1,130 @@
+"""
+Disk-backed cache of LLM responses.
+
+Text generation runs at temperature 0, so the same model, prompt and parameters give the
+same answer; re-ingesting a lecture, rebuilding the collection or asking the same question
+over unchanged notes should not go back to the remote model. Entries are keyed on a hash
+of (model, prompt, generation parameters), expire after LLM_CACHE_TTL seconds and the
+least recently used ones are evicted beyond LLM_CACHE_MAX_ENTRIES.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', 'llm_cache.sqlite3')
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', '1') != '0'
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', 30 * 24 * 3600))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', 10000))
+
+_stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+_stats_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _connect():
+    """A connection that commits (or rolls back) and is closed at the end of the with block."""
+    connection = sqlite3.connect(LLM_CACHE_PATH, timeout=30)
+    try:
+        with connection:
+            _init_db(connection)
+            yield connection
+    finally:
+        connection.close()
+
+
+def _init_db(connection):
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+    """)
+    connection.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+
+
+def _count(name, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def cache_key(model, prompt, **params):
+    payload = json.dumps({'model': model, 'prompt': prompt, 'params': params}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get(key):
+    """Cached response for key, or None on a miss (or if the entry expired)."""
+    now = time.time()
+    with _connect() as connection:
+        row = connection.execute('SELECT response, created_at FROM responses WHERE key = ?', (key,)).fetchone()
+        if row is not None and now - row[1] > LLM_CACHE_TTL:
+            connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+            _count('expired')
+            row = None
+        if row is None:
+            _count('misses')
+            return None
+        connection.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+    _count('hits')
+    return row[0]
+
+
+def put(key, model, response):
+    now = time.time()
+    with _connect() as connection:
+        connection.execute(
+            'INSERT OR REPLACE INTO responses (key, model, response, created_at, last_access) VALUES (?, ?, ?, ?, ?)',
+            (key, model, response, now, now),
+        )
+        # Evict the least recently used entries beyond the size bound
+        evicted = connection.execute(
+            'DELETE FROM responses WHERE key IN ('
+            '  SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?'
+            ')',
+            (LLM_CACHE_MAX_ENTRIES,),
+        ).rowcount
+    if evicted:
+        _count('evictions', evicted)
+
+
+def cached_call(model, prompt, call, use_cache=True, **params):
+    """
+    Return call() through the cache. `params` are the generation parameters that
+    affect the response and are part of the key.
+    """
+    if not (use_cache and LLM_CACHE_ENABLED):
+        return call()
+
+    key = cache_key(model, prompt, **params)
+    response = get(key)
+    if response is None:
+        response = call()
+        put(key, model, response)
+    return response
+
+
+def clear():
+    with _connect() as connection:
+        connection.execute('DELETE FROM responses')
+
+
+def llm_cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else None
+    stats['enabled'] = LLM_CACHE_ENABLED
+    if LLM_CACHE_ENABLED:
+        with _connect() as connection:
+            stats['entries'] = connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+    stats['max_entries'] = LLM_CACHE_MAX_ENTRIES
+    stats['ttl'] = LLM_CACHE_TTL
+    return stats
@@ -0,0 +1,51 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Rendered HTML for summaries of notes saved before summary_html was stored with the note
+SUMMARY_CACHE_SIZE = 256
+_summary_cache = OrderedDict()
+_summary_cache_lock = threading.Lock()
+
+
+def summary_hash(summary):
+    """Content hash used to check that a stored summary_html still matches its summary."""
+    return hashlib.sha256(summary.encode('utf-8')).hexdigest()
+
+
+def render_markdown(text):
+    # Imported lazily so that read paths never load the renderer
+    import markdown
+    return markdown.markdown(text)
+
+
+def render_summary_fields(note):
+    """
+    Render a note's summary once, at ingest time, and store it alongside its hash.
+    """
+    if 'summary' in note:
+        note['summary_html'] = render_markdown(note['summary'])
+        note['summary_hash'] = summary_hash(note['summary'])
+    return note
+
+
+def has_current_summary_html(note):
+    return 'summary_html' in note and note.get('summary_hash') == summary_hash(note['summary'])
+
+
+def cached_summary_html(summary):
+    """
+    Bounded LRU fallback for notes that were written without a stored summary_html.
+    """
+    key = summary_hash(summary)
+    with _summary_cache_lock:
+        if key in _summary_cache:
+            _summary_cache.move_to_end(key)
+            return _summary_cache[key]
+
+    html = render_markdown(summary)
+    with _summary_cache_lock:
+        _summary_cache[key] = html
+        if len(_summary_cache) > SUMMARY_CACHE_SIZE:
+            _summary_cache.popitem(last=False)
+    return html
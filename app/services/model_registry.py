@@ -0,0 +1,158 @@
+"""
+Process-wide registry for the heavy models and clients shared by the blueprints.
+
+Every resource is loaded lazily, once, on first use (thread-safe), and the registry records
+how long each load took and how much resident memory it added, so that workers can be sized.
+"""
+import os
+import threading
+import time
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+CHROMA_PATH = "chroma_data"
+COLLECTION_NAME = "chroma_data"
+# One vector per transcription window, with the parent note in the metadata
+CHUNK_COLLECTION_NAME = "note_chunks"
+WHISPER_MODEL_SIZE = "small"
+# CTranslate2 intra-op threads per transcription (0: its default, 4)
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", 0))
+
+_loaders = {}
+_resources = {}
+_stats = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+
+def _rss_bytes():
+    # Current resident set size; falls back to the peak RSS where /proc is not available,
+    # and to None where neither is (Windows)
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def register(name, loader):
+    """Register a zero-argument loader for a resource."""
+    with _registry_lock:
+        _loaders[name] = loader
+        _locks.setdefault(name, threading.Lock())
+
+
+def get(name):
+    """Return the shared instance of a resource, loading it on first use."""
+    if name in _resources:
+        return _resources[name]
+
+    with _locks[name]:
+        if name not in _resources:
+            rss_before = _rss_bytes()
+            start = time.perf_counter()
+            _resources[name] = _loaders[name]()
+            rss_after = _rss_bytes()
+            _stats[name] = {
+                'load_seconds': round(time.perf_counter() - start, 3),
+                'rss_delta_bytes': max(rss_after - rss_before, 0) if rss_before is not None else None,
+                'loaded_at': time.time(),
+            }
+            rss_delta = _stats[name]['rss_delta_bytes']
+            print(f"Loaded {name} in {_stats[name]['load_seconds']}s"
+                  + (f" (+{rss_delta / 2**20:.0f} MiB RSS)" if rss_delta is not None else ""))
+        return _resources[name]
+
+
+def reset(name):
+    """Drop a resource so that the next get() reloads it (e.g. after recreating a collection)."""
+    with _locks[name]:
+        _resources.pop(name, None)
+
+
+def resource_stats():
+    """Per-resource load time and RSS delta, plus the process RSS, for /api/status/models."""
+    return {
+        'process_rss_bytes': _rss_bytes(),
+        'resources': {
+            name: dict(_stats.get(name, {}), loaded=name in _resources)
+            for name in _loaders
+        },
+    }
+
+
+def _load_encoder():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+
+def _load_chroma_client():
+    import chromadb
+    return chromadb.PersistentClient(path=CHROMA_PATH)
+
+
+def _load_collection():
+    return get_chroma_client().get_or_create_collection(name=COLLECTION_NAME)
+
+
+def _load_chunk_collection():
+    return get_chroma_client().get_or_create_collection(name=CHUNK_COLLECTION_NAME)
+
+
+def load_whisper_model(cpu_threads=WHISPER_CPU_THREADS):
+    from faster_whisper import WhisperModel
+    return WhisperModel(WHISPER_MODEL_SIZE, compute_type="int8", device="auto", cpu_threads=cpu_threads)
+
+
+def load_batched_pipeline(model):
+    """Batched VAD-segmented pipeline over a Whisper model, or None with faster-whisper < 1.1."""
+    try:
+        from faster_whisper import BatchedInferencePipeline
+    except ImportError:
+        return None
+    return BatchedInferencePipeline(model=model)
+
+
+def _load_whisper_model():
+    return load_whisper_model()
+
+
+def _load_whisper_batched():
+    # Shares the weights of the sequential model
+    return load_batched_pipeline(get_whisper_model())
+
+
+register('encoder', _load_encoder)
+register('chroma_client', _load_chroma_client)
+register('collection', _load_collection)
+register('chunk_collection', _load_chunk_collection)
+register('whisper_model', _load_whisper_model)
+register('whisper_batched', _load_whisper_batched)
+
+
+def get_encoder():
+    return get('encoder')
+
+
+def get_chroma_client():
+    return get('chroma_client')
+
+
+def get_collection():
+    return get('collection')
+
+
+def get_chunk_collection():
+    return get('chunk_collection')
+
+
+def get_whisper_model():
+    return get('whisper_model')
+
+
+def get_whisper_batched():
+    return get('whisper_batched')
@@ -1,11 +1,233 @@
+import bisect
 import json
 import os
+import shutil
+import threading
 from datetime import datetime
 import pathlib
 
-import markdown
+from app.services.markdown_service import cached_summary_html, has_current_summary_html, render_summary_fields
 
 NOTES_DIR = pathlib.Path('app') / 'static' / 'notes'
+# Derived indexes live outside NOTES_DIR so that writing them does not bump its mtime
+NOTE_INDEX_DIR = pathlib.Path('note_index')
+RECENCY_INDEX_PATH = 'recency_index.json'
+# Fields sent by list views (gallery, empty search) unless more are requested explicitly
+LIST_FIELDS = ('id', 'title', 'tags', 'datetime')
+
+# Process-wide note catalog: note_id -> (stat signature, parsed note).
+# Each data.json is parsed once and only re-read when its mtime/inode/size changes
+# or when the writer calls invalidate_note() after saving it.
+_catalog = {}
+_catalog_lock = threading.RLock()
+# Cached directory listing, refreshed only when NOTES_DIR's own mtime changes
+_listing = {'mtime_ns': None, 'note_ids': []}
+# Recency index: [sort_key, note_id] pairs in ascending datetime order, persisted to
+# NOTE_INDEX_DIR and tagged with the NOTES_DIR mtime it was last reconciled against
+_recency = {'mtime_ns': None, 'entries': None}
+
+
+def _note_json_path(note_id):
+    return os.path.join(NOTES_DIR, str(note_id), 'data.json')
+
+
+def _stat_signature(path):
+    try:
+        st = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+
+def _get_note(note_id):
+    """
+    Return the catalog entry for a note, parsing its data.json only if it changed on disk.
+    Returns None when the note does not exist.
+    """
+    note_id = str(note_id)
+    path = _note_json_path(note_id)
+    signature = _stat_signature(path)
+
+    with _catalog_lock:
+        if signature is None:
+            _catalog.pop(note_id, None)
+            return None
+
+        cached = _catalog.get(note_id)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+    # Read and parse (Markdown render included) outside the lock, so that a cold read does
+    # not hold up every other catalog user; concurrent readers may parse the same file twice
+    try:
+        with open(path, 'r', encoding='utf-8') as json_file:
+            note = parse_node_dict(json.load(json_file))
+    except FileNotFoundError:
+        with _catalog_lock:
+            _catalog.pop(note_id, None)
+        return None
+
+    with _catalog_lock:
+        _catalog[note_id] = (signature, note)
+    return note
+
+
+def list_note_ids():
+    """
+    List the note directories, re-scanning NOTES_DIR only when a note was added or removed.
+    """
+    signature = _stat_signature(NOTES_DIR)
+    if signature is None:
+        return []
+
+    with _catalog_lock:
+        if _listing['mtime_ns'] != signature[0]:
+            _listing['note_ids'] = [
+                entry.name for entry in os.scandir(NOTES_DIR) if entry.is_dir()
+            ]
+            _listing['mtime_ns'] = signature[0]
+        return list(_listing['note_ids'])
+
+
+def invalidate_note(note_id=None):
+    """
+    Drop a note (or the whole catalog when note_id is None) so the next read reloads it from disk.
+    """
+    with _catalog_lock:
+        if note_id is None:
+            _catalog.clear()
+            _recency['mtime_ns'] = None
+            _recency['entries'] = None
+        else:
+            _catalog.pop(str(note_id), None)
+        _listing['mtime_ns'] = None
+
+
+def _recency_key(note):
+    # Normalise so that lexicographic order matches chronological order
+    return datetime.fromisoformat(note['datetime']).isoformat()
+
+
+def write_index_file(name, payload):
+    os.makedirs(NOTE_INDEX_DIR, exist_ok=True)
+    path = os.path.join(NOTE_INDEX_DIR, name)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as index_file:
+        json.dump(payload, index_file)
+    os.replace(tmp_path, path)
+
+
+def read_index_file(name):
+    try:
+        with open(os.path.join(NOTE_INDEX_DIR, name), 'r', encoding='utf-8') as index_file:
+            return json.load(index_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _recency_entries():
+    """
+    Return the recency index, reconciling it with NOTES_DIR only when notes were added or removed
+    since it was last persisted (by this process or another one).
+    """
+    signature = _stat_signature(NOTES_DIR)
+    if signature is None:
+        return []
+    dir_mtime = signature[0]
+
+    with _catalog_lock:
+        if _recency['entries'] is not None and _recency['mtime_ns'] == dir_mtime:
+            return _recency['entries']
+
+        stored = read_index_file(RECENCY_INDEX_PATH)
+        if stored is not None and stored.get('mtime_ns') == dir_mtime:
+            _recency['entries'] = stored['entries']
+            _recency['mtime_ns'] = dir_mtime
+            return _recency['entries']
+
+        # The index is missing or stale: drop vanished notes and add the new ones
+        entries = stored['entries'] if stored is not None else []
+        on_disk = set(list_note_ids())
+        entries = [entry for entry in entries if entry[1] in on_disk]
+        indexed = {entry[1] for entry in entries}
+        for note_id in on_disk - indexed:
+            note = _get_note(note_id)
+            if note is not None and 'datetime' in note:
+                bisect.insort(entries, [_recency_key(note), note_id])
+
+        _recency['entries'] = entries
+        _recency['mtime_ns'] = dir_mtime
+        write_index_file(RECENCY_INDEX_PATH, {'mtime_ns': dir_mtime, 'entries': entries})
+        return entries
+
+
+def notes_dir_mtime():
+    """mtime of NOTES_DIR, which changes whenever a note directory is added or removed."""
+    signature = _stat_signature(NOTES_DIR)
+    return signature[0] if signature is not None else None
+
+
+def _update_recency_index(note_id, note):
+    # note=None removes the note from the index
+    with _catalog_lock:
+        entries = [entry for entry in _recency_entries() if entry[1] != note_id]
+        if note is not None:
+            bisect.insort(entries, [_recency_key(note), note_id])
+        dir_mtime = notes_dir_mtime()
+
+        _recency['entries'] = entries
+        _recency['mtime_ns'] = dir_mtime
+        write_index_file(RECENCY_INDEX_PATH, {'mtime_ns': dir_mtime, 'entries': entries})
+
+
+def save_note(note_id, note):
+    """
+    Write a note's data.json and refresh the catalog entry, the recency index and the tag index.
+    The Markdown summary is rendered here, once, and stored with the note.
+    """
+    note_id = str(note_id)
+    if 'summary' in note and not has_current_summary_html(note):
+        render_summary_fields(note)
+
+    save_path = os.path.join(NOTES_DIR, note_id)
+    os.makedirs(save_path, exist_ok=True)
+
+    # Written aside and renamed, so that readers never see a half-written data.json
+    json_path = os.path.join(save_path, 'data.json')
+    tmp_path = f'{json_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as json_file:
+        json.dump(note, json_file, indent=4)
+    os.replace(tmp_path, json_path)
+
+    invalidate_note(note_id)
+    saved_note = _get_note(note_id)
+    _update_recency_index(note_id, saved_note)
+
+    from app.services.tags_service import update_note_tags
+    update_note_tags(note_id, saved_note.get('tags', []))
+    return saved_note
+
+
+def delete_note(note_id):
+    """
+    Remove a note directory and drop it from the catalog and the note indexes.
+    """
+    note_id = str(note_id)
+    shutil.rmtree(os.path.join(NOTES_DIR, note_id), ignore_errors=True)
+
+    invalidate_note(note_id)
+    _update_recency_index(note_id, None)
+
+    from app.services.tags_service import remove_note_tags
+    remove_note_tags(note_id)
+
+
+def note_cursor(note):
+    """
+    Opaque paging cursor pointing at a note, to be passed back as `before`.
+    """
+    return f"{_recency_key(note)}|{note['id']}"
+
 
 def load_notes(note_ids=None):
     """
@@ -18,31 +240,62 @@ def load_notes(note_ids=None):
     return notes
 
 
-def load_most_recent_k_notes(k):
+def load_most_recent_k_notes(k, before=None):
+    """
+    Load the most recent k notes based on datetime, optionally only those older than the
+    `before` cursor (see note_cursor). Only the k returned notes are read from disk.
+    """
+    return load_recent_notes_page(k, before)[0]
+
+
+def load_recent_notes_page(k, before=None, note_ids=None):
     """
-    Load the most recent k notes based on datetime.
+    Same as load_most_recent_k_notes, but also returns the cursor for the next (older) page,
+    or None when there are no older notes. `note_ids` restricts the page to those notes.
     """
+    entries = _recency_entries()
+    if note_ids is not None:
+        note_ids = {str(note_id) for note_id in note_ids}
+
+    # Walk the index backwards from the cursor (or from the newest note)
+    if before:
+        sort_key, _, note_id = before.rpartition('|')
+        position = bisect.bisect_left(entries, [sort_key, note_id])
+    else:
+        position = len(entries)
+
     notes = []
+    while position > 0 and len(notes) < k:
+        position -= 1
+        if note_ids is not None and entries[position][1] not in note_ids:
+            continue
+        note = _get_note(entries[position][1])
+        if note is None:
+            continue
+        note = dict(note)
+        note['parsed_datetime'] = datetime.fromisoformat(note['datetime'])
+        notes.append(note)
 
-    # Iterate over each note directory
-    if os.path.exists(NOTES_DIR):
-        for note_id in os.listdir(NOTES_DIR):
-            note_dir = os.path.join(NOTES_DIR, note_id)
-            json_path = os.path.join(note_dir, f'data.json')
+    next_cursor = note_cursor(notes[-1]) if notes and position > 0 else None
+    return notes, next_cursor
 
-            if os.path.isdir(note_dir) and os.path.exists(json_path):
-                # Read the note data from the JSON file
-                with open(json_path, 'r', encoding='utf-8') as json_file:
-                    note = json.load(json_file)
-                    # Parse the datetime for sorting later
-                    note['parsed_datetime'] = datetime.fromisoformat(note['datetime'])
-                    notes.append(parse_node_dict(note))
 
-    # Sort notes by parsed datetime in descending order (most recent first)
-    sorted_notes = sorted(notes, key=lambda x: x['parsed_datetime'], reverse=True)
+def iter_recent_notes(before=None, note_ids=None, page_size=50):
+    """
+    Yield notes from most to least recent, holding at most one page in memory at a time.
+    """
+    while True:
+        notes, before = load_recent_notes_page(page_size, before, note_ids)
+        yield from notes
+        if before is None:
+            return
 
-    # Return the top k notes (or fewer if there are not enough notes)
-    return sorted_notes[:k]
+
+def project_note(note, fields=None):
+    """
+    Keep only the given fields of a note (LIST_FIELDS by default) for list responses.
+    """
+    return {field: note[field] for field in (fields or LIST_FIELDS) if field in note and field != 'parsed_datetime'}
 
 
 def load_note_ids(note_ids):
@@ -51,32 +304,40 @@ def load_note_ids(note_ids):
     """
     notes = []
     for note_id in note_ids:
-        note_path = os.path.join(NOTES_DIR, str(note_id), f'data.json')
-        if os.path.exists(note_path):
-            with open(note_path, 'r', encoding='utf-8') as json_file:
-                note = json.load(json_file)
-                notes.append(parse_node_dict(note))
+        note = _get_note(note_id)
+        if note is not None:
+            # Callers are free to mutate what they get back, so hand out copies
+            notes.append(dict(note))
     return notes
 
 
 def load_all_notes():
     """
-    Load all notes by reading each JSON file in the NOTES_DIR.
+    Load all notes from the catalog, reading from disk only the notes that changed.
     """
-    notes = []
-    if os.path.exists(NOTES_DIR):
-        for note_id in os.listdir(NOTES_DIR):
-            note_dir = os.path.join(NOTES_DIR, note_id)
-            json_path = os.path.join(note_dir, f'data.json')
-            if os.path.isdir(note_dir) and os.path.exists(json_path):
-                with open(json_path, 'r', encoding='utf-8') as json_file:
-                    note = json.load(json_file)
-                    notes.append(parse_node_dict(note))
-    return notes
+    return load_note_ids(list_note_ids())
 
 def parse_node_dict(node_dict):
-    # Convert the Markdown summary to HTML
-    if 'summary' in node_dict.keys():
-        node_dict['summary_html'] = markdown.markdown(node_dict['summary'])
+    # Use the summary HTML rendered at ingest time; older notes go through a bounded LRU
+    if 'summary' in node_dict.keys() and not has_current_summary_html(node_dict):
+        node_dict['summary_html'] = cached_summary_html(node_dict['summary'])
 
-    return node_dict
\ No newline at end of file
+    return node_dict
+
+
+def backfill_summary_html():
+    """
+    Render and store summary_html for notes saved before it was computed at ingest time.
+    Returns the IDs of the notes that were rewritten.
+    """
+    updated = []
+    for note_id in list_note_ids():
+        # Notes still being ingested (or whose ingestion failed) have no data.json yet
+        if not os.path.exists(_note_json_path(note_id)):
+            continue
+        with open(_note_json_path(note_id), 'r', encoding='utf-8') as json_file:
+            note = json.load(json_file)
+        if 'summary' in note and not has_current_summary_html(note):
+            save_note(note_id, note)
+            updated.append(note_id)
+    return updated
@@ -42,6 +42,40 @@ Select the most relevant tags for the following text from this list: {tags}.
 """,
 
 
+    "noteMetadata": """
+You are an expert academic note-taker. From the text below, produce the note's title, summary and tags in a single JSON object.
+
+**Guidelines:**
+- "title": a short, clear title (max 8 words) capturing the main idea. No quotes, emojis, or filler.
+- "summary": concise, well-structured notes in Markdown (headings and bullet points) covering main ideas, definitions, examples, and key arguments. No filler.
+- "tags": the most relevant tags for the text's **main topics**, chosen only from this list: {tags}.
+- Output **only** the JSON object, e.g. {{"title": "...", "summary": "...", "tags": ["..."]}}
+
+**Input:**
+{text}
+
+**JSON:**
+""",
+
+
+    "conversationSummary": """
+You are summarizing a study session between a student and a teaching assistant, so the assistant can keep the context of the conversation.
+
+**Guidelines:**
+- Merge the previous summary and the new exchanges into one summary of at most 150 words.
+- Keep the topics discussed, the questions asked, what the student got right or wrong, and any open question.
+- Plain text only, no preamble.
+
+**Previous Summary:**
+{summary}
+
+**New Exchanges:**
+{turns}
+
+**Summary:**
+""",
+
+
     "teacherMode": """
 You are an expert teacher. Based on the lecture content below, ask the student short, focused questions to test understanding.
 
@@ -1,5 +1,6 @@
-import markdown
-from app.services.text_gen_service import call_qwen_endpoint
+from app.services.context_builder import count_tokens, pack_context
+from app.services.markdown_service import render_markdown
+from app.services.text_gen_service import call_qwen_endpoint, stream_qwen_endpoint
 from app.services.notes_service import load_all_notes
 from app.services.promptLibrary import promptDict
 
@@ -20,7 +21,11 @@ def infer_mode(query: str) -> str:
         return None
 
 
-def build_prompt(context: str, query: str, last_question: str="") -> str:
+# The mode templates point at the Context section instead of repeating the notes
+CONTEXT_REFERENCE = "(the lecture notes in the Context section above)"
+
+
+def build_prompt(context: str, query: str, history: str="") -> str:
         """Construct the full generation prompt dynamically based on inferred mode."""
         mode = infer_mode(query)
         template = promptDict.get(mode, None)
@@ -33,11 +38,11 @@ def build_prompt(context: str, query: str, last_question: str="") -> str:
             # Context
             {context.strip()}
             
-            # Last Assistant Response
-            {last_question.strip() if last_question else "N/A"}
+            # Conversation So Far
+            {history.strip() if history else "N/A"}
 
             # Instruction
-            {template.strip().format(text=context, query=query) if template else ""}
+            {template.strip().format(text=CONTEXT_REFERENCE, query=query, answer=query) if template else ""}
 
             # Student Query
             {query.strip()}
@@ -47,41 +52,61 @@ def build_prompt(context: str, query: str, last_question: str="") -> str:
         return prompt, mode
 
 
-def get_rag_summary(query, matching_notes, markdown=True, last_question=""):
+# Students asking to be quizzed expect new questions each time, so these are never cached
+UNCACHED_MODES = ("teacherMode", "examMode")
+
+
+def build_rag_prompt(query, matching_notes, history=""):
+    """Build the generation prompt (and its mode) for the query with the matching notes as context."""
+    # Step 1: Pack the best matching notes into the context token budget
+    context, context_tokens, decisions = pack_context(matching_notes)
+    for decision in decisions:
+        print(f"RAG context: note {decision['id']} (score {decision['score']}) -> {decision['action']}, "
+              f"{decision.get('tokens', 0)} tokens")
+
+    # Step 2: Format the prompt using the template
+    prompt, mode = build_prompt(context, query, history)
+    print(f"RAG prompt: {count_tokens(prompt)} tokens ({context_tokens} of context, mode {mode})")
+    return prompt, mode
+
+
+def get_rag_summary(query, matching_notes, markdown=True, history="", raise_errors=False):
     """
     Perform a retrieval-augmented generation for the query using the saved notes as context.
 
     Args:
         query (str): The search query.
         matching_notes (List[dict]): List of relevant notes to provide context.
+        history (str): The conversation so far (see conversation_store.get_history).
+        raise_errors (bool): Raise generation errors instead of returning them as the summary.
 
     Returns:
         Tuple[str, list]: Tuple containing the generated summary and the list of relevant notes.
     """
-
-    # Step 1: Prepare context from matching notes
-    if len(matching_notes) == 0:
-        prompt = build_prompt("", query, last_question)[0]
-    else:
-        context = ""
-        for note in matching_notes:
-            transcription = note.get('transcription', '')
-            context += f"Note ID: {note.get('id')}\nNote Date: {note.get('datetime')}\n{transcription}\n\n"
-
-        # Step 2: Format the prompt using the template
-        prompt = build_prompt(context, query, last_question)[0]
+    prompt, mode = build_rag_prompt(query, matching_notes, history)
 
     # Step 3: Call Ollama to get the answer
     try:
-        summary = call_qwen_endpoint(prompt)
+        summary = call_qwen_endpoint(prompt, use_cache=mode not in UNCACHED_MODES)
         #ollama.generate(model="llama3.2:3b", prompt=prompt)  # Adjust model name if necessary
         #summary = response.get("response", "")
     except Exception as e:
+        if raise_errors:
+            raise
         summary = f"An error occurred while generating the summary: {str(e)}"
 
     # Step 4: Return the summary and relevant notes
     summary = summary.replace("\n", "\n\n").replace("\n\n\n\n", "\n\n")
 
     if markdown:
-        return markdown.markdown(summary)
-    return summary
\ No newline at end of file
+        return render_markdown(summary)
+    return summary
+
+
+def stream_rag_summary(query, matching_notes, history=""):
+    """
+    Streaming counterpart of get_rag_summary(markdown=False): yields the plain-text answer
+    as it is generated.
+    """
+    prompt, mode = build_rag_prompt(query, matching_notes, history)
+    yield from stream_qwen_endpoint(prompt, use_cache=mode not in UNCACHED_MODES)
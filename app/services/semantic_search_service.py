@@ -1,19 +1,97 @@
+import threading
+import unicodedata
+from collections import OrderedDict
+
 from app.services.notes_service import load_all_notes, load_note_ids
+from app.services import chunk_index, model_registry
+
+# LRU of query embeddings keyed on (model, normalized query); the gallery sends the same
+# query to /semantic_search and /rag_summary back to back
+QUERY_CACHE_SIZE = 1024
+_query_cache = OrderedDict()
+_query_cache_lock = threading.Lock()
+_query_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def _normalize_query(query):
+    return " ".join(unicodedata.normalize("NFKC", query).split())
+
+
+def embed_queries(queries):
+    """
+    Embed a list of queries, encoding all the cache misses in a single batched call.
+    """
+    keys = [(model_registry.EMBEDDING_MODEL_NAME, _normalize_query(query)) for query in queries]
+    embeddings = {}
+    with _query_cache_lock:
+        for key in keys:
+            if key in _query_cache:
+                _query_cache.move_to_end(key)
+                embeddings[key] = _query_cache[key]
+                _query_cache_stats['hits'] += 1
+            else:
+                _query_cache_stats['misses'] += 1
+
+    missing = list(dict.fromkeys(key for key in keys if key not in embeddings))
+    if missing:
+        encoded = model_registry.get_encoder().encode([key[1] for key in missing])
+        with _query_cache_lock:
+            for key, embedding in zip(missing, encoded):
+                embeddings[key] = _query_cache[key] = embedding.tolist()
+            while len(_query_cache) > QUERY_CACHE_SIZE:
+                _query_cache.popitem(last=False)
+
+    return [embeddings[key] for key in keys]
 
-import chromadb
-from sentence_transformers import SentenceTransformer
 
-# Preload model and client
-collection_name = "chroma_data"
-client = chromadb.PersistentClient(path=collection_name)
-encoder = SentenceTransformer("sentence-transformers/all-mpnet-base-v2")
+def embed_query(query):
+    return embed_queries([query])[0]
+
+
+def query_cache_stats():
+    with _query_cache_lock:
+        lookups = _query_cache_stats['hits'] + _query_cache_stats['misses']
+        return dict(_query_cache_stats, size=len(_query_cache), capacity=QUERY_CACHE_SIZE,
+                    hit_rate=_query_cache_stats['hits'] / lookups if lookups else 0.0)
+
 
 def semantic_search_notes(query, threshold=1.5, top_k=10):
-    # Initialize vector database and encoder
+    # Shared encoder and collection, loaded on first use; repeated queries skip the encoder
+    query_embedding = embed_query(query)
+
+    matching_notes = _search_note_chunks(query_embedding, threshold, top_k) if chunk_index.chunk_count() else []
+    # Notes indexed before chunking (until `flask reindex-chunks` is run) are only in the
+    # whole-note collection; the notes that have chunks are matched on their chunks
+    whole_notes = _search_whole_notes(query_embedding, threshold, top_k)
+    chunked = chunk_index.chunked_note_ids([note['id'] for note in whole_notes])
+    matched = {str(note['id']) for note in matching_notes}
+    matching_notes += [note for note in whole_notes if str(note['id']) not in chunked | matched]
+    matching_notes.sort(key=lambda note: note['search_distance'])
+    return matching_notes[:top_k]
+
+
+def _search_note_chunks(query_embedding, threshold, top_k):
+    """Notes whose transcription windows match, with the matched windows as 'matched_chunks'."""
+    hits = chunk_index.search_chunks(query_embedding, threshold=threshold, top_k=top_k)
+    for note_id, distance, chunks in hits:
+        print(f"ID: {note_id}, Score: {distance}, Chunks: {[chunk['chunk'] for chunk in chunks]}")
+
+    notes = {str(note['id']): note for note in load_note_ids([note_id for note_id, _, _ in hits])}
+    matching_notes = []
+    for note_id, distance, chunks in hits:
+        note = notes.get(note_id)
+        if note is None:
+            continue
+        note['search_distance'] = distance
+        note['matched_chunks'] = chunks
+        # Timestamps of the matches are in the chunks; no need to ship every segment
+        note.pop('segments', None)
+        matching_notes.append(note)
+    return matching_notes
 
-    query_embedding = encoder.encode(query).tolist()
 
-    collection = client.get_or_create_collection(name=collection_name)
+def _search_whole_notes(query_embedding, threshold, top_k):
+    collection = model_registry.get_collection()
     print('Number of vectors in collection:', collection.count())
 
     results = collection.query(
@@ -22,6 +100,7 @@ def semantic_search_notes(query, threshold=1.5, top_k=10):
     )
 
     matching_ids = []
+    distances = {}
     scores = results["distances"][0]
     ids = results["ids"][0]
 
@@ -30,6 +109,12 @@ def semantic_search_notes(query, threshold=1.5, top_k=10):
         print(f"ID: {ids[idx]}, Score: {score}")
         if score is not None and score < threshold:
             matching_ids.append(ids[idx])
+            distances[ids[idx]] = score
 
+    # Keep the retrieval distance so the RAG context can rank what it packs
     matching_notes = load_note_ids(matching_ids)
+    for note in matching_notes:
+        note['search_distance'] = distances[note['id']]
+        # Only notes without a chunk index get here; their segments are not needed either
+        note.pop('segments', None)
     return matching_notes
\ No newline at end of file
@@ -1,28 +1,145 @@
+import threading
+
 from app.services.transcription_information import all_tags
 
+TAG_INDEX_PATH = 'tag_index.json'
+
+# Inverted index tag -> set of note IDs, plus the set of notes it covers. Persisted next to
+# the recency index and reconciled with NOTES_DIR only when notes were added or removed.
+# `version` is bumped on every change so that derived structures can tell they are stale.
+_tag_index = {'mtime_ns': None, 'tags': None, 'note_ids': None, 'version': 0}
+_tag_index_lock = threading.RLock()
+# Callbacks fn(old_tags, new_tags, version) run whenever a single note's tags change
+_tag_listeners = []
+
 
 def get_all_available_tags():
     return all_tags
 
 
+def register_tag_listener(listener):
+    _tag_listeners.append(listener)
+
+
+def _persist_tag_index(dir_mtime):
+    from app.services.notes_service import write_index_file
+    _tag_index['mtime_ns'] = dir_mtime
+    write_index_file(TAG_INDEX_PATH, {
+        'mtime_ns': dir_mtime,
+        'tags': {tag: sorted(ids) for tag, ids in _tag_index['tags'].items() if ids},
+        'note_ids': sorted(_tag_index['note_ids']),
+    })
+
+
+def _set_note_tags(note_id, new_tags):
+    """Move a note to its new tag set in the index and tell the listeners what changed."""
+    tags = _tag_index['tags']
+    old_tags = {tag for tag, ids in tags.items() if note_id in ids}
+    new_tags = set(new_tags)
+
+    for tag in old_tags - new_tags:
+        tags[tag].discard(note_id)
+    for tag in new_tags - old_tags:
+        tags.setdefault(tag, set()).add(note_id)
+
+    _tag_index['version'] += 1
+    for listener in _tag_listeners:
+        listener(old_tags, new_tags, _tag_index['version'])
+
+
+def _get_tag_index():
+    from app.services.notes_service import list_note_ids, load_note_ids, notes_dir_mtime, read_index_file
+
+    dir_mtime = notes_dir_mtime()
+    with _tag_index_lock:
+        if _tag_index['tags'] is not None and _tag_index['mtime_ns'] == dir_mtime:
+            return _tag_index['tags']
+
+        # (Re)load the persisted index unless the in-memory copy is what was last persisted;
+        # listeners have to rebuild from scratch after a reload
+        stored = read_index_file(TAG_INDEX_PATH)
+        stored_mtime = stored.get('mtime_ns') if stored is not None else None
+        if _tag_index['tags'] is None or stored_mtime != _tag_index['mtime_ns']:
+            if stored is not None:
+                _tag_index['tags'] = {tag: set(ids) for tag, ids in stored['tags'].items()}
+                _tag_index['note_ids'] = set(stored['note_ids'])
+            else:
+                _tag_index['tags'] = {}
+                _tag_index['note_ids'] = set()
+            _tag_index['mtime_ns'] = stored_mtime
+            _tag_index['version'] += 1
+
+        if stored_mtime == dir_mtime:
+            return _tag_index['tags']
+
+        # Only the notes added or removed since the index was written need to be looked at
+        on_disk = set(list_note_ids())
+        for note_id in _tag_index['note_ids'] - on_disk:
+            _set_note_tags(note_id, [])
+        for note in load_note_ids(sorted(on_disk - _tag_index['note_ids'])):
+            _set_note_tags(note['id'], note.get('tags', []))
+        _tag_index['note_ids'] = on_disk
+
+        _persist_tag_index(dir_mtime)
+        return _tag_index['tags']
+
+
+def tag_index_version():
+    """Current version of the tag index, refreshing it first if notes were added or removed."""
+    with _tag_index_lock:
+        _get_tag_index()
+        return _tag_index['version']
+
+
+def get_tag_index_snapshot():
+    """
+    Return (version, {note_id: [tags]}) built from the index, without reading any note file.
+    """
+    with _tag_index_lock:
+        note_tags = {}
+        for tag, ids in _get_tag_index().items():
+            for note_id in ids:
+                note_tags.setdefault(note_id, []).append(tag)
+        return _tag_index['version'], note_tags
+
+
+def update_note_tags(note_id, tags):
+    """
+    Record the tags of a note that was just ingested or edited.
+    """
+    from app.services.notes_service import notes_dir_mtime
+
+    note_id = str(note_id)
+    with _tag_index_lock:
+        _get_tag_index()
+        _set_note_tags(note_id, tags)
+        _tag_index['note_ids'].add(note_id)
+        _persist_tag_index(notes_dir_mtime())
+
+
+def remove_note_tags(note_id):
+    """
+    Drop a deleted note from the tag index.
+    """
+    from app.services.notes_service import notes_dir_mtime
+
+    note_id = str(note_id)
+    with _tag_index_lock:
+        _get_tag_index()
+        _set_note_tags(note_id, [])
+        _tag_index['note_ids'].discard(note_id)
+        _persist_tag_index(notes_dir_mtime())
+
+
 def get_tags_with_counts():
-    tags = get_all_available_tags()
-    tag_counts = {tag: 0 for tag in tags}
+    tag_index = _get_tag_index()
+    return {tag: len(tag_index.get(tag, ())) for tag in get_all_available_tags()}
 
-    # Count occurrences of each tag in the notes
-    from app.services.notes_service import load_all_notes
-    all_notes = load_all_notes()
-    for note in all_notes:
-        note_tags = note.get('tags', [])
-        for tag in note_tags:
-            if tag in tag_counts:
-                tag_counts[tag] += 1
 
-    return tag_counts
+def get_note_ids_by_tag(tag):
+    return sorted(_get_tag_index().get(tag, ()))
 
 
 def get_notes_by_tag(tag):
-    from app.services.notes_service import load_all_notes
-    all_notes = load_all_notes()
-    filtered_notes = [note for note in all_notes if tag in note.get('tags', [])]
-    return filtered_notes
\ No newline at end of file
+    from app.services.notes_service import load_note_ids
+    return load_note_ids(get_note_ids_by_tag(tag))
\ No newline at end of file
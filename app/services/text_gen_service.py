@@ -1,6 +1,8 @@
-import openai, base64, os, io, wave, subprocess, re
+import base64, os, io, wave, re, struct
 #FFPEG = "C:/ffmpeg/bin/ffmpeg.exe" 
 from dotenv import load_dotenv
+from app.services import llm_cache
+from app.services.upstream import get_upstream
 
 load_dotenv()
 
@@ -8,36 +10,46 @@ api_key = os.getenv("BOSON_API_KEY")
 if not api_key:
     raise RuntimeError("BOSON_API_KEY is not set.")
 
-client = openai.Client(api_key=api_key, base_url="https://hackathon.boson.ai/v1")
+TTS_MODEL = "higgs-audio-generation-Hackathon"
+TTS_SYSTEM_PROMPT = "Convert the following text from the user into speech. In english please"
 
-def get_audio_response(text_to_say, samplerate=24000):
+def iter_audio_chunks(text_to_say):
     """
-    Streams PCM16 audio from Boson and returns it as WAV bytes (in memory).
+    Streams PCM16 audio (mono, 24 kHz) from Boson, yielding the raw chunks as they arrive.
     """
 
     messages = [
-        {"role": "system", "content": "Convert the following text from the user into speech. In english please"},
+        {"role": "system", "content": TTS_SYSTEM_PROMPT},
         {"role": "user", "content": text_to_say},
     ]
 
-    pcm_buf = bytearray()
-
-    stream = client.chat.completions.create(
-        model="higgs-audio-generation-Hackathon",
+    stream = get_upstream().chat_stream(
+        TTS_MODEL,
         messages=messages,
         modalities=["text", "audio"],
         audio={"format": "pcm16"},  # raw PCM16 chunks
-        stream=True,
         max_completion_tokens=2000,
         stop=["<|end_of_text|>"],
     )
 
     for chunk in stream:
+        if not chunk.choices:
+            continue
         delta = getattr(chunk.choices[0], "delta", None)
         audio = getattr(delta, "audio", None)
-        if not audio or "data" not in audio:
+        # A plain dict with older clients, a typed object with recent ones
+        data = audio.get("data") if isinstance(audio, dict) else getattr(audio, "data", None)
+        if not data:
             continue
-        pcm_buf += base64.b64decode(audio["data"])
+        yield base64.b64decode(data)
+
+def get_audio_response(text_to_say, samplerate=24000):
+    """
+    Streams PCM16 audio from Boson and returns it as WAV bytes (in memory).
+    """
+    pcm_buf = bytearray()
+    for pcm in iter_audio_chunks(text_to_say):
+        pcm_buf += pcm
 
     # Convert to WAV format in-memory
     wav_io = io.BytesIO()
@@ -49,26 +61,33 @@ def get_audio_response(text_to_say, samplerate=24000):
 
     return wav_io.getvalue()  # returns WAV bytes only
 
-def _to_wav_bytes(input_audio: bytes) -> bytes:
-    """Convert arbitrary audio blob -> WAV (pcm_s16le, mono, 24 kHz) using ffmpeg."""
-    proc = subprocess.run(
-        [
-            "ffmpeg",
-            "-hide_banner", "-loglevel", "error",
-            "-i", "pipe:0",
-            "-ac", "1",
-            "-ar", "24000",
-            "-f", "wav",
-            "-acodec", "pcm_s16le",
-            "pipe:1",
-        ],
-        input=input_audio,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        check=True,
+# Data size of a WAV streamed before its length is known; players read until the connection closes
+STREAMING_WAV_DATA_SIZE = 0xFFFFFFFF - 36
 
+def wav_stream_header(samplerate=24000, channels=1, sampwidth=2):
+    """RIFF/WAVE header for PCM16 audio of unknown length."""
+    byte_rate = samplerate * channels * sampwidth
+    return (
+        b"RIFF" + struct.pack("<I", STREAMING_WAV_DATA_SIZE + 36) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, samplerate, byte_rate, channels * sampwidth, sampwidth * 8)
+        + b"data" + struct.pack("<I", STREAMING_WAV_DATA_SIZE)
     )
-    return proc.stdout
+
+def stream_audio_response(text_to_say, samplerate=24000):
+    """
+    Same audio as get_audio_response, as a chunked WAV: the header first, then the PCM
+    frames forwarded as soon as the upstream yields them.
+    """
+    yield wav_stream_header(samplerate)
+
+    # Upstream chunks are not guaranteed to end on a sample boundary
+    pending = b""
+    for pcm in iter_audio_chunks(text_to_say):
+        pcm = pending + pcm
+        cut = len(pcm) - len(pcm) % 2
+        pending = pcm[cut:]
+        if cut:
+            yield pcm[:cut]
 
 def encode_audio_to_base64(file_path: str):
     with open(file_path, "rb") as audio_file: 
@@ -77,8 +96,8 @@ def encode_audio_to_base64(file_path: str):
 def audio_to_txt(audio_path):
     audio = encode_audio_to_base64(audio_path)
 
-    response = client.chat.completions.create(
-        model="higgs-audio-understanding-Hackathon",
+    response = get_upstream().chat(
+        "higgs-audio-understanding-Hackathon",
         messages=[
             {"role": "system", "content": "Transcribe this audio for me. If it sounds like music say there is music playing. If there is a pause, keep listening"},
             {
@@ -101,19 +120,118 @@ def audio_to_txt(audio_path):
     
     return response.choices[0].message.content
 
-def call_qwen_endpoint(prompt):
-    response = client.chat.completions.create(
-        model="Qwen3-14B-Hackathon",
+QWEN_MODEL = "Qwen3-14B-Hackathon"
+
+def call_qwen_endpoint(prompt, max_completion_tokens=2048, use_cache=True):
+    """
+    Generate a completion for the prompt (deterministic, temperature 0). Responses are
+    cached on disk (see llm_cache); pass use_cache=False to always query the model.
+    """
+    def call():
+        response = get_upstream().chat(
+            QWEN_MODEL,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt
+                },
+            ],
+            max_completion_tokens=max_completion_tokens,
+            temperature=0.0,
+        )
+
+        output = response.choices[0].message.content
+
+        return re.sub(r"<think>.*?</think>", "", output, flags=re.DOTALL).strip()
+
+    return llm_cache.cached_call(
+        QWEN_MODEL, prompt, call, use_cache=use_cache,
+        max_completion_tokens=max_completion_tokens, temperature=0.0,
+    )
+
+
+class ThinkFilter:
+    """
+    Incrementally drops <think>...</think> spans from streamed text. Text that could be
+    the start of a tag is held back until the next chunk tells whether it is one.
+    """
+    OPEN, CLOSE = "<think>", "</think>"
+
+    def __init__(self):
+        self.buffer = ""
+        self.thinking = False
+
+    def feed(self, text):
+        self.buffer += text
+        visible = []
+        while self.buffer:
+            tag = self.CLOSE if self.thinking else self.OPEN
+            index = self.buffer.find(tag)
+            if index >= 0:
+                if not self.thinking:
+                    visible.append(self.buffer[:index])
+                self.buffer = self.buffer[index + len(tag):]
+                self.thinking = not self.thinking
+                continue
+
+            # Keep a possible partial tag at the end of the buffer for the next chunk
+            keep = next((n for n in range(min(len(tag) - 1, len(self.buffer)), 0, -1)
+                         if tag.startswith(self.buffer[-n:])), 0)
+            if not self.thinking:
+                visible.append(self.buffer[:len(self.buffer) - keep])
+            self.buffer = self.buffer[len(self.buffer) - keep:]
+            break
+        return "".join(visible)
+
+    def flush(self):
+        rest, self.buffer = ("" if self.thinking else self.buffer), ""
+        return rest
+
+
+def stream_qwen_endpoint(prompt, max_completion_tokens=2048, use_cache=True):
+    """
+    Same as call_qwen_endpoint, but yields the answer text as it is generated, with the
+    <think> spans filtered out on the fly. A cached response is yielded in one piece.
+    """
+    key = llm_cache.cache_key(QWEN_MODEL, prompt, max_completion_tokens=max_completion_tokens, temperature=0.0)
+    cache = use_cache and llm_cache.LLM_CACHE_ENABLED
+    if cache:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    stream = get_upstream().chat_stream(
+        QWEN_MODEL,
         messages=[
             {
                 "role": "user",
                 "content": prompt
             },
         ],
-        max_completion_tokens=2048,
+        max_completion_tokens=max_completion_tokens,
         temperature=0.0,
     )
-    
-    output = response.choices[0].message.content
 
-    return re.sub(r"<think>.*?</think>", "", output, flags=re.DOTALL).strip()
+    think_filter = ThinkFilter()
+    parts = []
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = getattr(chunk.choices[0].delta, "content", None)
+        if not delta:
+            continue
+        text = think_filter.feed(delta)
+        # Same output as call_qwen_endpoint: no leading whitespace once the think span is gone
+        if not parts:
+            text = text.lstrip()
+        if text:
+            parts.append(text)
+            yield text
+    text = think_filter.flush()
+    if text:
+        parts.append(text)
+        yield text
+
+    if cache:
+        llm_cache.put(key, QWEN_MODEL, "".join(parts).strip())
@@ -1,42 +1,184 @@
-from faster_whisper import WhisperModel
-import openai
 import io
 from pydub import AudioSegment
 import os
 import base64
+import re
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from dotenv import load_dotenv
+from app.services import transcription_pool
+from app.services.transcription_pool import BULK, INTERACTIVE
+from app.services.upstream import CircuitOpenError, get_upstream
+from app.services.whisper_worker import WHISPER_SAMPLE_RATE, run_whisper  # noqa: F401 (re-exported)
 
 load_dotenv()
 
-model = WhisperModel("small", compute_type="int8", device="auto")
+# Remote transcription (transcribe2): chunks of about REMOTE_CHUNK_MS cut in silences,
+# REMOTE_MAX_IN_FLIGHT of them sent at a time, each retried REMOTE_CHUNK_RETRIES times
+REMOTE_CHUNK_MS = int(os.getenv("REMOTE_CHUNK_MS", 10000))
+REMOTE_MAX_IN_FLIGHT = int(os.getenv("REMOTE_MAX_IN_FLIGHT", 4))
+REMOTE_CHUNK_RETRIES = int(os.getenv("REMOTE_CHUNK_RETRIES", 2))
+REMOTE_CHUNK_BACKOFF = 1.0
+# Audio repeated on both sides of a cut that does not fall in a silence
+REMOTE_CHUNK_OVERLAP_MS = 500
+REMOTE_SILENCE_MIN_MS = int(os.getenv("REMOTE_SILENCE_MIN_MS", 300))
+# dB below the clip's average level
+REMOTE_SILENCE_THRESH_DB = float(os.getenv("REMOTE_SILENCE_THRESH_DB", 16))
+FRAME_MS = 10
 
-def transcribe(wav_path: str) -> str:
+def decode_audio_bytes(data: bytes) -> np.ndarray:
+    """
+    Decode an audio blob (e.g. the browser's WebM/Opus) in process with PyAV, straight to
+    the mono 16 kHz float32 samples Whisper works on. ffmpeg is only spawned for what
+    PyAV cannot decode.
+    """
+    from faster_whisper.audio import decode_audio
+
+    try:
+        return decode_audio(io.BytesIO(data), sampling_rate=WHISPER_SAMPLE_RATE)
+    except Exception as e:
+        print(f"In-process decoding failed ({e}), falling back to ffmpeg")
+        return _ffmpeg_decode(data)
+
+def _ffmpeg_decode(data: bytes) -> np.ndarray:
+    proc = subprocess.run(
+        [
+            "ffmpeg",
+            "-hide_banner", "-loglevel", "error",
+            "-i", "pipe:0",
+            "-ac", "1",
+            "-ar", str(WHISPER_SAMPLE_RATE),
+            "-f", "f32le",
+            "pipe:1",
+        ],
+        input=data,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+    return np.frombuffer(proc.stdout, dtype=np.float32)
+
+def transcribe_segments(wav_path, priority=BULK, job_id=None) -> list[dict]:
+    """
+    Whisper segments of the recording, as [{'start', 'end', 'text'}] (times in seconds),
+    transcribed on the worker pool. Bulk jobs wait for room in the queue; interactive ones
+    raise TranscriptionQueueFull when it is full.
+    """
     print("Transcription")
-    segments, info = model.transcribe(wav_path, beam_size=5)
-    segments = list(segments)
-    print("Detected language '%s' with probability %f" % (info.language, info.language_probability))
-    ret = "".join(segment.text for segment in segments)
+    if isinstance(wav_path, io.IOBase):
+        # File-likes cannot be sent to the worker processes
+        wav_path = wav_path.read()
+    result = transcription_pool.transcribe(wav_path, priority=priority, job_id=job_id, block=priority == BULK)
+    print("Detected language '%s' with probability %f" % (result["language"], result["language_probability"]))
+    return result["segments"]
+
+def transcribe(wav_path, priority=BULK) -> str:
+    ret = "".join(segment["text"] for segment in transcribe_segments(wav_path, priority=priority))
     #ret = [segment.text for segment in segments]
     return ret
 
-bosonclient = openai.Client(
-    api_key=os.getenv("BOSON_API_KEY"),
-    base_url="https://hackathon.boson.ai/v1"
-)
-
-def process_audio(audio_data):
+def process_audio(audio_data, job_id=None):
     #return update_recording(audio_data)
-    return transcribe(audio_data)
+    # Voice questions go ahead of the lectures being transcribed
+    segments = transcribe_segments(audio_data, priority=INTERACTIVE, job_id=job_id)
+    return "".join(segment["text"] for segment in segments)
 
 
-def transcribe2(audio_path: str, chunk_size: int = 10000) -> list[str]:
-    
-    def segment_to_base64(seg, fmt):
-        # normalize + mono + resample for better ASR stability
-        buf = io.BytesIO()
-        seg.export(buf, format=fmt)
-        return base64.b64encode(buf.getvalue()).decode("utf-8")
-    
+def _silences(audio, min_silence_ms=None, thresh_db=None):
+    """
+    Silent stretches of an AudioSegment as [(start_ms, end_ms)]: runs of at least
+    min_silence_ms of FRAME_MS frames whose level is thresh_db below the clip's average.
+    Computed on the samples with numpy, pydub's detect_silence is far too slow on a lecture.
+    """
+    min_silence_ms = min_silence_ms or REMOTE_SILENCE_MIN_MS
+    thresh_db = REMOTE_SILENCE_THRESH_DB if thresh_db is None else thresh_db
+    if audio.rms == 0:
+        return [(0, len(audio))]
+    samples = np.array(audio.get_array_of_samples(), dtype=np.float32)
+    if audio.channels > 1:
+        samples = samples.reshape(-1, audio.channels).mean(axis=1)
+    frame = max(int(audio.frame_rate * FRAME_MS / 1000), 1)
+    frames = len(samples) // frame
+    if not frames:
+        return []
+    rms = np.sqrt(np.mean(samples[:frames * frame].reshape(frames, frame) ** 2, axis=1))
+    level = 20 * np.log10(np.maximum(rms, 1e-9) / audio.max_possible_amplitude)
+    silent = level < audio.dBFS - thresh_db
+
+    # Start and end frames of the runs of silent frames
+    edges = np.diff(np.concatenate([[0], silent.astype(np.int8), [0]]))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    return [(int(s) * FRAME_MS, int(e) * FRAME_MS) for s, e in zip(starts, ends)
+            if (e - s) * FRAME_MS >= min_silence_ms]
+
+def plan_chunks(audio, chunk_ms, silences=None) -> list[tuple[int, int, bool]]:
+    """
+    Cut points of an AudioSegment as [(start_ms, end_ms, overlaps_previous)]. Each chunk is
+    cut in the middle of the silence closest to chunk_ms from its start, looked for between
+    half and 1.5 times chunk_ms; without a silence there it is cut at chunk_ms and the next
+    chunk starts REMOTE_CHUNK_OVERLAP_MS earlier, so the word cut in half is heard whole once.
+    """
+    silences = _silences(audio) if silences is None else silences
+    chunks = []
+    overlap = min(REMOTE_CHUNK_OVERLAP_MS, chunk_ms // 2)
+    position, overlapping = 0, False
+    while len(audio) - position > chunk_ms:
+        target = position + chunk_ms
+        cuts = [(start + end) // 2 for start, end in silences]
+        cuts = [cut for cut in cuts if position + chunk_ms // 2 <= cut <= min(position + chunk_ms * 3 // 2, len(audio))]
+        if cuts:
+            cut = min(cuts, key=lambda cut: abs(cut - target))
+            chunks.append((position, cut, overlapping))
+            position, overlapping = cut, False
+        else:
+            chunks.append((position, target, overlapping))
+            position, overlapping = target - overlap, True
+    if position < len(audio):
+        chunks.append((position, len(audio), overlapping))
+    return chunks
+
+def _normalize_word(word):
+    return re.sub(r"[^\w]", "", word.lower())
+
+def merge_overlap(previous: str, text: str, max_words: int = 12) -> str:
+    """text without its first words when they repeat the last words of previous."""
+    previous_words = [_normalize_word(word) for word in previous.split()]
+    words = text.split()
+    normalized = [_normalize_word(word) for word in words]
+    for n in range(min(max_words, len(previous_words), len(words)), 0, -1):
+        if normalized[:n] == previous_words[-n:] and any(normalized[:n]):
+            return " ".join(words[n:])
+    return text
+
+def _chunk_to_base64(segment):
+    # mono 16 kHz PCM16 WAV: what the model works on, and the smallest upload
+    buf = io.BytesIO()
+    segment.set_channels(1).set_frame_rate(WHISPER_SAMPLE_RATE).set_sample_width(2).export(buf, format="wav")
+    return base64.b64encode(buf.getvalue()).decode("utf-8")
+
+def _recognize_chunk(index, data):
+    """recognize_audio with retries of the chunk alone (on top of the gateway's own retries)."""
+    for attempt in range(REMOTE_CHUNK_RETRIES + 1):
+        try:
+            return recognize_audio(data)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            if attempt == REMOTE_CHUNK_RETRIES:
+                raise
+            delay = REMOTE_CHUNK_BACKOFF * 2 ** attempt
+            print(f"Chunk {index} failed ({e}), retrying in {delay:.1f} s")
+            time.sleep(delay)
+
+def transcribe2(audio_path: str, chunk_size: int = REMOTE_CHUNK_MS, max_in_flight: int = None) -> list[str]:
+    """
+    Transcribe a WAV or MP3 file with the audio understanding model, in chunks of about
+    chunk_size ms cut in silences (see plan_chunks). Up to max_in_flight chunks are sent at
+    a time; the transcriptions are returned in order, with the words repeated across a hard
+    cut removed from the later chunk.
+    """
     file_format = audio_path.split(".")[-1]
     if file_format.lower() == "wav":
         audio = AudioSegment.from_wav(audio_path)
@@ -45,13 +187,29 @@ def transcribe2(audio_path: str, chunk_size: int = 10000) -> list[str]:
     else:
         raise ValueError("Unsupported audio format. Use WAV or MP3.")
 
+    started = time.perf_counter()
+    chunks = plan_chunks(audio, chunk_size)
+    payloads = [_chunk_to_base64(audio[start:end]) for start, end, _ in chunks]
+
+    executor = ThreadPoolExecutor(max_workers=max(min(max_in_flight or REMOTE_MAX_IN_FLIGHT, len(chunks)), 1),
+                                  thread_name_prefix="remote-transcription")
+    try:
+        futures = [executor.submit(_recognize_chunk, i, data) for i, data in enumerate(payloads)]
+        texts = [future.result() for future in futures]
+    finally:
+        # A chunk that failed for good fails the file: the ones not sent yet are dropped
+        executor.shutdown(wait=True, cancel_futures=True)
+
     chunk_transcriptions = []
+    for (_, _, overlapping), text in zip(chunks, texts):
+        text = (text or "").strip()
+        if overlapping and chunk_transcriptions:
+            text = merge_overlap(chunk_transcriptions[-1], text)
+        chunk_transcriptions.append(text)
 
-    for ms in range(0, len(audio), chunk_size):
-        tmp = segment_to_base64(audio[ms:ms+chunk_size], file_format)
-        transcr = recognize_audio(tmp)
-        chunk_transcriptions.append(transcr)
-            
+    hard_cuts = sum(1 for _, _, overlapping in chunks if overlapping)
+    print(f"Remote transcription: {len(chunks)} chunks ({hard_cuts} cut without silence) "
+          f"of {len(audio) / 1000:.1f} s in {time.perf_counter() - started:.1f} s")
     return chunk_transcriptions
 
 def recognize_audio(chunk):
@@ -62,8 +220,8 @@ def recognize_audio(chunk):
         "Provide accurate transcription and any relevant context."
     )
     
-    response = bosonclient.chat.completions.create(
-        model="higgs-audio-understanding-Hackathon",  # Use understanding model
+    response = get_upstream().chat(
+        "higgs-audio-understanding-Hackathon",  # Use understanding model
         messages=[
             {"role": "system", "content": system_prompt},
             {
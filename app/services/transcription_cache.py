@@ -0,0 +1,201 @@
+"""
+Disk-backed cache of ingestion results, keyed on the audio content.
+
+Uploading the same lecture again should not run Whisper and the LLM extraction again. The
+key is a SHA-256 of the audio decoded to 16 kHz mono PCM16 (plus the Whisper model), so a
+copy in another container or with other metadata (WAV vs FLAC, re-muxed WebM, renamed
+file) still hits; lossy re-encodes change the samples and miss. Decoding a long file takes
+a few seconds, so the hash of the file bytes is remembered too and an identical file is
+recognized without decoding. An entry holds the transcript and its segments, the
+title/summary/tags and the chunk embeddings (reused only with the same embedding model
+and chunking). The least recently used entries are evicted beyond
+TRANSCRIPTION_CACHE_MAX_ENTRIES, and entries older than TRANSCRIPTION_CACHE_TTL expire.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from app.services.model_registry import WHISPER_MODEL_SIZE
+
+TRANSCRIPTION_CACHE_PATH = os.getenv('TRANSCRIPTION_CACHE_PATH', 'transcription_cache.sqlite3')
+TRANSCRIPTION_CACHE_ENABLED = os.getenv('TRANSCRIPTION_CACHE_ENABLED', '1') != '0'
+TRANSCRIPTION_CACHE_MAX_ENTRIES = int(os.getenv('TRANSCRIPTION_CACHE_MAX_ENTRIES', 500))
+TRANSCRIPTION_CACHE_TTL = int(os.getenv('TRANSCRIPTION_CACHE_TTL', 180 * 24 * 3600))
+SAMPLE_RATE = 16000
+
+_stats = {'hits': 0, 'file_hits': 0, 'misses': 0, 'evictions': 0}
+_stats_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _connect():
+    """A connection that commits (or rolls back) and is closed at the end of the with block."""
+    connection = sqlite3.connect(TRANSCRIPTION_CACHE_PATH, timeout=30)
+    try:
+        with connection:
+            _init_db(connection)
+            yield connection
+    finally:
+        connection.close()
+
+
+def _init_db(connection):
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS transcriptions (
+            fingerprint TEXT PRIMARY KEY,
+            entry TEXT NOT NULL,
+            duration REAL,
+            title TEXT,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+    """)
+    connection.execute('CREATE INDEX IF NOT EXISTS transcriptions_last_access ON transcriptions (last_access)')
+    # File bytes hash -> audio fingerprint, to skip decoding identical files
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS files (
+            file_hash TEXT PRIMARY KEY,
+            fingerprint TEXT NOT NULL
+        )
+    """)
+
+
+def _count(name, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def audio_fingerprint(path):
+    """SHA-256 of the audio decoded to 16 kHz mono PCM16, with the Whisper model it is transcribed with."""
+    import numpy as np
+    from faster_whisper.audio import decode_audio
+
+    samples = decode_audio(path, sampling_rate=SAMPLE_RATE)
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+    digest = hashlib.sha256(pcm.tobytes()).hexdigest()
+    return f'{digest}:{WHISPER_MODEL_SIZE}', len(pcm) / SAMPLE_RATE
+
+
+def lookup(path):
+    """
+    (fingerprint, duration, entry) for an audio file, entry being None on a miss. The
+    fingerprint (None if the file could not be decoded) is what to store() the results
+    under; the duration (seconds) is only known when the file was decoded.
+    """
+    if not TRANSCRIPTION_CACHE_ENABLED:
+        return None, None, None
+
+    raw_hash = file_hash(path)
+    with _connect() as connection:
+        row = connection.execute('SELECT fingerprint FROM files WHERE file_hash = ?', (raw_hash,)).fetchone()
+    if row is not None:
+        fingerprint, duration = row[0], None
+        _count('file_hits')
+    else:
+        try:
+            fingerprint, duration = audio_fingerprint(path)
+        except Exception as e:
+            print(f"Transcription cache: could not decode {path}: {e}")
+            return None, None, None
+        with _connect() as connection:
+            connection.execute('INSERT OR REPLACE INTO files (file_hash, fingerprint) VALUES (?, ?)', (raw_hash, fingerprint))
+
+    return fingerprint, duration, get(fingerprint)
+
+
+def get(fingerprint):
+    now = time.time()
+    with _connect() as connection:
+        row = connection.execute('SELECT entry, created_at FROM transcriptions WHERE fingerprint = ?', (fingerprint,)).fetchone()
+        if row is not None and now - row[1] > TRANSCRIPTION_CACHE_TTL:
+            connection.execute('DELETE FROM transcriptions WHERE fingerprint = ?', (fingerprint,))
+            row = None
+        if row is None:
+            _count('misses')
+            return None
+        connection.execute('UPDATE transcriptions SET last_access = ? WHERE fingerprint = ?', (now, fingerprint))
+    _count('hits')
+    return json.loads(row[0])
+
+
+def store(fingerprint, entry):
+    """Store an entry ({'transcription', 'segments', 'title', 'summary', 'tags', ...})."""
+    if not TRANSCRIPTION_CACHE_ENABLED or fingerprint is None:
+        return
+    now = time.time()
+    with _connect() as connection:
+        connection.execute(
+            'INSERT OR REPLACE INTO transcriptions (fingerprint, entry, duration, title, created_at, last_access) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (fingerprint, json.dumps(entry), entry.get('duration'), entry.get('title'), now, now),
+        )
+        evicted = connection.execute(
+            'DELETE FROM transcriptions WHERE fingerprint IN ('
+            '  SELECT fingerprint FROM transcriptions ORDER BY last_access DESC LIMIT -1 OFFSET ?'
+            ')',
+            (TRANSCRIPTION_CACHE_MAX_ENTRIES,),
+        ).rowcount
+        if evicted:
+            connection.execute('DELETE FROM files WHERE fingerprint NOT IN (SELECT fingerprint FROM transcriptions)')
+    if evicted:
+        _count('evictions', evicted)
+
+
+def list_entries():
+    with _connect() as connection:
+        rows = connection.execute(
+            'SELECT fingerprint, title, duration, length(entry), created_at, last_access '
+            'FROM transcriptions ORDER BY last_access DESC'
+        ).fetchall()
+    return [
+        {'fingerprint': row[0], 'title': row[1], 'duration': row[2], 'bytes': row[3],
+         'created_at': row[4], 'last_access': row[5]}
+        for row in rows
+    ]
+
+
+def purge(fingerprint=None, older_than=None):
+    """
+    Delete the entry whose fingerprint starts with `fingerprint`, the entries not used for
+    `older_than` seconds, or everything; returns the number of entries deleted. A prefix
+    that does not match exactly one entry raises ValueError and deletes nothing.
+    """
+    with _connect() as connection:
+        if fingerprint:
+            pattern = fingerprint.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            matches = [row[0] for row in connection.execute(
+                "SELECT fingerprint FROM transcriptions WHERE fingerprint LIKE ? ESCAPE '\\' LIMIT 2", (pattern,))]
+            if len(matches) != 1:
+                raise ValueError(f'{fingerprint!r} matches no cached transcription' if not matches
+                                 else f'{fingerprint!r} matches several cached transcriptions, give a longer prefix')
+            deleted = connection.execute('DELETE FROM transcriptions WHERE fingerprint = ?', (matches[0],)).rowcount
+        elif older_than is not None:
+            deleted = connection.execute('DELETE FROM transcriptions WHERE last_access < ?', (time.time() - older_than,)).rowcount
+        else:
+            deleted = connection.execute('DELETE FROM transcriptions').rowcount
+        connection.execute('DELETE FROM files WHERE fingerprint NOT IN (SELECT fingerprint FROM transcriptions)')
+    return deleted
+
+
+def transcription_cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['enabled'] = TRANSCRIPTION_CACHE_ENABLED
+    if TRANSCRIPTION_CACHE_ENABLED:
+        with _connect() as connection:
+            stats['entries'] = connection.execute('SELECT COUNT(*) FROM transcriptions').fetchone()[0]
+    stats['max_entries'] = TRANSCRIPTION_CACHE_MAX_ENTRIES
+    return stats
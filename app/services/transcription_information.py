@@ -1,6 +1,9 @@
+import json
+import os
 import ollama
 import numpy as np
 import re
+from concurrent.futures import ThreadPoolExecutor
 from app.services.promptLibrary import promptDict
 from app.services.text_gen_service import call_qwen_endpoint
 
@@ -10,24 +13,82 @@ all_tags = ['Maths', 'Science', 'History', 'Art', 'Literature', 'Technology', 'H
             'Marketing', 'Innovation', 'Wellness', 'Fitness', 'Nature', 'Animals', 'Travel', 'Food',
             'Movies', 'Theatre', 'Photography', 'Design', 'AI', 'Sports', 'Fashion', 'Language', 'Other']
 
-def get_title_summary_tags_from_transcription(text):
+# 'sequential': the three prompts one after the other (original behaviour)
+# 'concurrent': the three prompts in parallel on a bounded, process-wide executor
+# 'single': one JSON prompt for title, summary and tags, falling back to 'concurrent'
+#           when the response is not valid JSON of the expected shape
+METADATA_EXTRACTION_MODE = os.getenv('METADATA_EXTRACTION_MODE', 'concurrent')
+# Shared by all ingestion jobs, so this also caps the number of in-flight LLM calls
+METADATA_MAX_WORKERS = int(os.getenv('METADATA_MAX_WORKERS', 6))
+
+_executor = ThreadPoolExecutor(max_workers=METADATA_MAX_WORKERS, thread_name_prefix='metadata')
+
+def get_title_summary_tags_from_transcription(text, mode=None):
     """
-    Recieved the text from the audio note made by the user. Uses ollama along with llama3.2:3b to format the text 
-    using a formatting prompt template to capture all the key points summarizing the important aspects of the text and 
-    then returns the formatted text.
-    Prompt should be such that the key points are captured in the summary and are easy to retrieve when doing retrieval using an 
-    embedding model
+    Recieved the text from the audio note made by the user. Uses the Qwen endpoint to format the text
+    using a formatting prompt template to capture all the key points summarizing the important aspects of the text and
+    then returns the formatted text, along with a title and tags.
+    Prompt should be such that the key points are captured in the summary and are easy to retrieve when doing retrieval using an
+    embedding model.
+    `mode` is one of 'sequential', 'concurrent' or 'single' (see METADATA_EXTRACTION_MODE).
     """
-    formatted_text = call_qwen_endpoint(promptDict['noteTaker'].format(text=text))
-    #formatted_text = ollama.generate(model='llama3.2:3b', prompt=promptDict['noteTaker'].format(text=text))['response']
+    mode = mode or METADATA_EXTRACTION_MODE
+    if mode == 'single':
+        metadata = _extract_single_call(text)
+        if metadata is not None:
+            return metadata
+        print("Single-call metadata extraction returned an invalid response, falling back to concurrent mode")
+        mode = 'concurrent'
 
-    title = call_qwen_endpoint(promptDict['titlePrompt'].format(text=text))
+    prompts = [
+        promptDict['noteTaker'].format(text=text),
+        promptDict['titlePrompt'].format(text=text),
+        promptDict['tagPrompt'].format(text=text, tags=all_tags),
+    ]
+    #formatted_text = ollama.generate(model='llama3.2:3b', prompt=promptDict['noteTaker'].format(text=text))['response']
     #title = ollama.generate(model='llama3.2:3b', prompt=promptDict['titlePrompt'].format(text=text))['response'].replace('"', '')
-
-    tag = call_qwen_endpoint(promptDict['tagPrompt'].format(text=text, tags=all_tags))
     #tag = ollama.generate(model='llama3.2:3b', prompt=promptDict['tagPrompt'].format(text=text, tags=all_tags))['response']
+    if mode == 'concurrent':
+        formatted_text, title, tag = _executor.map(call_qwen_endpoint, prompts)
+    else:
+        formatted_text, title, tag = [call_qwen_endpoint(prompt) for prompt in prompts]
+
+    return title, formatted_text, _parse_tags(tag)
+
 
+def _parse_tags(tag):
     # Extract tags using regex
-    tag_list = list(set([x for x in re.findall(r'\b\w+\b', tag) if x in all_tags]))
+    return list(set([x for x in re.findall(r'\b\w+\b', tag) if x in all_tags]))
+
+
+def _extract_single_call(text):
+    """
+    Ask for title, summary and tags as one JSON object. Returns None if the response
+    cannot be parsed or does not have the expected fields.
+    """
+    response = call_qwen_endpoint(promptDict['noteMetadata'].format(text=text, tags=all_tags), max_completion_tokens=4096)
+
+    # The model sometimes wraps the object in a code fence or adds a sentence around it
+    match = re.search(r'\{.*\}', response, flags=re.DOTALL)
+    if match is None:
+        return None
+    try:
+        metadata = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+
+    if not isinstance(metadata, dict):
+        return None
+    title = metadata.get('title')
+    summary = metadata.get('summary')
+    tags = metadata.get('tags')
+    if not isinstance(title, str) or not title.strip() or not isinstance(summary, str) or not summary.strip():
+        return None
+    if isinstance(tags, str):
+        tags = _parse_tags(tags)
+    elif isinstance(tags, list):
+        tags = list(set(tag for tag in tags if tag in all_tags))
+    else:
+        return None
 
-    return title, formatted_text, tag_list
\ No newline at end of file
+    return title.strip().strip('"'), summary.strip(), tags
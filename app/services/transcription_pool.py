@@ -0,0 +1,288 @@
+"""
+Local Whisper transcription on a pool of worker processes.
+
+Every worker process loads its own Whisper model, so a lecture being transcribed no longer
+holds the model that a live-chat question is waiting for. Jobs come in two priority
+classes: INTERACTIVE (voice questions, live transcription) is always dispatched before
+BULK (uploaded and recorded lectures), and with more than one worker the first one only
+takes interactive jobs, so a question never waits behind a whole lecture. At most
+TRANSCRIBE_QUEUE_SIZE jobs wait per class; beyond that submit() raises
+TranscriptionQueueFull (the routes answer 503). Queued jobs can be cancelled; cancelling a
+running job restarts its worker process. Queue depth and per-class wait/total latencies
+are reported by transcription_stats().
+
+With TRANSCRIBE_PROCESSES=0 jobs run in the calling thread on the shared model. The
+worker processes run app.services.whisper_worker, which does not import the web app.
+"""
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+from app.services.whisper_worker import run_job, worker_main
+
+TRANSCRIBE_PROCESSES = int(os.getenv('TRANSCRIBE_PROCESSES', 2))
+TRANSCRIBE_QUEUE_SIZE = int(os.getenv('TRANSCRIBE_QUEUE_SIZE', 16))
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+PRIORITIES = (INTERACTIVE, BULK)
+# Polling interval of a dispatcher waiting for its worker (cancellation, crashes)
+POLL_SECONDS = 0.2
+
+
+class TranscriptionQueueFull(Exception):
+    pass
+
+
+class TranscriptionCancelled(Exception):
+    pass
+
+
+class TranscriptionError(Exception):
+    pass
+
+
+class TranscriptionJob:
+    def __init__(self, job_id, audio, priority, options):
+        self.id = job_id
+        self.audio = audio
+        self.priority = priority
+        self.options = options
+        self.status = 'queued'
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.output = None
+        self.error = None
+        self.done = threading.Event()
+
+    def _finish(self, status, output=None, error=None):
+        self.status = status
+        self.output = output
+        self.error = error
+        self.finished_at = time.monotonic()
+        self.audio = None
+        self.done.set()
+
+    def result(self, timeout=None):
+        """Wait for the transcription; raises TranscriptionCancelled or TranscriptionError."""
+        if not self.done.wait(timeout):
+            raise TimeoutError(f'transcription {self.id} still {self.status}')
+        if self.status == 'cancelled':
+            raise TranscriptionCancelled(f'transcription {self.id} was cancelled')
+        if self.status == 'failed':
+            raise TranscriptionError(self.error)
+        return self.output
+
+    def to_dict(self):
+        now = time.monotonic()
+        return {
+            'job_id': self.id,
+            'priority': self.priority,
+            'status': self.status,
+            'waited': round((self.started_at or self.finished_at or now) - self.submitted_at, 3),
+            'elapsed': round((self.finished_at or now) - self.submitted_at, 3),
+        }
+
+
+class _Worker:
+    """A worker process and the dispatcher thread feeding it."""
+
+    def __init__(self, pool, index, bulk_allowed):
+        self.pool = pool
+        self.index = index
+        self.bulk_allowed = bulk_allowed
+        self.process = None
+        self.connection = None
+        self.current = None
+        self.jobs_done = 0
+        threading.Thread(target=self._dispatch, name=f'transcription-dispatch-{index}', daemon=True).start()
+
+    def _start_process(self):
+        context = multiprocessing.get_context('spawn')
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=worker_main, args=(child,), name=f'transcription-{self.index}', daemon=True)
+        self.process.start()
+        child.close()
+        message, _ = self.connection.recv()
+        assert message == 'ready'
+
+    def _restart(self):
+        if self.process is not None and self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.process = None
+
+    def _dispatch(self):
+        while True:
+            if self.process is None:
+                try:
+                    self._start_process()
+                except Exception as e:
+                    # Fail the next job rather than leaving its caller waiting forever
+                    print(f'Transcription worker {self.index} failed to start: {e}')
+                    self._restart()
+                    job = self.pool._next_job(self.bulk_allowed)
+                    job._finish('failed', error=f'transcription worker failed to start: {e}')
+                    self.pool._record(job)
+                    time.sleep(1)
+                    continue
+
+            job = self.pool._next_job(self.bulk_allowed)
+            self.current = job
+            try:
+                self.connection.send((job.audio, job.options))
+                while not self.connection.poll(POLL_SECONDS):
+                    if job.status == 'cancelling':
+                        self._restart()
+                        job._finish('cancelled')
+                        break
+                    if not self.process.is_alive():
+                        self._restart()
+                        job._finish('failed', error='transcription worker died')
+                        break
+                else:
+                    status, payload = self.connection.recv()
+                    if status == 'ok':
+                        job._finish('done', output=payload)
+                    else:
+                        job._finish('failed', error=payload)
+            except (EOFError, OSError) as e:
+                self._restart()
+                job._finish('failed', error=f'transcription worker died: {e}')
+            finally:
+                self.current = None
+                self.jobs_done += 1
+                self.pool._record(job)
+
+
+class TranscriptionPool:
+    def __init__(self, processes=TRANSCRIBE_PROCESSES, queue_size=TRANSCRIBE_QUEUE_SIZE):
+        self.processes = processes
+        self.queue_size = queue_size
+        self.queues = {priority: deque() for priority in PRIORITIES}
+        self.jobs = {}
+        self.condition = threading.Condition()
+        self.latencies = {priority: {'wait': deque(maxlen=200), 'total': deque(maxlen=200)} for priority in PRIORITIES}
+        self.counters = {'submitted': 0, 'rejected': 0, 'done': 0, 'failed': 0, 'cancelled': 0}
+        # With several workers, the first one is kept for interactive jobs
+        self.workers = [_Worker(self, i, bulk_allowed=(i > 0 or processes == 1)) for i in range(processes)]
+
+    def submit(self, audio, priority=BULK, job_id=None, block=False, **options):
+        """
+        Queue a transcription and return its TranscriptionJob. When the priority's queue is
+        full, raises TranscriptionQueueFull, or with block=True waits for room.
+        """
+        job = TranscriptionJob(job_id or uuid.uuid4().hex, audio, priority, options)
+        with self.condition:
+            while len(self.queues[priority]) >= self.queue_size:
+                if not block:
+                    self.counters['rejected'] += 1
+                    raise TranscriptionQueueFull(f'{priority} transcription queue is full ({self.queue_size} waiting)')
+                self.condition.wait()
+            self.queues[priority].append(job)
+            self.jobs[job.id] = job
+            self.counters['submitted'] += 1
+            self.condition.notify_all()
+        return job
+
+    def _next_job(self, bulk_allowed):
+        with self.condition:
+            while True:
+                for priority in PRIORITIES:
+                    if priority == BULK and not bulk_allowed:
+                        continue
+                    while self.queues[priority]:
+                        job = self.queues[priority].popleft()
+                        self.condition.notify_all()
+                        if job.status == 'queued':
+                            job.status = 'running'
+                            job.started_at = time.monotonic()
+                            return job
+                self.condition.wait()
+
+    def _record(self, job):
+        with self.condition:
+            self.jobs.pop(job.id, None)
+            self.counters[job.status] += 1
+            if job.started_at is not None:
+                self.latencies[job.priority]['wait'].append(job.started_at - job.submitted_at)
+            self.latencies[job.priority]['total'].append(job.finished_at - job.submitted_at)
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns False if it is unknown or finished."""
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is None or job.done.is_set():
+                return False
+            if job.status == 'queued':
+                job._finish('cancelled')
+                self.jobs.pop(job_id, None)
+                self.counters['cancelled'] += 1
+                self.queues[job.priority].remove(job)
+                self.condition.notify_all()
+            else:
+                job.status = 'cancelling'
+            return True
+
+    def get_job(self, job_id):
+        with self.condition:
+            return self.jobs.get(job_id)
+
+    def stats(self):
+        with self.condition:
+            stats = {
+                'processes': self.processes,
+                'queue_size': self.queue_size,
+                'queued': {priority: len(queue) for priority, queue in self.queues.items()},
+                'running': [worker.current.to_dict() for worker in self.workers if worker.current is not None],
+                'workers_alive': sum(1 for worker in self.workers if worker.process is not None and worker.process.is_alive()),
+                **self.counters,
+            }
+            latencies = {priority: {kind: sorted(values) for kind, values in windows.items()}
+                         for priority, windows in self.latencies.items()}
+        for priority, windows in latencies.items():
+            for kind, values in windows.items():
+                if values:
+                    stats.setdefault('latency', {}).setdefault(priority, {})[kind] = {
+                        'p50': round(values[len(values) // 2], 3),
+                        'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+                        'max': round(values[-1], 3),
+                    }
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The process-wide pool, started on first use (None when TRANSCRIBE_PROCESSES=0)."""
+    global _pool
+    if TRANSCRIBE_PROCESSES <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = TranscriptionPool()
+        return _pool
+
+
+def transcribe(audio, priority=BULK, job_id=None, block=False, timeout=None, **options):
+    """Transcribe through the pool and wait for the result ({'language', 'segments'})."""
+    pool = get_pool()
+    if pool is None:
+        return run_job(audio, **options)
+    return pool.submit(audio, priority=priority, job_id=job_id, block=block, **options).result(timeout)
+
+
+def cancel(job_id):
+    pool = get_pool() if _pool is not None else None
+    return pool.cancel(job_id) if pool is not None else False
+
+
+def transcription_stats():
+    if TRANSCRIBE_PROCESSES <= 0:
+        return {'processes': 0}
+    return _pool.stats() if _pool is not None else {'processes': TRANSCRIBE_PROCESSES, 'started': False}
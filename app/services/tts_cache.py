@@ -0,0 +1,178 @@
+"""
+Content-addressed cache of synthesized speech.
+
+Audio is stored on disk under the hash of everything that determines it (text, TTS model,
+system prompt, sample rate and pipeline options), encoded as TTS_CACHE_FORMAT (MP3 by
+default, WAV when ffmpeg cannot encode it). The directory is capped at TTS_CACHE_MAX_BYTES,
+evicting the least recently used files. Since a key always maps to the same audio, cached
+files can be served as immutable HTTP resources.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+import wave
+
+from app.services.text_gen_service import TTS_MODEL, TTS_SYSTEM_PROMPT
+
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', 'tts_cache')
+TTS_CACHE_MAX_BYTES = int(os.getenv('TTS_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+TTS_CACHE_FORMAT = os.getenv('TTS_CACHE_FORMAT', 'mp3')
+MIMETYPES = {'mp3': 'audio/mpeg', 'ogg': 'audio/ogg', 'wav': 'audio/wav'}
+
+_stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+_lock = threading.Lock()
+
+
+def audio_key(text, **params):
+    payload = json.dumps({
+        'text': text,
+        'model': TTS_MODEL,
+        'system_prompt': TTS_SYSTEM_PROMPT,
+        'params': params,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _find(key):
+    for fmt in MIMETYPES:
+        path = os.path.join(TTS_CACHE_DIR, f'{key}.{fmt}')
+        if os.path.exists(path):
+            return path, fmt
+    return None
+
+
+def lookup(key):
+    """
+    Return (path, format) of the cached audio for key, or None. A hit counts as a use for
+    the LRU eviction.
+    """
+    found = _find(key)
+    with _lock:
+        _stats['hits' if found else 'misses'] += 1
+    if found is not None:
+        try:
+            os.utime(found[0])
+        except FileNotFoundError:
+            return None
+    return found
+
+
+def valid_key(key):
+    return len(key) == 64 and all(c in '0123456789abcdef' for c in key)
+
+
+def get_file(filename):
+    """
+    Absolute path and mimetype of a cached file from its name (<key>.<format>), or None.
+    Absolute because Flask's send_file resolves relative paths against the app package.
+    """
+    key, _, fmt = filename.partition('.')
+    if fmt not in MIMETYPES or not valid_key(key):
+        return None
+    path = os.path.abspath(os.path.join(TTS_CACHE_DIR, filename))
+    if not os.path.exists(path):
+        return None
+    return path, MIMETYPES[fmt]
+
+
+def _write_atomic(path, data):
+    os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.write(data)
+    os.replace(tmp_path, path)
+
+
+def store_text(key, text):
+    """
+    Keep the text of audio that is not synthesized yet next to the cache (<key>.txt), so
+    that any worker process can synthesize it when the browser asks for key.
+    """
+    _write_atomic(os.path.join(TTS_CACHE_DIR, f'{key}.txt'), text.encode('utf-8'))
+
+
+def load_text(key):
+    """Text stored for key by store_text, or None."""
+    if not valid_key(key):
+        return None
+    try:
+        with open(os.path.join(TTS_CACHE_DIR, f'{key}.txt'), encoding='utf-8') as text_file:
+            return text_file.read()
+    except FileNotFoundError:
+        return None
+
+
+def _encode(pcm, samplerate, fmt):
+    if fmt != 'wav':
+        try:
+            from pydub import AudioSegment
+            segment = AudioSegment(data=pcm, sample_width=2, frame_rate=samplerate, channels=1)
+            buffer = io.BytesIO()
+            segment.export(buffer, format=fmt, bitrate='64k')
+            return buffer.getvalue(), fmt
+        except Exception as e:
+            print(f"TTS cache: could not encode {fmt} ({e}), storing WAV")
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(samplerate)
+        wf.writeframes(pcm)
+    return buffer.getvalue(), 'wav'
+
+
+def store(key, pcm, samplerate):
+    """Encode PCM16 mono audio and store it under key. Returns (path, format)."""
+    data, fmt = _encode(pcm, samplerate, TTS_CACHE_FORMAT)
+
+    path = os.path.join(TTS_CACHE_DIR, f'{key}.{fmt}')
+    _write_atomic(path, data)
+    # The audio replaces the text it was waiting to be synthesized from
+    try:
+        os.remove(os.path.join(TTS_CACHE_DIR, f'{key}.txt'))
+    except FileNotFoundError:
+        pass
+
+    with _lock:
+        _stats['stores'] += 1
+    _evict()
+    return path, fmt
+
+
+def _cached_files():
+    files = []
+    for entry in os.scandir(TTS_CACHE_DIR):
+        if entry.is_file() and not entry.name.endswith('.tmp'):
+            st = entry.stat()
+            files.append((st.st_mtime, st.st_size, entry.path))
+    return files
+
+
+def _evict():
+    with _lock:
+        files = sorted(_cached_files())
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= TTS_CACHE_MAX_BYTES:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            _stats['evictions'] += 1
+
+
+def tts_cache_stats():
+    with _lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else None
+    files = _cached_files() if os.path.isdir(TTS_CACHE_DIR) else []
+    stats['entries'] = len(files)
+    stats['bytes'] = sum(size for _, size, _ in files)
+    stats['max_bytes'] = TTS_CACHE_MAX_BYTES
+    return stats
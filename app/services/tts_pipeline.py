@@ -0,0 +1,229 @@
+"""
+Sentence-pipelined speech synthesis for long answers.
+
+Instead of one TTS request for the whole answer, the text is split into sentence-sized
+units that are synthesized concurrently (at most TTS_MAX_IN_FLIGHT per answer, and
+TTS_MAX_WORKERS across the process) and stitched back together in order. The first
+unit is forwarded chunk by chunk as it is generated while the next ones are already
+being synthesized, so playback starts after one sentence and the total time no longer
+grows with the answer length. Finished answers are kept in the TTS cache (tts_cache).
+"""
+import io
+import os
+import queue
+import re
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.services import tts_cache
+from app.services.text_gen_service import iter_audio_chunks, wav_stream_header
+
+SAMPLE_RATE = 24000
+SAMPLE_WIDTH = 2
+TTS_MAX_IN_FLIGHT = int(os.getenv('TTS_MAX_IN_FLIGHT', 4))
+TTS_MAX_WORKERS = int(os.getenv('TTS_MAX_WORKERS', 8))
+# Pause inserted between sentences; when 0, TTS_CROSSFADE_MS of the boundary are cross-faded instead
+TTS_SILENCE_MS = int(os.getenv('TTS_SILENCE_MS', 120))
+TTS_CROSSFADE_MS = int(os.getenv('TTS_CROSSFADE_MS', 0))
+# Sentences shorter than this are merged with the next one, longer units are split on commas/spaces
+MIN_UNIT_CHARS = 40
+MAX_UNIT_CHARS = 300
+
+_executor = ThreadPoolExecutor(max_workers=TTS_MAX_WORKERS, thread_name_prefix='tts')
+# Streamed answers are encoded and stored in the TTS cache after the response is closed
+_store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tts-store')
+_DONE = object()
+
+
+def _split_long(sentence, max_chars):
+    units = []
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(', ', 0, max_chars)
+        if cut < max_chars // 2:
+            cut = sentence.rfind(' ', 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        units.append(sentence[:cut + 1].strip())
+        sentence = sentence[cut + 1:].strip()
+    if sentence:
+        units.append(sentence)
+    return units
+
+
+def split_sentences(text, min_chars=MIN_UNIT_CHARS, max_chars=MAX_UNIT_CHARS):
+    """Split text into sentence-sized units for synthesis."""
+    sentences = [s.strip() for s in re.split(r'(?<=[.!?;:])\s+|\n+', text) if s.strip()]
+
+    units = []
+    pending = ''
+    for sentence in sentences:
+        pending = f'{pending} {sentence}'.strip()
+        if len(pending) >= min_chars:
+            units.extend(_split_long(pending, max_chars))
+            pending = ''
+    if pending:
+        if units and len(units[-1]) + len(pending) < max_chars:
+            units[-1] = f'{units[-1]} {pending}'
+        else:
+            units.append(pending)
+    return units
+
+
+def _synthesize_unit(text, chunks, cancelled):
+    try:
+        if cancelled.is_set():
+            return
+        for chunk in iter_audio_chunks(text):
+            if cancelled.is_set():
+                return
+            chunks.put(chunk)
+    except Exception as e:
+        chunks.put(e)
+    finally:
+        chunks.put(_DONE)
+
+
+def _drain(chunks):
+    """PCM chunks of one unit, in order and cut on sample boundaries."""
+    pending = b''
+    while True:
+        chunk = chunks.get()
+        if chunk is _DONE:
+            return
+        if isinstance(chunk, Exception):
+            raise chunk
+        chunk = pending + chunk
+        cut = len(chunk) - len(chunk) % SAMPLE_WIDTH
+        pending = chunk[cut:]
+        if cut:
+            yield chunk[:cut]
+
+
+def _crossfade(tail, head):
+    n = min(len(tail), len(head)) // SAMPLE_WIDTH
+    a = np.frombuffer(tail[len(tail) - n * SAMPLE_WIDTH:], dtype='<i2').astype(np.float32)
+    b = np.frombuffer(head[:n * SAMPLE_WIDTH], dtype='<i2').astype(np.float32)
+    fade = np.linspace(0.0, 1.0, n, dtype=np.float32)
+    mixed = np.clip(a * (1.0 - fade) + b * fade, -32768, 32767).astype('<i2').tobytes()
+    return tail[:len(tail) - n * SAMPLE_WIDTH] + mixed + head[n * SAMPLE_WIDTH:]
+
+
+def stream_pcm(text, max_in_flight=None, silence_ms=None, crossfade_ms=None):
+    """
+    Yield the answer's PCM16 audio (mono, 24 kHz) in order, synthesizing up to
+    `max_in_flight` sentences ahead of the one being played.
+    """
+    max_in_flight = max_in_flight or TTS_MAX_IN_FLIGHT
+    silence_ms = TTS_SILENCE_MS if silence_ms is None else silence_ms
+    crossfade_ms = TTS_CROSSFADE_MS if crossfade_ms is None else crossfade_ms
+    silence = b'\x00' * (SAMPLE_RATE * silence_ms // 1000 * SAMPLE_WIDTH)
+    crossfade_bytes = 0 if silence else SAMPLE_RATE * crossfade_ms // 1000 * SAMPLE_WIDTH
+
+    units = split_sentences(text)
+    unit_chunks = [queue.Queue() for _ in units]
+    cancelled = threading.Event()
+    submitted = 0
+
+    try:
+        tail = b''
+        for i in range(len(units)):
+            while submitted < len(units) and submitted < i + max_in_flight:
+                _executor.submit(_synthesize_unit, units[submitted], unit_chunks[submitted], cancelled)
+                submitted += 1
+
+            pcm = _drain(unit_chunks[i])
+            if i > 0 and silence:
+                yield silence
+            if tail:
+                # Cross-fade the end of the previous sentence into the start of this one
+                head = b''
+                for chunk in pcm:
+                    head += chunk
+                    if len(head) >= len(tail):
+                        break
+                buffer = _crossfade(tail, head) if head else tail
+            else:
+                buffer = b''
+
+            for chunk in pcm:
+                buffer += chunk
+                if len(buffer) > crossfade_bytes:
+                    cut = len(buffer) - crossfade_bytes
+                    yield buffer[:cut]
+                    buffer = buffer[cut:]
+            if buffer and crossfade_bytes:
+                tail = buffer[-crossfade_bytes:]
+                if buffer[:-crossfade_bytes]:
+                    yield buffer[:-crossfade_bytes]
+            elif buffer:
+                yield buffer
+                tail = b''
+        if tail:
+            yield tail
+    finally:
+        # Stop the remaining syntheses if the client went away
+        cancelled.set()
+
+
+def cache_key(text, silence_ms=None, crossfade_ms=None, **options):
+    return tts_cache.audio_key(
+        text,
+        samplerate=SAMPLE_RATE,
+        silence_ms=TTS_SILENCE_MS if silence_ms is None else silence_ms,
+        crossfade_ms=TTS_CROSSFADE_MS if crossfade_ms is None else crossfade_ms,
+    )
+
+
+def cached_audio(text, **options):
+    """(key, format) of the answer's audio if it is in the TTS cache, else None."""
+    key = cache_key(text, **options)
+    found = tts_cache.lookup(key)
+    return (key, found[1]) if found is not None else None
+
+
+def _store(key, pcm):
+    try:
+        tts_cache.store(key, pcm, SAMPLE_RATE)
+    except Exception as e:
+        print(f"TTS cache: could not store {key}: {e}")
+
+
+def stream_wav(text, cache=True, **options):
+    """
+    stream_pcm as a chunked WAV (header first, then the PCM frames). Once fully streamed,
+    the audio is encoded and added to the TTS cache in the background, so the response
+    does not wait for the encoding.
+    """
+    yield wav_stream_header(SAMPLE_RATE)
+    pcm = []
+    for chunk in stream_pcm(text, **options):
+        pcm.append(chunk)
+        yield chunk
+    if cache:
+        _store_executor.submit(_store, cache_key(text, **options), b''.join(pcm))
+
+
+def synthesize_cached(text, **options):
+    """
+    Make sure the answer's audio is in the TTS cache, synthesizing it only on a miss.
+    Returns (key, format).
+    """
+    cached = cached_audio(text, **options)
+    if cached is not None:
+        return cached
+    key = cache_key(text, **options)
+    return key, tts_cache.store(key, b''.join(stream_pcm(text, **options)), SAMPLE_RATE)[1]
+
+
+def synthesize_wav(text, **options):
+    """The whole answer as WAV bytes, synthesized with the sentence pipeline."""
+    wav_io = io.BytesIO()
+    with wave.open(wav_io, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(SAMPLE_WIDTH)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(b''.join(stream_pcm(text, **options)))
+    return wav_io.getvalue()
@@ -0,0 +1,305 @@
+"""
+Single gateway for every call to the Boson API (text, speech and audio understanding models).
+
+All callers share one OpenAI client over a pooled keep-alive HTTP connection pool, and
+every request goes through:
+- a per-model concurrency limit (UPSTREAM_MODEL_LIMITS, e.g. "Qwen3-14B-Hackathon=8"),
+- a token bucket shared by all models (UPSTREAM_RATE requests/s, bursts of UPSTREAM_BURST),
+- retries with jittered exponential backoff on transient errors (connection errors,
+  timeouts, 429 and 5xx), all within the call's deadline,
+- a per-model circuit breaker that fails fast after UPSTREAM_BREAKER_FAILURES consecutive
+  failures and lets a single trial call through after UPSTREAM_BREAKER_COOLDOWN seconds.
+Per-model request, retry, error and latency counters are reported by upstream_stats().
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import openai
+try:
+    import httpx
+except ImportError:  # recent openai releases ship their HTTP stack as httpx2
+    import httpx2 as httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BOSON_BASE_URL = os.getenv("BOSON_BASE_URL", "https://hackathon.boson.ai/v1")
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", 32))
+UPSTREAM_DEFAULT_LIMIT = int(os.getenv("UPSTREAM_DEFAULT_LIMIT", 8))
+UPSTREAM_MODEL_LIMITS = os.getenv("UPSTREAM_MODEL_LIMITS", "")
+UPSTREAM_RATE = float(os.getenv("UPSTREAM_RATE", 20))
+UPSTREAM_BURST = int(os.getenv("UPSTREAM_BURST", 40))
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", 3))
+UPSTREAM_BACKOFF = float(os.getenv("UPSTREAM_BACKOFF", 0.5))
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", 8))
+UPSTREAM_DEADLINE = float(os.getenv("UPSTREAM_DEADLINE", 180))
+UPSTREAM_BREAKER_FAILURES = int(os.getenv("UPSTREAM_BREAKER_FAILURES", 5))
+UPSTREAM_BREAKER_COOLDOWN = float(os.getenv("UPSTREAM_BREAKER_COOLDOWN", 30))
+
+TRANSIENT_ERRORS = (
+    openai.APIConnectionError,  # includes APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class UpstreamError(Exception):
+    pass
+
+
+class CircuitOpenError(UpstreamError):
+    pass
+
+
+class DeadlineExceeded(UpstreamError):
+    pass
+
+
+def _parse_limits(spec):
+    limits = {}
+    for item in spec.split(","):
+        model, _, limit = item.partition("=")
+        if model.strip() and limit.strip():
+            limits[model.strip()] = int(limit)
+    return limits
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, deadline):
+        """Take one token, waiting for it until the deadline (a time.monotonic() value)."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                raise DeadlineExceeded("rate limit wait exceeds the deadline")
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    def __init__(self, failures, cooldown):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def before_call(self):
+        with self.lock:
+            state = self.state
+            if state == "open" or (state == "half-open" and self.trial_running):
+                raise CircuitOpenError("upstream circuit is open")
+            if state == "half-open":
+                self.trial_running = True
+
+    def cancel_trial(self):
+        # The trial call never reached the upstream
+        with self.lock:
+            self.trial_running = False
+
+    def record(self, success):
+        with self.lock:
+            self.trial_running = False
+            if success:
+                self.consecutive = 0
+                self.opened_at = None
+                return
+            self.consecutive += 1
+            if self.opened_at is not None or self.consecutive >= self.failures:
+                self.opened_at = time.monotonic()
+
+
+class ModelStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "successes": 0, "errors": 0, "retries": 0, "rejected": 0, "in_flight": 0}
+        self.latencies = deque(maxlen=500)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def record_latency(self, seconds):
+        with self.lock:
+            self.latencies.append(seconds)
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.counters)
+            latencies = sorted(self.latencies)
+        if latencies:
+            stats["latency_p50"] = round(latencies[len(latencies) // 2], 3)
+            stats["latency_p95"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3)
+            stats["latency_max"] = round(latencies[-1], 3)
+        return stats
+
+
+class UpstreamGateway:
+    def __init__(self, base_url=BOSON_BASE_URL, api_key=None):
+        self.http_client = openai.DefaultHttpxClient(
+            limits=httpx.Limits(
+                max_connections=UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=UPSTREAM_MAX_CONNECTIONS,
+                keepalive_expiry=60,
+            ),
+            timeout=httpx.Timeout(UPSTREAM_DEADLINE, connect=10),
+        )
+        # Retries are done here, with the deadline and the breaker in mind
+        self.client = openai.Client(
+            api_key=api_key or os.getenv("BOSON_API_KEY"),
+            base_url=base_url,
+            http_client=self.http_client,
+            max_retries=0,
+        )
+        self.model_limits = _parse_limits(UPSTREAM_MODEL_LIMITS)
+        self.bucket = TokenBucket(UPSTREAM_RATE, UPSTREAM_BURST)
+        self.semaphores = {}
+        self.breakers = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def _model_state(self, model):
+        with self.lock:
+            if model not in self.semaphores:
+                self.semaphores[model] = threading.BoundedSemaphore(self.model_limits.get(model, UPSTREAM_DEFAULT_LIMIT))
+                self.breakers[model] = CircuitBreaker(UPSTREAM_BREAKER_FAILURES, UPSTREAM_BREAKER_COOLDOWN)
+                self.stats[model] = ModelStats()
+            return self.semaphores[model], self.breakers[model], self.stats[model]
+
+    def _call(self, model, deadline, request, hold_slot=False):
+        """
+        Run request(timeout) with the model's limits, retries and breaker, and return its
+        result. With hold_slot, the model's concurrency slot is kept on success and must be
+        released by the caller.
+        """
+        deadline = time.monotonic() + (deadline or UPSTREAM_DEADLINE)
+        semaphore, breaker, stats = self._model_state(model)
+
+        attempt = 0
+        while True:
+            try:
+                breaker.before_call()
+            except CircuitOpenError:
+                stats.count("rejected")
+                raise
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not semaphore.acquire(timeout=remaining):
+                breaker.cancel_trial()
+                raise DeadlineExceeded(f"no {model} slot before the deadline")
+            stats.count("in_flight")
+            keep_slot = False
+            start = time.monotonic()
+            try:
+                self.bucket.acquire(deadline)
+                stats.count("requests")
+                result = request(max(deadline - time.monotonic(), 0.001))
+            except TRANSIENT_ERRORS as e:
+                stats.count("errors")
+                breaker.record(False)
+                backoff = random.uniform(0, min(UPSTREAM_BACKOFF_MAX, UPSTREAM_BACKOFF * 2 ** attempt))
+                if attempt >= UPSTREAM_RETRIES or time.monotonic() + backoff >= deadline:
+                    raise
+                print(f"Upstream {model}: {type(e).__name__}, retrying in {backoff:.2f}s")
+                stats.count("retries")
+                attempt += 1
+            except DeadlineExceeded:
+                breaker.cancel_trial()
+                raise
+            except Exception as e:
+                stats.count("errors")
+                if isinstance(e, openai.APIStatusError) and e.status_code < 500:
+                    # Client errors (400, 401...): the upstream answered, so it is healthy
+                    breaker.record(True)
+                else:
+                    # Any other failure says nothing about the upstream's health either way
+                    breaker.cancel_trial()
+                raise
+            else:
+                stats.count("successes")
+                breaker.record(True)
+                if hold_slot:
+                    keep_slot = True
+                else:
+                    stats.record_latency(time.monotonic() - start)
+                return result
+            finally:
+                if not keep_slot:
+                    stats.count("in_flight", -1)
+                    semaphore.release()
+            time.sleep(backoff)
+
+    def chat(self, model, deadline=None, **kwargs):
+        """chat.completions.create through the gateway (non-streaming)."""
+        return self._call(model, deadline, lambda timeout: self.client.chat.completions.create(
+            model=model, timeout=timeout, **kwargs
+        ))
+
+    def chat_stream(self, model, deadline=None, **kwargs):
+        """
+        Streaming chat.completions.create through the gateway, yielding the chunks. Opening
+        the stream is retried; once chunks flow, errors are raised to the caller. The
+        model's concurrency slot is held until the stream is consumed or closed.
+        """
+        semaphore, breaker, stats = self._model_state(model)
+        start = time.monotonic()
+        stream = self._call(model, deadline, lambda timeout: self.client.chat.completions.create(
+            model=model, stream=True, timeout=timeout, **kwargs
+        ), hold_slot=True)
+        try:
+            yield from stream
+        finally:
+            stream.close()
+            stats.count("in_flight", -1)
+            semaphore.release()
+            stats.record_latency(time.monotonic() - start)
+
+    def stats_snapshot(self):
+        with self.lock:
+            models = list(self.stats)
+        result = {}
+        for model in models:
+            semaphore, breaker, stats = self._model_state(model)
+            result[model] = stats.snapshot()
+            result[model]["circuit"] = breaker.state
+            result[model]["limit"] = self.model_limits.get(model, UPSTREAM_DEFAULT_LIMIT)
+        return result
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_upstream():
+    """The process-wide gateway, created on first use."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = UpstreamGateway()
+        return _gateway
+
+
+def upstream_stats():
+    return get_upstream().stats_snapshot() if _gateway is not None else {}
@@ -0,0 +1,79 @@
+"""
+Whisper decoding, and the entry point of the transcription pool's worker processes.
+
+Workers are spawned, so they import this module afresh: it only depends on the model
+registry (standard library) and faster-whisper, never on the routes, the LLM clients or
+the vector store, so that a worker carries nothing but its Whisper model.
+"""
+import io
+import os
+
+from app.services.model_registry import (
+    get_whisper_batched,
+    get_whisper_model,
+    load_batched_pipeline,
+    load_whisper_model,
+)
+
+# "batched": speech regions found by VAD are decoded WHISPER_BATCH_SIZE at a time and
+# silence is skipped; "sequential": the whole file in 30 s windows, one after the other
+WHISPER_MODE = os.getenv("WHISPER_MODE", "batched")
+WHISPER_BEAM_SIZE = int(os.getenv("WHISPER_BEAM_SIZE", 5))
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", 8))
+# VAD filter of the sequential mode (the batched mode always splits on VAD); off by
+# default, so that WHISPER_MODE=sequential decodes exactly as before batching
+WHISPER_VAD = os.getenv("WHISPER_VAD", "0") == "1"
+WHISPER_SAMPLE_RATE = 16000
+
+
+def run_whisper(audio, model=None, pipeline=None, mode=None, beam_size=None, batch_size=None, vad_filter=None, **options):
+    """
+    Transcribe a file (or a 16 kHz float32 array) with the given or shared Whisper model;
+    returns (segments, info). Falls back to sequential decoding when the batched pipeline
+    is not available. Other options are passed on to faster-whisper's transcribe().
+    """
+    mode = mode or WHISPER_MODE
+    beam_size = beam_size or WHISPER_BEAM_SIZE
+    vad_filter = WHISPER_VAD if vad_filter is None else vad_filter
+    if mode == "batched":
+        pipeline = pipeline or (get_whisper_batched() if model is None else None)
+        if pipeline is not None:
+            return pipeline.transcribe(audio, beam_size=beam_size, batch_size=batch_size or WHISPER_BATCH_SIZE,
+                                       vad_filter=True, **options)
+    return (model or get_whisper_model()).transcribe(audio, beam_size=beam_size, vad_filter=vad_filter, **options)
+
+
+def _segment_dict(segment, with_words):
+    result = {'start': segment.start, 'end': segment.end, 'text': segment.text}
+    if with_words:
+        result['words'] = [{'start': word.start, 'end': word.end, 'word': word.word} for word in segment.words or []]
+    return result
+
+
+def run_job(audio, model=None, pipeline=None, **options):
+    """Transcribe audio (path, bytes or 16 kHz float32 array); returns {'language', 'segments'}."""
+    if isinstance(audio, bytes):
+        audio = io.BytesIO(audio)
+    segments, info = run_whisper(audio, model=model, pipeline=pipeline, **options)
+    with_words = options.get('word_timestamps', False)
+    return {
+        'language': info.language,
+        'language_probability': info.language_probability,
+        'segments': [_segment_dict(segment, with_words) for segment in segments],
+    }
+
+
+def worker_main(connection):
+    """Worker process: load a model, then transcribe the jobs sent by its dispatcher."""
+    model = load_whisper_model()
+    pipeline = load_batched_pipeline(model)
+    connection.send(('ready', os.getpid()))
+    while True:
+        task = connection.recv()
+        if task is None:
+            return
+        audio, options = task
+        try:
+            connection.send(('ok', run_job(audio, model=model, pipeline=pipeline, **options)))
+        except Exception as e:
+            connection.send(('error', f'{type(e).__name__}: {e}'))
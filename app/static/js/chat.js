@@ -22,32 +22,64 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Ajouter le contrôle audio si disponible
         if (audioUrl && !isUser) {
-            const audio = new Audio(audioUrl);
-            const audioControls = document.createElement('div');
-            audioControls.classList.add('audio-controls');
-            
-            const playButton = document.createElement('button');
-            playButton.classList.add('btn', 'btn-sm', 'btn-link', 'play-audio');
-            playButton.innerHTML = '<i class="fas fa-play"></i>';
-            
-            playButton.addEventListener('click', () => {
-                audio.play().catch(e => console.error('Erreur de lecture manuelle:', e));
-            });
-
-            audio.play().catch(e => console.error('Erreur de lecture automatique:', e));
-            
-            // Déclencher automatiquement la lecture dès que l'audio est chargé
-            audio.addEventListener('canplaythrough', () => {
-                playButton.click();
-                audio.play().catch(e => console.error('Erreur de lecture automatique:', e));
-            }, { once: true });
-            
-            audioControls.appendChild(playButton);
-            messageDiv.appendChild(audioControls);
+            addAudioControls(messageDiv, audioUrl);
         }
         
         chatMessages.appendChild(messageDiv);
         chatMessages.scrollTop = chatMessages.scrollHeight;
+        return messageDiv;
+    }
+
+    function addAudioControls(messageDiv, audioUrl) {
+        const audio = new Audio(audioUrl);
+        const audioControls = document.createElement('div');
+        audioControls.classList.add('audio-controls');
+        
+        const playButton = document.createElement('button');
+        playButton.classList.add('btn', 'btn-sm', 'btn-link', 'play-audio');
+        playButton.innerHTML = '<i class="fas fa-play"></i>';
+        
+        playButton.addEventListener('click', () => {
+            audio.play().catch(e => console.error('Erreur de lecture manuelle:', e));
+        });
+
+        audio.play().catch(e => console.error('Erreur de lecture automatique:', e));
+        
+        // Déclencher automatiquement la lecture dès que l'audio est chargé
+        audio.addEventListener('canplaythrough', () => {
+            playButton.click();
+            audio.play().catch(e => console.error('Erreur de lecture automatique:', e));
+        }, { once: true });
+        
+        audioControls.appendChild(playButton);
+        messageDiv.appendChild(audioControls);
+    }
+
+    // Lit les événements Server-Sent Events d'une réponse fetch
+    async function readEvents(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let event = 'message';
+                let data = '';
+                for (const line of block.split('\n')) {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                }
+                if (data) onEvent(event, JSON.parse(data));
+            }
+        }
     }
 
     // Fonction pour envoyer un message
@@ -55,16 +87,30 @@ document.addEventListener('DOMContentLoaded', function() {
         addMessage(message, true);
         
         try {
-            const response = await fetch('/api/chat', {
+            // La réponse s'affiche au fur et à mesure de sa génération
+            const response = await fetch('/api/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
                 body: JSON.stringify({ message })
             });
-            
-            const data = await response.json();
-            addMessage(data.response, false, data.audioUrl);
+            if (!response.ok) {
+                throw new Error(`Chat request failed: ${response.status}`);
+            }
+
+            const messageDiv = addMessage('', false);
+            const contentDiv = messageDiv.querySelector('.message-content');
+            await readEvents(response, (event, data) => {
+                if (event === 'token') {
+                    contentDiv.textContent += data.text;
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                } else if (event === 'done') {
+                    contentDiv.textContent = data.response;
+                    if (data.audioUrl) addAudioControls(messageDiv, data.audioUrl);
+                    console.log(`First token after ${data.ttft_ms} ms, answer after ${data.total_ms} ms`);
+                }
+            });
         } catch (error) {
             console.error('Error:', error);
             addMessage('Une erreur est survenue. Veuillez réessayer.', false);
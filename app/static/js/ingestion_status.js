@@ -0,0 +1,35 @@
+// Polls an ingestion job (see /new_entry/jobs/<job_id>) until it is done, failed or cancelled.
+// onUpdate is called with the job status after every poll.
+async function waitForIngestionJob(statusUrl, onUpdate, intervalMs = 2000) {
+    const stageLabels = {
+        transcribe: 'Transcribing audio',
+        extract: 'Writing title, summary and tags',
+        embed: 'Computing embeddings',
+        index: 'Indexing note',
+    };
+
+    while (true) {
+        const response = await fetch(statusUrl);
+        if (!response.ok) {
+            throw new Error('Failed to get processing status');
+        }
+
+        const job = await response.json();
+        job.label = stageLabels[job.stage] || job.stage;
+        if (onUpdate) {
+            onUpdate(job);
+        }
+
+        if (job.status === 'done') {
+            return job;
+        }
+        if (job.status === 'failed') {
+            throw new Error(job.error || 'Processing failed');
+        }
+        if (job.status === 'cancelled') {
+            // The note directory is removed on cancel: there is nothing to redirect to
+            throw new Error('Processing cancelled');
+        }
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+}
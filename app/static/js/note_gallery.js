@@ -16,9 +16,14 @@ document.addEventListener('DOMContentLoaded', function () {
         return Math.ceil(dayOfYear / 7)
     };
 
-    // Get notes data from the script tag
+    // Get notes data from the script tag (first page only, the rest is streamed in below)
     const notesData = document.getElementById('notes-data').textContent;
     const notes = JSON.parse(notesData);
+    const nextCursor = JSON.parse(document.getElementById('notes-next-cursor').textContent);
+
+    // Tag filter and search state, so that streamed notes do not override what is displayed
+    let activeTag = selectedTag;
+    let searchActive = false;
 
     // Extraire les tags uniques des notes existantes
     const usedTags = new Set();
@@ -51,6 +56,8 @@ document.addEventListener('DOMContentLoaded', function () {
 
     // Fonction pour réinitialiser le filtrage
     function resetFilter() {
+        activeTag = null;
+        searchActive = false;
         const groupedNotes = groupNotesByFilter(notes, currentFilter);
         renderNotes(groupedNotes);
         
@@ -210,6 +217,8 @@ document.addEventListener('DOMContentLoaded', function () {
             return;
         }
         
+        activeTag = tag;
+        searchActive = false;
         const filteredNotes = notes.filter(note => note.tags.includes(tag));
         const groupedNotes = groupNotesByFilter(filteredNotes, currentFilter);
         renderNotes(groupedNotes);
@@ -260,6 +269,61 @@ document.addEventListener('DOMContentLoaded', function () {
         renderAvailableTags();
     }
 
+    // Add the notes streamed from the server and re-render the current view
+    function refreshNotes() {
+        notes.forEach(note => {
+            note.tags.forEach(tag => {
+                if (!usedTags.has(tag)) {
+                    usedTags.add(tag);
+                    tags.push(tag);
+                    tagColors[tag] = getTagColor(tag);
+                }
+            });
+        });
+        tags.sort();
+        renderAvailableTags();
+        if (activeTag) {
+            highlightSelectedTag(activeTag);
+        }
+
+        if (searchActive) return;
+        const visibleNotes = activeTag ? notes.filter(note => note.tags.includes(activeTag)) : notes;
+        renderNotes(groupNotesByFilter(visibleNotes, currentFilter));
+    }
+
+    // Stream the notes older than the first page as NDJSON, rendering them as they arrive
+    async function streamRemainingNotes(cursor) {
+        if (!cursor) return;
+
+        const params = new URLSearchParams({ cursor: cursor, format: 'ndjson' });
+        if (selectedTag) {
+            params.set('tag', selectedTag);
+        }
+
+        try {
+            const response = await fetch(`/note_gallery/api/notes?${params}`);
+            if (!response.ok || !response.body) return;
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffered = '';
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+
+                buffered += decoder.decode(value, { stream: true });
+                const lines = buffered.split('\n');
+                buffered = lines.pop();
+                lines.filter(line => line.trim()).forEach(line => notes.push(JSON.parse(line)));
+                refreshNotes();
+            }
+        } catch (error) {
+            console.error('Error while streaming notes:', error);
+        }
+    }
+
+    streamRemainingNotes(nextCursor);
+
     // Trigger search with semantic approach
     async function triggerSearch() {
         const query = searchBar.value.trim();
@@ -267,6 +331,14 @@ document.addEventListener('DOMContentLoaded', function () {
         // Clear the summary for a new search
         displaySummary('');
 
+        // An empty search shows every note again, which are already loaded
+        if (!query) {
+            searchActive = false;
+            refreshNotes();
+            return;
+        }
+        searchActive = true;
+
         try {
             const response = await fetch('/note_gallery/semantic_search', {
                 method: 'POST',
@@ -319,8 +391,8 @@ document.addEventListener('DOMContentLoaded', function () {
             currentFilter = event.target.value;
 
             // Group and render the notes based on the updated filter
-            const groupedNotes = groupNotesByFilter(notes, currentFilter);
-            renderNotes(groupedNotes);
+            searchActive = false;
+            refreshNotes();
         });
     });
 
@@ -342,6 +414,7 @@ document.addEventListener('DOMContentLoaded', function () {
 
                 if (data && Array.isArray(data.relevant_notes)) {
                     if (data.summary) {
+                        searchActive = true;
                         displaySummary(data.summary); // Display the new summary
                         const groupedNotes = groupNotesByFilter(data.relevant_notes, currentFilter);
                         renderNotes(groupedNotes);
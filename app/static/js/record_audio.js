@@ -6,6 +6,20 @@ document.addEventListener('DOMContentLoaded', function() {
     let startTime;
     let timerInterval;
 
+    // Live transcription: PCM16 mono 16 kHz chunks posted to /new_entry/stream_audio
+    const LIVE_SAMPLE_RATE = 16000;
+    const LIVE_CHUNK_MS = 2000;
+    let liveContext = null;
+    let liveProcessor = null;
+    let liveSamples = [];
+    let liveSessionId = null;
+    // Samples posted so far, so the server can tell when a chunk went missing
+    let liveOffset = 0;
+    // Once a chunk is lost the live transcript is incomplete: the server transcribes the file
+    let liveFailed = false;
+    let liveUpload = Promise.resolve();
+    let liveInterval;
+
     // DOM Elements
     const recordBtn = document.getElementById('record-btn');
     const pauseBtn = document.getElementById('pause-btn');
@@ -15,6 +29,89 @@ document.addEventListener('DOMContentLoaded', function() {
     const saveBtn = document.getElementById('save-btn');
     const audioPlayback = document.getElementById('audio-playback');
     const timerDisplay = document.getElementById('timer');
+    const liveTranscript = document.getElementById('live-transcript');
+    const liveCommitted = document.getElementById('live-committed');
+    const livePartial = document.getElementById('live-partial');
+
+    function downsample(input, inputRate) {
+        const ratio = inputRate / LIVE_SAMPLE_RATE;
+        const output = new Int16Array(Math.floor(input.length / ratio));
+        for (let i = 0; i < output.length; i++) {
+            // Average the input samples falling into this output sample
+            const start = Math.floor(i * ratio);
+            const end = Math.min(Math.floor((i + 1) * ratio), input.length);
+            let sum = 0;
+            for (let j = start; j < end; j++) sum += input[j];
+            const sample = Math.max(-1, Math.min(1, sum / Math.max(end - start, 1)));
+            output[i] = sample < 0 ? sample * 0x8000 : sample * 0x7fff;
+        }
+        return output;
+    }
+
+    function startLiveTranscription(stream) {
+        liveContext = new AudioContext();
+        const source = liveContext.createMediaStreamSource(stream);
+        liveProcessor = liveContext.createScriptProcessor(4096, 1, 1);
+        liveProcessor.onaudioprocess = (event) => {
+            if (!isPaused) {
+                liveSamples.push(downsample(event.inputBuffer.getChannelData(0), liveContext.sampleRate));
+            }
+        };
+        source.connect(liveProcessor);
+        liveProcessor.connect(liveContext.destination);
+        liveSessionId = null;
+        liveOffset = 0;
+        liveFailed = false;
+        liveCommitted.textContent = '';
+        livePartial.textContent = '';
+        liveTranscript.style.display = 'block';
+        liveInterval = setInterval(sendLiveChunk, LIVE_CHUNK_MS);
+    }
+
+    function sendLiveChunk() {
+        if (!liveSamples.length || liveFailed) return liveUpload;
+        const length = liveSamples.reduce((total, chunk) => total + chunk.length, 0);
+        const pcm = new Int16Array(length);
+        let position = 0;
+        liveSamples.forEach(chunk => { pcm.set(chunk, position); position += chunk.length; });
+        liveSamples = [];
+        const offset = liveOffset;
+        liveOffset += pcm.length;
+
+        // Chunks are sent one after the other so the server sees them in order
+        liveUpload = liveUpload.then(async () => {
+            if (liveFailed) return;
+            const formData = new FormData();
+            formData.append('audio', new Blob([pcm.buffer], { type: 'application/octet-stream' }));
+            formData.append('offset', offset);
+            if (liveSessionId) formData.append('session_id', liveSessionId);
+            try {
+                const response = await fetch('/new_entry/stream_audio', { method: 'POST', body: formData });
+                if (!response.ok) throw new Error(`stream_audio answered ${response.status}`);
+                const result = await response.json();
+                liveSessionId = result.session_id;
+                liveCommitted.textContent = result.committed;
+                livePartial.textContent = result.partial;
+            } catch (err) {
+                console.error('Live transcription error, the recording will be transcribed on save:', err);
+                liveFailed = true;
+                liveSessionId = null;
+                livePartial.textContent = '';
+            }
+        });
+        return liveUpload;
+    }
+
+    function stopLiveTranscription() {
+        clearInterval(liveInterval);
+        if (liveProcessor) {
+            liveProcessor.disconnect();
+            liveContext.close();
+            liveProcessor = null;
+        }
+        // Flush what was captured since the last chunk
+        return sendLiveChunk();
+    }
 
     // Timer function
     function updateTimer() {
@@ -44,6 +141,7 @@ document.addEventListener('DOMContentLoaded', function() {
             };
 
             mediaRecorder.start();
+            startLiveTranscription(stream);
             isRecording = true;
             startTime = new Date();
             timerInterval = setInterval(updateTimer, 1000);
@@ -78,6 +176,7 @@ document.addEventListener('DOMContentLoaded', function() {
         if (isRecording) {
             mediaRecorder.stop();
             mediaRecorder.stream.getTracks().forEach(track => track.stop());
+            stopLiveTranscription();
             isRecording = false;
             clearInterval(timerInterval);
             stopBtn.style.display = 'none';
@@ -100,6 +199,9 @@ document.addEventListener('DOMContentLoaded', function() {
     // Re-record
     reRecordBtn.addEventListener('click', () => {
         audioChunks = [];
+        liveSessionId = null;
+        liveFailed = false;
+        liveTranscript.style.display = 'none';
         audioPlayback.src = '';
         audioPlayback.style.display = 'none';
         playbackBtn.style.display = 'none';
@@ -114,25 +216,12 @@ document.addEventListener('DOMContentLoaded', function() {
         const audioBlob = new Blob(audioChunks, { type: 'audio/webm' });
         
         try {
-            // D'abord, on obtient la transcription
-            const transcribeFormData = new FormData();
-            transcribeFormData.append('audio', audioBlob);
-            
-            const transcribeResponse = await fetch('/api/transcribe', {
-                method: 'POST',
-                body: transcribeFormData
-            });
-            
-            if (!transcribeResponse.ok) {
-                throw new Error('Failed to transcribe audio');
-            }
-            
-            const transcribeResult = await transcribeResponse.json();
-            
-            // Ensuite, on sauvegarde l'enregistrement avec la transcription
+            // La transcription a été faite pendant l'enregistrement; le serveur la reprend
+            await liveUpload;
             const saveFormData = new FormData();
             saveFormData.append('audio', audioBlob);
-            saveFormData.append('transcription', transcribeResult.transcription);
+            saveFormData.append('transcription', liveCommitted.textContent);
+            if (liveSessionId) saveFormData.append('live_session', liveSessionId);
             
             const saveResponse = await fetch('/new_entry/save_entry', {
                 method: 'POST',
@@ -140,9 +229,13 @@ document.addEventListener('DOMContentLoaded', function() {
             });
 
             if (saveResponse.ok) {
+                // The recording is processed in the background; wait for the note to be ready
                 const result = await saveResponse.json();
-                alert('Entry saved successfully!');
-                window.location.href = '/';
+                saveBtn.disabled = true;
+                await waitForIngestionJob(result.status_url, job => {
+                    saveBtn.textContent = `${job.label}...`;
+                });
+                window.location.href = `/view_entry/${result.note_id}`;
             } else {
                 throw new Error('Failed to save entry');
             }
@@ -28,9 +28,13 @@ document.addEventListener('DOMContentLoaded', function() {
             const result = await response.json();
 
             if (response.ok) {
+                // The lecture is processed in the background; follow the job until it is done
+                uploadStatus.textContent = 'File uploaded, processing...';
+                await waitForIngestionJob(result.status_url, job => {
+                    uploadStatus.textContent = `${job.label}...`;
+                });
                 uploadStatus.textContent = 'File uploaded successfully!';
-                alert('File uploaded successfully!');
-                window.location.href = '/';
+                window.location.href = `/view_entry/${result.note_id}`;
             } else {
                 throw new Error(result.error || 'Upload failed');
             }
@@ -0,0 +1,102 @@
+"""
+Benchmark for decoding voice questions (/api/transcribe): ffmpeg subprocess vs in-process PyAV.
+
+Usage (from the repository root):
+    python benchmarks/bench_audio_decode.py [--seconds 5 15 60] [--runs 20]
+
+Clips of increasing length are cut from a local lecture and encoded as WebM/Opus, like the
+browser's MediaRecorder output. For each clip, the previous path (an ffmpeg process
+transcoding to a 24 kHz WAV, which Whisper then decoded and resampled to 16 kHz again)
+is compared with transcription.decode_audio_bytes (one in-process decode straight to
+16 kHz float32). Reported per request: median wall time and CPU time (including the
+ffmpeg child for the subprocess path). Needs ffmpeg on the PATH for the baseline.
+"""
+import argparse
+import io
+import pathlib
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+import av
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from faster_whisper.audio import decode_audio  # noqa: E402
+
+from app.services.transcription import decode_audio_bytes  # noqa: E402
+
+DEFAULT_CLIP = 'app/static/notes/1761452561/audio.mp3'
+
+
+def encode_webm(samples, sample_rate=48000):
+    """Encode float32 mono samples as WebM/Opus."""
+    buffer = io.BytesIO()
+    with av.open(buffer, 'w', format='webm') as container:
+        stream = container.add_stream('libopus', rate=sample_rate)
+        stream.layout = 'mono'
+        pcm = (np.clip(samples, -1, 1) * 32767).astype('<i2')
+        for start in range(0, len(pcm), 960):
+            frame = av.AudioFrame.from_ndarray(pcm[None, start:start + 960], format='s16', layout='mono')
+            frame.sample_rate = sample_rate
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return buffer.getvalue()
+
+
+def ffmpeg_path(blob):
+    # The previous /api/transcribe path: ffmpeg -> 24 kHz WAV, then Whisper's own decode to 16 kHz
+    wav = subprocess.run(
+        ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', 'pipe:0', '-ac', '1', '-ar', '24000',
+         '-f', 'wav', '-acodec', 'pcm_s16le', 'pipe:1'],
+        input=blob, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True,
+    ).stdout
+    return decode_audio(io.BytesIO(wav), sampling_rate=16000)
+
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def measure(decode, blob, runs):
+    walls, cpus = [], []
+    for _ in range(runs):
+        cpu_start, start = cpu_seconds(), time.perf_counter()
+        samples = decode(blob)
+        walls.append(time.perf_counter() - start)
+        cpus.append(cpu_seconds() - cpu_start)
+    return statistics.median(walls) * 1000, statistics.median(cpus) * 1000, len(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--audio', default=DEFAULT_CLIP)
+    parser.add_argument('--seconds', type=float, nargs='+', default=[5, 15, 60])
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    source = decode_audio(args.audio, sampling_rate=48000)
+    paths = [('in-process', decode_audio_bytes)]
+    if shutil.which('ffmpeg'):
+        paths.insert(0, ('ffmpeg', ffmpeg_path))
+    else:
+        print('ffmpeg not found: only the in-process path is measured')
+
+    print(f"{'clip (s)':>8} {'blob (KiB)':>10} {'path':>10} {'wall (ms)':>10} {'cpu (ms)':>9} {'samples':>8}")
+    for seconds in args.seconds:
+        blob = encode_webm(source[:int(seconds * 48000)])
+        for name, decode in paths:
+            wall, cpu, samples = measure(decode, blob, args.runs)
+            print(f'{seconds:>8.0f} {len(blob) / 1024:>10.1f} {name:>10} {wall:>10.1f} {cpu:>9.1f} {samples:>8}')
+
+
+if __name__ == '__main__':
+    main()
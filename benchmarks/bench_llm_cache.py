@@ -0,0 +1,77 @@
+"""
+Benchmark for the LLM response cache in front of call_qwen_endpoint.
+
+Usage (from the repository root):
+    python benchmarks/bench_llm_cache.py [--notes 10] [--max-entries 20]
+
+Runs against the local stub server in benchmarks/fake_boson.py with a throw-away cache
+file. A set of synthetic lectures is ingested twice (as re-ingesting or rebuilding the
+collection with store_collection would do); the second pass should be served from the
+cache. Then the cache is overfilled to check LRU eviction and aged to check TTL expiry.
+"""
+import argparse
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+import fake_boson  # noqa: E402
+
+server, base_url = fake_boson.start_server()
+os.environ['BOSON_BASE_URL'] = base_url
+os.environ.setdefault('BOSON_API_KEY', 'fake')
+os.environ['LLM_CACHE_PATH'] = os.path.join(tempfile.mkdtemp(), 'llm_cache.sqlite3')
+
+from app.services import llm_cache, text_gen_service, transcription_information  # noqa: E402
+
+
+def ingest(lectures):
+    fake_boson.reset_stats(server)
+    start = time.perf_counter()
+    for text in lectures:
+        transcription_information.get_title_summary_tags_from_transcription(text, mode='sequential')
+    return time.perf_counter() - start, fake_boson.stats(server)['requests']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--notes', type=int, default=10)
+    parser.add_argument('--max-entries', type=int, default=20)
+    args = parser.parse_args()
+
+    lectures = [f'lecture {i} ' + 'the energy of the system is conserved ' * 300 for i in range(args.notes)]
+
+    print(f"{'pass':>10} {'wall (s)':>9} {'upstream requests':>18}")
+    for name in ('cold', 'warm'):
+        wall, requests = ingest(lectures)
+        print(f'{name:>10} {wall:>9.3f} {requests:>18}')
+
+    # Per-call opt-out always reaches the model
+    fake_boson.reset_stats(server)
+    text_gen_service.call_qwen_endpoint(lectures[0], use_cache=False)
+    assert fake_boson.stats(server)['requests'] == 1
+
+    # LRU eviction: the oldest entries go first once the bound is exceeded
+    llm_cache.LLM_CACHE_MAX_ENTRIES = args.max_entries
+    for i in range(args.max_entries + 5):
+        text_gen_service.call_qwen_endpoint(f'filler prompt {i}')
+    stats = llm_cache.llm_cache_stats()
+    assert stats['entries'] == args.max_entries, stats
+
+    # TTL expiry
+    llm_cache.LLM_CACHE_TTL = 0
+    time.sleep(0.01)
+    fake_boson.reset_stats(server)
+    text_gen_service.call_qwen_endpoint(f'filler prompt {args.max_entries + 4}')
+    assert fake_boson.stats(server)['requests'] == 1
+
+    print(llm_cache.llm_cache_stats())
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark for title/summary/tags extraction at ingest time (get_title_summary_tags_from_transcription).
+
+Usage (from the repository root):
+    python benchmarks/bench_metadata_extraction.py [--words 500 2000 8000] [--notes 5]
+
+The extraction runs against the local stub server in benchmarks/fake_boson.py, once per
+mode ('sequential', 'concurrent', 'single'), on synthetic transcriptions of increasing
+length. Reported per ingested note: wall-clock time, number of LLM requests and the
+prompt tokens sent (as counted by the stub).
+"""
+import argparse
+import os
+import pathlib
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+import fake_boson  # noqa: E402
+
+server, base_url = fake_boson.start_server()
+os.environ['BOSON_BASE_URL'] = base_url
+os.environ.setdefault('BOSON_API_KEY', 'fake')
+# Every run has to reach the stub
+os.environ['LLM_CACHE_ENABLED'] = '0'
+
+from app.services import transcription_information  # noqa: E402
+
+MODES = ['sequential', 'concurrent', 'single']
+
+
+def make_transcription(words):
+    sentence = 'the lecturer explains how the energy of the system is conserved over time '.split()
+    return ' '.join(sentence[i % len(sentence)] for i in range(words))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--words', type=int, nargs='+', default=[500, 2000, 8000])
+    parser.add_argument('--notes', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'words':>6} {'mode':>11} {'wall (s)':>9} {'requests':>9} {'prompt tok':>11}")
+    for words in args.words:
+        text = make_transcription(words)
+        for mode in MODES:
+            fake_boson.reset_stats(server)
+            timings = []
+            for _ in range(args.notes):
+                start = time.perf_counter()
+                title, summary, tags = transcription_information.get_title_summary_tags_from_transcription(text, mode=mode)
+                timings.append(time.perf_counter() - start)
+                assert title and summary and tags
+            counts = fake_boson.stats(server)
+            print(f"{words:>6} {mode:>11} {statistics.median(timings):>9.3f} "
+                  f"{counts['requests'] / args.notes:>9.1f} {counts['prompt_tokens'] / args.notes:>11.0f}")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark for the home page query (load_recent_notes_page(20)) as the archive grows.
+
+Usage (from the repository root):
+    python benchmarks/bench_recent_notes.py [--sizes 100 1000 10000 100000] [--repeat 50]
+
+For every archive size a synthetic NOTES_DIR is generated in a temporary directory, the
+recency index is built once (as ingestion would have done), and then the page query is
+timed both warm (index and notes in memory) and cold (fresh process state, index read
+back from disk).
+"""
+import argparse
+import json
+import os
+import pathlib
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from app.services import notes_service  # noqa: E402
+
+
+def make_archive(root, size):
+    notes_dir = pathlib.Path(root) / 'notes'
+    start = datetime(2025, 1, 1)
+    for i in range(size):
+        note_id = str(1_700_000_000 + i)
+        os.makedirs(notes_dir / note_id)
+        with open(notes_dir / note_id / 'data.json', 'w') as json_file:
+            json.dump({
+                'id': note_id,
+                'title': f'Lecture {i}',
+                'summary': f'**Summary** of lecture {i}',
+                'tags': ['Science'],
+                'transcription': 'lorem ipsum ' * 200,
+                'datetime': (start + timedelta(minutes=(i * 7919) % (size * 3))).strftime('%Y-%m-%d %H:%M:%S'),
+            }, json_file)
+    return notes_dir
+
+
+def time_call(repeat, reset=False):
+    timings = []
+    for _ in range(repeat):
+        if reset:
+            notes_service.invalidate_note()
+        start = time.perf_counter()
+        notes, cursor = notes_service.load_recent_notes_page(20)
+        timings.append(time.perf_counter() - start)
+    assert len(notes) == 20 or cursor is None
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'notes':>8} {'build (ms)':>12} {'cold (ms)':>10} {'warm (ms)':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as root:
+            notes_service.NOTES_DIR = make_archive(root, size)
+            notes_service.NOTE_INDEX_DIR = pathlib.Path(root) / 'note_index'
+            notes_service.invalidate_note()
+
+            start = time.perf_counter()
+            notes_service.load_recent_notes_page(20)
+            build = (time.perf_counter() - start) * 1000
+
+            cold = time_call(max(args.repeat // 10, 3), reset=True)
+            warm = time_call(args.repeat)
+            print(f'{size:>8} {build:>12.1f} {cold:>10.2f} {warm:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark for remote transcription (transcription.transcribe2) against the local stub server.
+
+Usage (from the repository root):
+    python benchmarks/bench_remote_transcription.py [--seconds 300] [--in-flight 1 4 8]
+        [--fail-rate 0.1] [--audio lecture.wav]
+
+Without --audio, a synthetic lecture is generated: bursts of "speech" (noisy tones of 1 to
+4 s) separated by short pauses, with a 20 s stretch without any pause every few minutes.
+Compared:
+- the previous behaviour: fixed 10 s chunks sent one after the other;
+- transcribe2: chunks cut in silences, with --in-flight requests at a time.
+Reported per run: wall-clock time, requests and audio seconds sent to the stub, how many
+chunk boundaries fall in speech (where a word can be cut in half) and how many 503s the
+stub answered (--fail-rate), all retried.
+"""
+import argparse
+import os
+import pathlib
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+import fake_boson  # noqa: E402
+
+server, base_url = fake_boson.start_server()
+os.environ['BOSON_BASE_URL'] = base_url
+os.environ.setdefault('BOSON_API_KEY', 'fake')
+os.environ['UPSTREAM_BACKOFF'] = '0.05'
+# --fail-rate exercises the retries, not the circuit breaker
+os.environ['UPSTREAM_BREAKER_FAILURES'] = '1000'
+os.environ['LLM_CACHE_ENABLED'] = '0'
+
+from pydub import AudioSegment  # noqa: E402
+
+from app.services import transcription  # noqa: E402
+
+SAMPLE_RATE = 16000
+
+
+def synthetic_lecture(path, seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    parts, t = [], 0.0
+    while t < seconds:
+        if int(t) % 180 > 170:
+            speech = 20.0
+        else:
+            speech = rng.uniform(1, 4)
+        n = int(speech * SAMPLE_RATE)
+        tone = np.sin(2 * np.pi * rng.uniform(120, 300) * np.arange(n) / SAMPLE_RATE)
+        parts.append(0.3 * tone + 0.05 * rng.standard_normal(n))
+        pause = rng.uniform(0.3, 0.8)
+        parts.append(0.002 * rng.standard_normal(int(pause * SAMPLE_RATE)))
+        t += speech + pause
+    samples = np.concatenate(parts)[:int(seconds * SAMPLE_RATE)]
+    with wave.open(str(path), 'wb') as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(SAMPLE_RATE)
+        out.writeframes((np.clip(samples, -1, 1) * 32767).astype('<i2').tobytes())
+
+
+def cuts_in_speech(boundaries, silences):
+    return sum(1 for cut in boundaries if not any(start <= cut <= end for start, end in silences))
+
+
+def fixed_chunks(audio, chunk_ms=10000):
+    """The previous transcribe2: fixed slices, one request after the other."""
+    texts = []
+    for ms in range(0, len(audio), chunk_ms):
+        texts.append(transcription._recognize_chunk(ms // chunk_ms, transcription._chunk_to_base64(audio[ms:ms + chunk_ms])))
+    return texts
+
+
+def report(name, wall, boundaries, silences):
+    stats = fake_boson.stats(server)
+    print(f"{name:>22} {wall:>9.2f} {stats['requests']:>8} {stats['audio_seconds']:>9.1f} "
+          f"{cuts_in_speech(boundaries, silences):>6}/{len(boundaries):<4} {stats['failures']:>5}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--audio', help='WAV or MP3 file (default: a synthetic lecture)')
+    parser.add_argument('--seconds', type=float, default=300)
+    parser.add_argument('--in-flight', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    fake_boson.FAIL_RATE = args.fail_rate
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.audio
+        if path is None:
+            path = str(pathlib.Path(tmp) / 'lecture.wav')
+            synthetic_lecture(path, args.seconds)
+        audio = AudioSegment.from_file(path)
+        silences = transcription._silences(audio)
+        print(f"Clip: {path} ({len(audio) / 1000:.1f} s, {len(silences)} silences)")
+        print(f"{'run':>22} {'wall (s)':>9} {'requests':>8} {'audio (s)':>9} {'cuts in speech':>11} {'503s':>5}")
+
+        fake_boson.reset_stats(server)
+        start = time.perf_counter()
+        fixed_chunks(audio)
+        report('fixed 10 s, sequential', time.perf_counter() - start, list(range(10000, len(audio), 10000)), silences)
+
+        boundaries = [end for _, end, _ in transcription.plan_chunks(audio, transcription.REMOTE_CHUNK_MS)][:-1]
+        for in_flight in args.in_flight:
+            fake_boson.reset_stats(server)
+            start = time.perf_counter()
+            transcription.transcribe2(path, max_in_flight=in_flight)
+            report(f'silence-aware, {in_flight} in flight', time.perf_counter() - start, boundaries, silences)
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
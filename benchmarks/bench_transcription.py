@@ -0,0 +1,86 @@
+"""
+Benchmark for local Whisper transcription: sequential vs batched VAD-segmented decoding.
+
+Usage (from the repository root):
+    python benchmarks/bench_transcription.py [--audio app/static/notes/1761452561/audio.mp3]
+        [--reference transcript.txt] [--modes sequential batched] [--beam 1 5]
+        [--batch 8 16] [--threads 4 8]
+
+The clip is decoded once up front, then transcribed with every combination of mode, beam
+size, batch size (batched mode only) and CPU threads, using the same code path as
+ingestion (transcription.run_whisper). Reported per configuration: wall-clock time, the
+real-time factor (wall time / audio duration, lower is faster) and the word error rate
+against the reference. Without --reference, the transcription stored in the clip's
+data.json is used, so WER then measures the drift from the ingested transcript.
+"""
+import argparse
+import itertools
+import json
+import pathlib
+import re
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from faster_whisper.audio import decode_audio  # noqa: E402
+
+from app.services import model_registry  # noqa: E402
+from app.services.transcription import run_whisper  # noqa: E402
+
+DEFAULT_CLIP = 'app/static/notes/1761452561/audio.mp3'
+
+
+def normalize(text):
+    return re.sub(r"[^\w\s']", ' ', text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / max(len(ref), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--audio', default=DEFAULT_CLIP)
+    parser.add_argument('--reference', help='text file with the reference transcript')
+    parser.add_argument('--modes', nargs='+', default=['sequential', 'batched'])
+    parser.add_argument('--beam', type=int, nargs='+', default=[1, 5])
+    parser.add_argument('--batch', type=int, nargs='+', default=[8, 16])
+    parser.add_argument('--threads', type=int, nargs='+', default=[4, 8])
+    args = parser.parse_args()
+
+    if args.reference:
+        reference = pathlib.Path(args.reference).read_text()
+    else:
+        reference = json.loads((pathlib.Path(args.audio).parent / 'data.json').read_text())['transcription']
+    audio = decode_audio(args.audio, sampling_rate=16000)
+    duration = len(audio) / 16000
+    print(f"Clip: {args.audio} ({duration:.1f} s, {len(normalize(reference))} reference words)")
+
+    print(f"{'mode':>10} {'threads':>7} {'beam':>4} {'batch':>5} {'wall (s)':>9} {'RTF':>6} {'WER':>6}")
+    for threads in args.threads:
+        model = model_registry.load_whisper_model(cpu_threads=threads)
+        pipeline = model_registry.load_batched_pipeline(model)
+        for mode, beam in itertools.product(args.modes, args.beam):
+            if mode == 'batched' and pipeline is None:
+                print(f"{mode:>10} skipped: faster-whisper has no BatchedInferencePipeline")
+                continue
+            for batch in (args.batch if mode == 'batched' else [None]):
+                start = time.perf_counter()
+                segments, _ = run_whisper(audio, model=model, pipeline=pipeline, mode=mode,
+                                          beam_size=beam, batch_size=batch)
+                text = ''.join(segment.text for segment in segments)
+                wall = time.perf_counter() - start
+                print(f"{mode:>10} {threads:>7} {beam:>4} {batch or '-':>5} {wall:>9.2f} "
+                      f"{wall / duration:>6.3f} {word_error_rate(reference, text):>6.3f}")
+
+
+if __name__ == '__main__':
+    main()
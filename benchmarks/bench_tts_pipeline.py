@@ -0,0 +1,75 @@
+"""
+Benchmark for the sentence-pipelined TTS (app/services/tts_pipeline.py) on long answers.
+
+Usage (from the repository root):
+    python benchmarks/bench_tts_pipeline.py [--sentences 4 12] [--in-flight 1 2 4 8] [--latency 0.5] [--rtf 0.25]
+
+Speech comes from the local stub in benchmarks/fake_boson.py, with a fixed latency per
+request (--latency) and a generation speed relative to real time (--rtf). The baseline
+synthesizes the answer in one request (get_audio_response); the pipeline is run with
+increasing in-flight limits. Reported: time to the first audio sample and total time.
+"""
+import argparse
+import os
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+import fake_boson  # noqa: E402
+
+server, base_url = fake_boson.start_server()
+os.environ['BOSON_BASE_URL'] = base_url
+os.environ.setdefault('BOSON_API_KEY', 'fake')
+
+from app.services import tts_pipeline  # noqa: E402
+from app.services.text_gen_service import iter_audio_chunks  # noqa: E402
+
+SENTENCE = 'In a closed system the total energy stays the same while it changes form.'
+
+
+def time_stream(chunks):
+    start = time.perf_counter()
+    first = None
+    size = 0
+    for chunk in chunks:
+        if first is None and chunk:
+            first = time.perf_counter() - start
+        size += len(chunk)
+    return first, time.perf_counter() - start, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sentences', type=int, nargs='+', default=[4, 12])
+    parser.add_argument('--in-flight', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--latency', type=float, default=0.5)
+    parser.add_argument('--rtf', type=float, default=0.25)
+    parser.add_argument('--silence-ms', type=int, default=120)
+    parser.add_argument('--crossfade-ms', type=int, default=0)
+    args = parser.parse_args()
+
+    fake_boson.BASE_LATENCY = args.latency
+    fake_boson.AUDIO_RTF = args.rtf
+
+    print(f"{'sentences':>9} {'mode':>14} {'first audio (s)':>16} {'total (s)':>10} {'audio (s)':>10}")
+    for sentences in args.sentences:
+        answer = ' '.join([SENTENCE] * sentences)
+
+        first, total, size = time_stream(iter_audio_chunks(answer))
+        print(f"{sentences:>9} {'one request':>14} {first:>16.3f} {total:>10.3f} {size / 2 / tts_pipeline.SAMPLE_RATE:>10.1f}")
+
+        for in_flight in args.in_flight:
+            first, total, size = time_stream(tts_pipeline.stream_pcm(
+                answer, max_in_flight=in_flight, silence_ms=args.silence_ms, crossfade_ms=args.crossfade_ms,
+            ))
+            mode = f'pipeline x{in_flight}'
+            print(f"{sentences:>9} {mode:>14} {first:>16.3f} {total:>10.3f} {size / 2 / tts_pipeline.SAMPLE_RATE:>10.1f}")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
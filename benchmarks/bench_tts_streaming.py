@@ -0,0 +1,87 @@
+"""
+Benchmark for time-to-first-audio of chat answers: buffered WAV vs chunked WAV streaming.
+
+Usage (from the repository root):
+    python benchmarks/bench_tts_streaming.py [--words 20 100 300]
+
+Speech is generated by the local stub in benchmarks/fake_boson.py. For answers of
+increasing length, the buffered path (tts_pipeline.synthesize_wav, as used by /api/chat)
+can only start playback once the whole WAV is built, while /api/chat/audio/<key>
+forwards the WAV header and then the PCM frames as they are generated. The streamed bytes are
+checked to decode to the same audio as the buffered WAV.
+"""
+import argparse
+import io
+import os
+import pathlib
+import sys
+import tempfile
+import time
+import wave
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+import fake_boson  # noqa: E402
+
+server, base_url = fake_boson.start_server()
+os.environ['BOSON_BASE_URL'] = base_url
+os.environ.setdefault('BOSON_API_KEY', 'fake')
+
+from flask import Flask  # noqa: E402
+
+from app.routes import live_chat  # noqa: E402
+from app.services import tts_cache, tts_pipeline  # noqa: E402
+
+
+def make_answer(words):
+    sentence = 'energy is conserved in a closed system so the total stays the same '.split()
+    return ' '.join(sentence[i % len(sentence)] for i in range(words))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--words', type=int, nargs='+', default=[20, 100, 300])
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.register_blueprint(live_chat.bp)
+    client = app.test_client()
+    # An empty cache, so that every answer is synthesized while streamed
+    cache_dir = tempfile.TemporaryDirectory()
+    tts_cache.TTS_CACHE_DIR = cache_dir.name
+
+    print(f"{'words':>6} {'audio (s)':>10} {'buffered first (s)':>19} {'streamed first (s)':>19} {'streamed total (s)':>19}")
+    for words in args.words:
+        answer = make_answer(words)
+
+        start = time.perf_counter()
+        buffered = tts_pipeline.synthesize_wav(answer)
+        buffered_first = time.perf_counter() - start
+
+        key = tts_pipeline.cache_key(answer)
+        tts_cache.store_text(key, answer)
+        start = time.perf_counter()
+        response = client.get(f'/api/chat/audio/{key}', buffered=False)
+        streamed = bytearray()
+        streamed_first = None
+        for chunk in response.response:
+            streamed += chunk
+            # Past the 44-byte header, the player has samples to play
+            if streamed_first is None and len(streamed) > 44:
+                streamed_first = time.perf_counter() - start
+        streamed_total = time.perf_counter() - start
+
+        with wave.open(io.BytesIO(buffered)) as wav:
+            duration = wav.getnframes() / wav.getframerate()
+            assert bytes(streamed[44:]) == wav.readframes(wav.getnframes())
+
+        print(f'{words:>6} {duration:>10.1f} {buffered_first:>19.3f} {streamed_first:>19.3f} {streamed_total:>19.3f}')
+
+    tts_pipeline._store_executor.shutdown()
+    cache_dir.cleanup()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
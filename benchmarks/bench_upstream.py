@@ -0,0 +1,85 @@
+"""
+Exercise the upstream gateway (app/services/upstream.py) against the local stub server.
+
+Usage (from the repository root):
+    python benchmarks/bench_upstream.py [--calls 60] [--concurrency 16] [--fail-rate 0.2]
+
+Three scenarios, each printing the stub's counters and the gateway's per-model stats:
+- healthy upstream: concurrent calls share a handful of keep-alive connections and never
+  exceed the per-model limit;
+- flaky upstream (--fail-rate of 503s): calls succeed through jittered retries;
+- upstream down: the circuit breaker opens and later calls fail fast without reaching it.
+"""
+import argparse
+import os
+import pathlib
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+import fake_boson  # noqa: E402
+
+server, base_url = fake_boson.start_server()
+os.environ['BOSON_BASE_URL'] = base_url
+os.environ.setdefault('BOSON_API_KEY', 'fake')
+os.environ['UPSTREAM_MODEL_LIMITS'] = 'Qwen3-14B-Hackathon=4'
+os.environ['UPSTREAM_BACKOFF'] = '0.05'
+os.environ['UPSTREAM_BREAKER_COOLDOWN'] = '1'
+
+from app.services import upstream  # noqa: E402
+
+MODEL = 'Qwen3-14B-Hackathon'
+
+
+def call(i):
+    try:
+        upstream.get_upstream().chat(MODEL, messages=[{'role': 'user', 'content': f'**Title:** {i}'}], deadline=10)
+        return 'ok'
+    except upstream.CircuitOpenError:
+        return 'rejected'
+    except Exception as e:
+        return type(e).__name__
+
+
+def run(name, calls, concurrency):
+    fake_boson.reset_stats(server)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(call, range(calls)))
+    wall = time.perf_counter() - start
+    outcomes = {outcome: results.count(outcome) for outcome in sorted(set(results))}
+    print(f'{name}: {wall:.2f}s, outcomes {outcomes}')
+    print(f'  stub: {fake_boson.stats(server)}')
+    print(f'  gateway: {upstream.upstream_stats()[MODEL]}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=60)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--fail-rate', type=float, default=0.2)
+    args = parser.parse_args()
+    fake_boson.BASE_LATENCY = 0.05
+
+    run('healthy', args.calls, args.concurrency)
+
+    fake_boson.FAIL_RATE = args.fail_rate
+    run(f'flaky ({args.fail_rate:.0%} 503)', args.calls, args.concurrency)
+
+    fake_boson.FAIL_RATE = 1.0
+    run('down', args.calls, args.concurrency)
+
+    # After the cooldown a single trial call goes through and closes the circuit again
+    fake_boson.FAIL_RATE = 0.0
+    time.sleep(1.1)
+    print(f'trial call after cooldown: {call(-1)}')
+    run('recovered', args.calls, args.concurrency)
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
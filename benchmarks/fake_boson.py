@@ -0,0 +1,296 @@
+"""
+Local stub of the Boson OpenAI-compatible API, for benchmarks that must not hit the real endpoint.
+
+It answers POST /v1/chat/completions with canned content and simulates latency as
+    base latency + prompt tokens * prefill time + completion tokens * decode time
+so that round trips and prompt sizes show up in wall-clock numbers the way they would
+against the real server. Qwen answers start with a <think> span like the real model's,
+and `stream: true` requests are answered with one SSE chunk per token. Token counts are
+whitespace-separated words, which is enough to compare approaches against each other.
+
+FAIL_RATE of the requests are answered with a 503, to exercise retries and circuit breakers.
+Every new TCP connection is counted, to check that clients reuse them.
+
+Speech requests (higgs-audio-generation models) are streamed as base64 PCM16 chunks
+(24 kHz mono, a plain tone), AUDIO_SECONDS_PER_WORD long and generated AUDIO_RTF times
+faster than real time.
+
+Audio understanding requests (higgs-audio-understanding models, WAV `input_audio`) take
+BASE_LATENCY plus UNDERSTANDING_RTF times the clip duration, and are answered with one
+word per AUDIO_SECONDS_PER_WORD of audio.
+
+Usage:
+    python benchmarks/fake_boson.py [--port 8765]          # standalone
+    BOSON_BASE_URL=http://127.0.0.1:8765/v1 flask run      # point the app at it
+
+or in-process from a benchmark:
+    server, base_url = start_server()
+    ... stats(server) ...
+    server.shutdown()
+"""
+import argparse
+import array
+import base64
+import io
+import json
+import math
+import random
+import re
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BASE_LATENCY = 0.15          # seconds per request (network + queueing)
+PREFILL_PER_TOKEN = 0.00005  # seconds per prompt token
+DECODE_PER_TOKEN = 0.002     # seconds per completion token
+FAIL_RATE = 0.0              # fraction of requests answered with 503
+
+SAMPLE_RATE = 24000
+AUDIO_SECONDS_PER_WORD = 0.35
+AUDIO_CHUNK_SECONDS = 0.2
+AUDIO_RTF = 0.25             # generation time / audio duration
+UNDERSTANDING_RTF = 0.1      # transcription time / audio duration
+
+THINK_TEXT = "<think>\nThe user wants an answer based on the lecture notes.\n</think>\n\n"
+
+SUMMARY_TEXT = (
+    "## Main ideas\n"
+    "- The lecture introduces the topic and its key definitions.\n"
+    "- Several worked examples illustrate the main argument.\n"
+    "- The conclusion links the ideas back to earlier lectures.\n"
+)
+
+
+def count_tokens(text):
+    return len(text.split())
+
+
+def _prompt_text(messages):
+    parts = []
+    for message in messages:
+        content = message.get('content')
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(part.get('text', '') for part in content if isinstance(part, dict))
+    return '\n'.join(parts)
+
+
+def _input_audio_seconds(messages):
+    seconds = 0.0
+    for message in messages:
+        content = message.get('content')
+        if not isinstance(content, list):
+            continue
+        for part in content:
+            if isinstance(part, dict) and part.get('type') == 'input_audio':
+                with wave.open(io.BytesIO(base64.b64decode(part['input_audio']['data']))) as clip:
+                    seconds += clip.getnframes() / clip.getframerate()
+    return seconds
+
+
+def transcript_for(seconds):
+    words = max(int(seconds / AUDIO_SECONDS_PER_WORD), 1)
+    return ' '.join(f'word{i}' for i in range(words)) + '.'
+
+
+def completion_for(prompt):
+    """Canned answer for the app's prompts (see app/services/promptLibrary.py)."""
+    if re.search(r'\*\*JSON:\*\*\s*$', prompt):
+        return json.dumps({'title': 'Introduction to the Topic', 'summary': SUMMARY_TEXT, 'tags': ['Science', 'Education']})
+    if re.search(r'\*\*Title:\*\*\s*$', prompt):
+        return 'Introduction to the Topic'
+    if re.search(r'\*\*Tags:\*\*\s*$', prompt):
+        return 'Science, Education'
+    return SUMMARY_TEXT
+
+
+class FakeBosonHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.stats_lock:
+            self.server.stats['connections'] += 1
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            with self.server.stats_lock:
+                self._send_json(dict(self.server.stats))
+        else:
+            self._send_json({'error': 'not found'}, 404)
+
+    def _stream_completion(self, request, content):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        for i, token in enumerate(re.findall(r'\S+\s*|\s+', content)):
+            if i:
+                time.sleep(DECODE_PER_TOKEN)
+            chunk = {
+                'id': 'chatcmpl-fake',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': request.get('model', 'fake'),
+                'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}],
+            }
+            self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+            self.wfile.flush()
+        self.wfile.write(b'data: [DONE]\n\n')
+
+    def _stream_speech(self, text):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        duration = max(count_tokens(text), 1) * AUDIO_SECONDS_PER_WORD
+        chunk_samples = int(SAMPLE_RATE * AUDIO_CHUNK_SECONDS)
+        total_samples = int(SAMPLE_RATE * duration)
+        for offset in range(0, total_samples, chunk_samples):
+            n = min(chunk_samples, total_samples - offset)
+            time.sleep(n / SAMPLE_RATE * AUDIO_RTF)
+            pcm = array.array('h', (int(8000 * math.sin(2 * math.pi * 220 * (offset + i) / SAMPLE_RATE)) for i in range(n)))
+            chunk = {
+                'id': 'chatcmpl-fake',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'choices': [{'index': 0, 'delta': {'audio': {'data': base64.b64encode(pcm.tobytes()).decode('ascii')}}}],
+            }
+            self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+            self.wfile.flush()
+        self.wfile.write(b'data: [DONE]\n\n')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+
+        if self.path.rstrip('/') == '/stats/reset':
+            reset_stats(self.server)
+            self._send_json({})
+            return
+        if not self.path.endswith('/chat/completions'):
+            self._send_json({'error': 'not found'}, 404)
+            return
+
+        if random.random() < FAIL_RATE:
+            with self.server.stats_lock:
+                self.server.stats['failures'] += 1
+            time.sleep(BASE_LATENCY / 10)
+            self._send_json({'error': {'message': 'upstream overloaded', 'type': 'server_error'}}, 503)
+            return
+
+        if 'audio-generation' in request.get('model', ''):
+            with self.server.stats_lock:
+                self.server.stats['requests'] += 1
+            time.sleep(BASE_LATENCY)
+            self._stream_speech(_prompt_text(request.get('messages', [])[1:]))
+            return
+
+        if 'audio-understanding' in request.get('model', ''):
+            seconds = _input_audio_seconds(request.get('messages', []))
+            content = transcript_for(seconds)
+            with self.server.stats_lock:
+                self.server.stats['requests'] += 1
+                self.server.stats['completion_tokens'] += count_tokens(content)
+                self.server.stats['audio_seconds'] += seconds
+            time.sleep(BASE_LATENCY + seconds * UNDERSTANDING_RTF)
+            self._send_json({
+                'id': 'chatcmpl-fake',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': request.get('model', 'fake'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            })
+            return
+
+        prompt = _prompt_text(request.get('messages', []))
+        content = completion_for(prompt)
+        if request.get('model', '').startswith('Qwen'):
+            content = THINK_TEXT + content
+        prompt_tokens = count_tokens(prompt)
+        completion_tokens = count_tokens(content)
+        with self.server.stats_lock:
+            self.server.stats['requests'] += 1
+            self.server.stats['prompt_tokens'] += prompt_tokens
+            self.server.stats['completion_tokens'] += completion_tokens
+
+        if request.get('stream'):
+            time.sleep(BASE_LATENCY + prompt_tokens * PREFILL_PER_TOKEN)
+            self._stream_completion(request, content)
+            return
+
+        time.sleep(BASE_LATENCY + prompt_tokens * PREFILL_PER_TOKEN + completion_tokens * DECODE_PER_TOKEN)
+        self._send_json({
+            'id': 'chatcmpl-fake',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'fake'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+        })
+
+
+def reset_stats(server):
+    with server.stats_lock:
+        server.stats = {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'failures': 0, 'connections': 0,
+                        'audio_seconds': 0.0}
+
+
+def stats(server):
+    with server.stats_lock:
+        return dict(server.stats)
+
+
+def start_server(host='127.0.0.1', port=0):
+    """Start the stub in a daemon thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer((host, port), FakeBosonHandler)
+    server.daemon_threads = True
+    server.stats_lock = threading.Lock()
+    reset_stats(server)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}/v1'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=BASE_LATENCY, help='seconds added to every request')
+    parser.add_argument('--audio-rtf', type=float, default=AUDIO_RTF, help='speech generation time / audio duration')
+    parser.add_argument('--fail-rate', type=float, default=FAIL_RATE, help='fraction of requests answered with 503')
+    args = parser.parse_args()
+    BASE_LATENCY = args.latency
+    AUDIO_RTF = args.audio_rtf
+    FAIL_RATE = args.fail_rate
+
+    server, base_url = start_server(args.host, args.port)
+    print(f'Fake Boson API listening on {base_url}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -3,7 +3,10 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-app = create_app()
+# The transcription pool spawns its workers, which re-import this module as __mp_main__;
+# they must not build the web app
+if __name__ != '__mp_main__':
+    app = create_app()
 
 if __name__ == '__main__':
     app.run(debug=True, port=5001)
\ No newline at end of file
@@ -0,0 +1,67 @@
+import json
+import os
+
+os.environ.setdefault('BOSON_API_KEY', 'test')
+
+import pytest  # noqa: E402
+from flask import Flask  # noqa: E402
+
+from app.routes import live_chat  # noqa: E402
+from app.services import tts_cache, tts_pipeline  # noqa: E402
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # The cache directory is relative to the working directory, as when the app runs from the repo root
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(tts_cache, 'TTS_CACHE_DIR', 'tts_cache')
+    monkeypatch.setattr(tts_cache, 'TTS_CACHE_FORMAT', 'wav')
+    monkeypatch.setattr(tts_pipeline, 'stream_pcm', lambda text, **options: iter([b'\x00\x01' * 2400]))
+    monkeypatch.setattr(live_chat, 'semantic_search_notes', lambda query: [])
+    monkeypatch.setattr(live_chat, 'get_rag_summary', lambda *args, **kwargs: 'A cached answer.')
+    monkeypatch.setattr(live_chat, 'stream_rag_summary', lambda *args, **kwargs: iter(['A streamed ', 'answer.']))
+    monkeypatch.setattr(live_chat.conversation_store, 'get_history', lambda session_id: '')
+    monkeypatch.setattr(live_chat.conversation_store, 'record_exchange', lambda *args: None)
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test'
+    app.register_blueprint(live_chat.bp)
+    return app.test_client()
+
+
+def test_chat_audio_url_serves_the_cached_speech(client):
+    response = client.post('/api/chat', json={'message': 'What is entropy?'})
+    assert response.status_code == 200
+    audio_url = response.get_json()['audioUrl']
+
+    audio = client.get(audio_url)
+    assert audio.status_code == 200
+    assert audio.mimetype == 'audio/wav'
+    assert audio.data.startswith(b'RIFF')
+
+
+def _client_like(client):
+    # Another worker: same cache directory, no state shared in memory
+    app = client.application
+    other = type(app)(__name__)
+    other.config.update(app.config)
+    other.register_blueprint(live_chat.bp)
+    return other.test_client()
+
+
+def test_stream_audio_url_works_from_another_worker(client):
+    response = client.post('/api/chat/stream', json={'message': 'What is entropy?'})
+    events = [json.loads(line[len('data: '):]) for line in response.get_data(as_text=True).splitlines()
+              if line.startswith('data: ')]
+    audio_url = events[-1]['audioUrl']
+
+    audio = _client_like(client).get(audio_url)
+    assert audio.status_code == 200
+    assert audio.mimetype == 'audio/wav'
+    assert audio.data.startswith(b'RIFF')
+
+    # Once synthesized, the same URL redirects to the cached file
+    tts_pipeline._store_executor.submit(lambda: None).result()
+    again = client.get(audio_url)
+    assert again.status_code == 302
+    assert client.get(again.location).data.startswith(b'RIFF')
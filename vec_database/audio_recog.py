@@ -5,11 +5,16 @@ Handles MP3 input, adds noise to silence, and transcribes audio.
 """
 
 import os
+import sys
+import pathlib
 import base64
 import numpy as np
 import soundfile as sf
 from pydub import AudioSegment
-from openai import OpenAI
+
+# Boson calls go through the app's upstream gateway (pooling, limits, retries)
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from app.services.upstream import get_upstream
 
 # ────────────────────────────────────────────────────────────
 # Configuration
@@ -18,10 +23,6 @@ BOSON_API_KEY = os.getenv("BOSON_API_KEY")
 if not BOSON_API_KEY:
     raise ValueError("Set BOSON_API_KEY environment variable")
 
-client = OpenAI(
-    api_key=BOSON_API_KEY,
-    base_url="https://hackathon.boson.ai/v1"
-)
 
 # ────────────────────────────────────────────────────────────
 # Audio Preprocessing
@@ -106,8 +107,8 @@ def recognize_audio(audio_path: str, prompt: str = "Transcribe this audio.") ->
         "Provide accurate transcription and any relevant context."
     )
     
-    response = client.chat.completions.create(
-        model="higgs-audio-understanding-Hackathon",  # Use understanding model
+    response = get_upstream().chat(
+        "higgs-audio-understanding-Hackathon",  # Use understanding model
         messages=[
             {"role": "system", "content": system_prompt},
             {
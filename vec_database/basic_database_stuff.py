@@ -4,11 +4,15 @@ import librosa  # or torchaudio
 from sentence_transformers import SentenceTransformer
 from huggingface_hub import hf_hub_download
 import base64
-import openai, os, io
+import os, io, sys, pathlib
 import soundfile as sf
 from pydub import AudioSegment
 from tqdm import tqdm
 
+# Boson calls go through the app's upstream gateway (pooling, limits, retries)
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from app.services.upstream import get_upstream
+
 
 
 BOSON_API_KEY = os.getenv("BOSON_API_KEY")
@@ -20,11 +24,6 @@ print("Loading chromadb")
 client = chromadb.PersistentClient(path="vec_database/audio_db")
 collection = client.get_or_create_collection(name="text_embeddings")
 
-bosonclient = openai.Client(
-    api_key=BOSON_API_KEY,
-    base_url="https://hackathon.boson.ai/v1"
-)
-
 print("Loading data")
 repo_id = "ofarrelle/higgs-hackathon-2025"
 wav_folder = "beethoven/wavs"
@@ -66,8 +65,8 @@ def recognize_audio(chunk):
         "Provide accurate transcription and any relevant context."
     )
     
-    response = bosonclient.chat.completions.create(
-        model="higgs-audio-understanding-Hackathon",  # Use understanding model
+    response = get_upstream().chat(
+        "higgs-audio-understanding-Hackathon",  # Use understanding model
         messages=[
             {"role": "system", "content": system_prompt},
             {
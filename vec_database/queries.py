@@ -2,9 +2,13 @@ import librosa
 import torch
 from higgs_audio.boson_multimodal.audio_processing.higgs_audio_tokenizer import load_higgs_audio_tokenizer
 import chromadb
-import io, base64, openai, os
+import io, base64, os, sys, pathlib
 from sentence_transformers import SentenceTransformer
 from pydub import AudioSegment
+
+# Boson calls go through the app's upstream gateway (pooling, limits, retries)
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from app.services.upstream import get_upstream
 # Load your query audio (same sample rate as your database!)
 BOSON_API_KEY = os.getenv("BOSON_API_KEY")
 
@@ -22,11 +26,6 @@ def segment_to_base64(seg, fmt):
 
 b64wv = segment_to_base64(wv, "wav")
 
-bosonclient = openai.Client(
-    api_key=BOSON_API_KEY,
-    base_url="https://hackathon.boson.ai/v1"
-)
-
 def recognize_audio(chunk):
    
     system_prompt = (
@@ -35,8 +34,8 @@ def recognize_audio(chunk):
         "Provide accurate transcription and any relevant context."
     )
     
-    response = bosonclient.chat.completions.create(
-        model="higgs-audio-understanding-Hackathon",  # Use understanding model
+    response = get_upstream().chat(
+        "higgs-audio-understanding-Hackathon",  # Use understanding model
         messages=[
             {"role": "system", "content": system_prompt},
             {